@@ -1,175 +1,355 @@
 import os
 import json
 import logging
-import uuid
-import urllib.request
-import urllib.parse
-import urllib.error
-import boto3
-from boto3.dynamodb.conditions import Key
-from decimal import Decimal
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 # Eigene Klassen importieren
 from alexa_device import AlexaDevice
+from alexa_dynamodb import Table
+from alexa_cache import LRUCache
+from alexa_catalog import current_catalog_version
+from alexa_throttle import ChangeReportThrottle, emit_metrics
+from alexa_events import send_event, build_change_report, build_deferred_response
+from alexa_state_store import DeviceStateStore
+from alexa_auth import get_valid_access_token
+from alexa_warmup import is_warmup_event, run_warmup, warm_up_controllers, warm_up_https
 
 # Logger & Konfiguration
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-ALEXA_EVENTS_URL = os.environ.get("ALEXA_EVENTS_URL", "https://api.eu.amazonalexa.com/v3/events")
-CLIENT_ID = os.environ.get("ALEXA_CLIENT_ID")
-CLIENT_SECRET = os.environ.get("ALEXA_CLIENT_SECRET")
 DEVICE_TABLE = os.environ.get("DEVICE_TABLE", "smarthome_devices")
+# Parallele Abfragen/Updates im Batch-Modus
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "8"))
 
-ssm = boto3.client("ssm")
-table = boto3.resource("dynamodb").Table(DEVICE_TABLE)
+table = Table(DEVICE_TABLE)
+state_store = DeviceStateStore(table)
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
 
+# Cache item_name -> device_id für warme Container. Die meisten OpenHAB-Items
+# sind keine Alexa-Geräte, sie werden negativ gecacht (UNKNOWN_ITEM) und
+# ohne DynamoDB-Zugriff verworfen. Der Record selbst wird nicht gecacht,
+# State und pending_response ändern sich auch über die Skill-Lambda.
+ITEM_CACHE_SIZE = int(os.environ.get("ITEM_CACHE_SIZE", "1024"))
+ITEM_CACHE_TTL = float(os.environ.get("ITEM_CACHE_TTL", "300"))
+UNKNOWN_ITEM_TTL = float(os.environ.get("UNKNOWN_ITEM_TTL", "300"))
+UNKNOWN_ITEM = False
+item_cache = LRUCache(maxsize=ITEM_CACHE_SIZE, ttl=ITEM_CACHE_TTL)
 
-def float_to_decimal(obj):
-    """Konvertiert Floats/Dicts rekursiv für DynamoDB."""
-    if isinstance(obj, float):
-        return Decimal(str(obj))
-    if isinstance(obj, dict):
-        return {k: float_to_decimal(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [float_to_decimal(i) for i in obj]
-    return obj
+# Drosselung der ChangeReports (Totband pro Gerät bzw. Capability)
+throttle = ChangeReportThrottle()
 
 
-def get_valid_access_token():
-    try:
-        res = ssm.get_parameter(Name="/alexa/access_token", WithDecryption=True)
-        return res["Parameter"]["Value"]
-    except Exception:
-        return refresh_alexa_token()
-
-
-def refresh_alexa_token():
-    logger.info("Refreshe LWA Token...")
-    refresh_token = ssm.get_parameter(Name="/alexa/refresh_token", WithDecryption=True)["Parameter"]["Value"]
-    url = "https://api.amazon.com/auth/o2/token"
-    params = {
-        "grant_type": "refresh_token",
-        "refresh_token": refresh_token,
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET
-    }
-    data = urllib.parse.urlencode(params).encode("utf-8")
-    req = urllib.request.Request(url, data=data, method="POST")
-    req.add_header("Content-Type", "application/x-www-form-urlencoded")
-    with urllib.request.urlopen(req) as response:
-        res = json.loads(response.read().decode("utf-8"))
-        new_at = res["access_token"]
-        ssm.put_parameter(Name="/alexa/access_token", Value=new_at, Type="SecureString", Overwrite=True)
-        return new_at
-
-
-def attempt_send(token, endpoint_id, properties):
-    """Sendet ein ChangeReport Event an das Alexa Gateway."""
-    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+def is_pending(pending):
+    """Eine ausstehende DeferredResponse ist nur bis expires_at gültig."""
+    return bool(pending) and int(pending.get("expires_at", 0)) >= int(time.time())
 
-    # Der ChangeReport Aufbau
-    payload = {
-        "context": {
-            "properties": []  # Hier könnten zusätzliche Zustände stehen
-        },
-        "event": {
-            "header": {
-                "namespace": "Alexa",
-                "name": "ChangeReport",
-                "messageId": str(uuid.uuid4()),
-                "payloadVersion": "3"
-            },
-            "endpoint": {"endpointId": endpoint_id},
-            "payload": {
-                "change": {
-                    "cause": {"type": "PHYSICAL_INTERACTION"},
-                    "properties": properties  # Hier kommen die konvertierten Props rein
-                }
-            }
-        }
-    }
-
-    req = urllib.request.Request(ALEXA_EVENTS_URL, data=json.dumps(payload).encode('utf-8'), method='POST')
-    req.add_header("Authorization", f"Bearer {token}")
-    req.add_header("Content-Type", "application/json")
 
-    logger.info(f"Sende ChangeReport für {endpoint_id} an Alexa...")
-    with urllib.request.urlopen(req) as response:
-        return response.getcode()
+def warm_up_dynamodb():
+    """Baut die Verbindung zur DynamoDB auf (Query auf den GSI ohne Treffer)."""
+    table.query(
+        IndexName="item-name-index",
+        KeyConditionExpression="item_name = :n",
+        ExpressionAttributeValues={":n": "__warmup__"},
+        Limit=1
+    )
 
 
-def lambda_handler(event, context):
+def validate_item_cache():
+    """Bindet den Item-Cache an die Katalog-Version (Add/Update/Delete verwirft ihn)."""
     try:
-        item_name = event.get("item_name")
-        raw_state_oh = event.get("state")  # z.B. "OPEN", "ON", 22.5
+        item_cache.validate(current_catalog_version())
+    except Exception as e:
+        logger.warning(f"Katalog-Version nicht lesbar: {e}")
 
-        if not item_name or raw_state_oh is None:
-            logger.error("Event unvollständig.")
-            return
 
-        # 1. Device laden
-        res = table.query(IndexName="item-name-index", KeyConditionExpression=Key("item_name").eq(item_name))
-        items = res.get("Items", [])
-        if not items:
-            logger.warning(f"Item {item_name} unbekannt.")
-            return
+def handle_warmup():
+    return run_warmup({
+        "dynamodb": warm_up_dynamodb,
+        "catalog": validate_item_cache,
+        "controllers": warm_up_controllers,
+        "https": warm_up_https,
+        "lwa_token": get_valid_access_token
+    })
+
+
+def lookup_device_id(item_name):
+    """device_id zu einem OpenHAB-Item über den GSI (None, wenn unbekannt)."""
+    res = table.query(
+        IndexName="item-name-index",
+        KeyConditionExpression="item_name = :n",
+        ExpressionAttributeValues={":n": item_name},
+        ProjectionExpression="device_id"
+    )
+    items = res.get("Items", [])
+    return items[0]["device_id"] if items else None
+
 
-        record = items[0]
-        endpoint_id = record["device_id"]
+def query_item(item_name):
+    """
+    Lädt den Geräte-Record zu einem OpenHAB-Item (None, wenn unbekannt).
+    Die device_id kommt aus dem Item-Cache bzw. dem GSI, der Record selbst
+    immer per konsistentem GetItem (der State ist die Basis für den Diff).
+    Unbekannte Items kosten bis zum Ablauf des Negativ-Eintrags keinen Zugriff.
+    """
+    device_id = item_cache.get(item_name)
+    if device_id is UNKNOWN_ITEM:
+        return None
+    cached = device_id is not None
+    if not cached:
+        device_id = lookup_device_id(item_name)
+        if device_id is None:
+            item_cache.put(item_name, UNKNOWN_ITEM, ttl=UNKNOWN_ITEM_TTL)
+            return None
+        item_cache.put(item_name, device_id)
 
-        # 2. ÜBERSETZUNG: Hardware -> Alexa
-        device = AlexaDevice(record)
-        alexa_updates = {}
+    record = table.get_item(Key={"device_id": device_id}, ConsistentRead=True).get("Item")
+    if record and record.get("item_name") == item_name:
+        return record
+    item_cache.invalidate(item_name)
+    # Gerät gelöscht oder umbenannt -> einmal neu über den GSI auflösen
+    return query_item(item_name) if cached else None
 
+
+def resolve_items(item_names):
+    """
+    Löst alle Items eines Batches in einem Durchgang auf (jedes Item nur
+    einmal, parallel). Liefert die Records und die Items, deren Abfrage
+    fehlgeschlagen ist.
+    """
+    records, failed = {}, set()
+    futures = {batch_executor.submit(query_item, name): name for name in set(item_names)}
+    for future, name in futures.items():
+        try:
+            record = future.result()
+        except Exception as e:
+            logger.error(f"Abfrage für Item {name} fehlgeschlagen: {str(e)}")
+            failed.add(name)
+            continue
+        if record is not None:
+            records[name] = record
+    return records, failed
+
+
+def translate_states(device, states):
+    """
+    Übersetzt die Hardware-States (in Eingangsreihenfolge) in Alexa-Properties,
+    der letzte gewinnt. Liefert die Updates und den Controller je Property.
+    """
+    alexa_updates = {}
+    sources = {}
+    for raw_state_oh in states:
         # Wir fragen alle Controller des Geräts, wer dieses Update versteht
         for controller in device.controllers:
             update = controller.handle_update({"state": raw_state_oh})
             if update:
                 alexa_updates.update(update)
+                sources.update(dict.fromkeys(update, controller))
+    return alexa_updates, sources
+
+
+def process_device(record, states):
+    """
+    Verarbeitet alle Updates eines Geräts: ein UpdateItem mit dem
+    zusammengeführten State und höchstens ein Event an Alexa.
+    Fehler werden an den Aufrufer weitergereicht.
+    """
+    endpoint_id = record["device_id"]
+
+    # 2. ÜBERSETZUNG: Hardware -> Alexa
+    device = AlexaDevice(record)
+    alexa_updates, sources = translate_states(device, states)
+
+    if not alexa_updates:
+        logger.info("Keine Alexa-relevante Änderung erkannt.")
+        return
+
+    # Nur Attribute, die vom gespeicherten State abweichen. Eine Quittung
+    # für eine DeferredResponse bringt meist keinen neuen Wert (die
+    # Skill-Lambda hat ihn schon gespeichert), muss aber beantwortet werden.
+    stored_state = record.get("state") or {}
+    changes = {k: v for k, v in alexa_updates.items() if stored_state.get(k) != v}
+    # Werte, die Alexa noch nicht erfolgreich gemeldet wurden (z.B. POST
+    # fehlgeschlagen, der State aber schon gespeichert -> SQS-Retry)
+    reported_state = record.get("reported_state") or {}
+    unreported = {k: v for k, v in alexa_updates.items() if k not in reported_state or reported_state[k] != v}
+    # Nach einer Sprach-Direktive hat die Skill-Lambda den Snapshot entfernt,
+    # die Quittung der Bridge bringt meist keinen neuen Wert -> trotzdem neu schreiben
+    missing_snapshot = not record.get("reported_properties")
+    if not changes and not unreported and not missing_snapshot and not record.get("pending_response"):
+        logger.info(f"State von {endpoint_id} unverändert, kein Update.")
+        return
+
+    # Device-State lokal aktualisieren und die Properties für ReportState
+    # einmal rendern, sie werden zusammen mit dem State gespeichert
+    device.raw_state.update(alexa_updates)
+    reported_properties = device.render_properties()
+
+    # 3. DB UPDATE (nur die geänderten State-Attribute, bedingt: hat ein
+    # paralleler Schreiber die Werte schon gesetzt, wird nichts geschrieben)
+    if changes:
+        changes = state_store.save_if_changed(endpoint_id, changes, device.raw_state, reported_properties)
+    elif missing_snapshot:
+        state_store.save(endpoint_id, {}, device.raw_state, reported_properties)
+
+    # 4. CHANGE REPORT BAUEN
+    # Die gerenderten Properties sind bereits im Alexa-Format
+    all_props = json.loads(reported_properties)
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+    for p in all_props:
+        p["timeOfSample"] = now
+        p["uncertaintyInMilliseconds"] = 0
+
+    # 4a. Wartet Alexa noch auf die Response einer Direktive (DeferredResponse),
+    # ist dieses Update die Quittung der Bridge -> Response statt ChangeReport
+    pending = state_store.take_pending_response(endpoint_id) if record.get("pending_response") else None
+    if is_pending(pending):
+        logger.info(f"Sende nachgereichte Response für {endpoint_id} an Alexa...")
+        try:
+            status = send_event(lambda token: build_deferred_response(
+                endpoint_id, pending["correlation_token"], all_props, token))
+        except Exception:
+            # Für den Retry wieder hinterlegen, sonst würde ein ChangeReport daraus
+            state_store.save(endpoint_id, {}, pending_response=pending)
+            raise
+        logger.info(f"Alexa Gateway Status: {status}")
+        state_store.mark_reported(endpoint_id, {**reported_state, **alexa_updates})
+        throttle.mark_reported(list(alexa_updates))
+        return
+
+    # Gemeldet werden nur Properties, die sich in der DB wirklich geändert haben
+    # (oder noch nicht gemeldet wurden), gefiltert durch das Totband
+    candidates = {**unreported, **changes}
+    report = throttle.select(candidates, reported_state,
+                             lambda name: device.get_report_deadband(sources.get(name), name))
+    changed_props_for_alexa = [p for p in all_props if device.state_key(p) in report]
 
-        if not alexa_updates:
-            logger.info("Keine Alexa-relevante Änderung erkannt.")
+    if not changed_props_for_alexa:
+        return
+
+    # 5. SENDEN
+    logger.info(f"Sende ChangeReport für {endpoint_id} an Alexa...")
+    status = send_event(lambda token: build_change_report(endpoint_id, changed_props_for_alexa, token))
+    logger.info(f"Alexa Gateway Status: {status}")
+    # Erst nach erfolgreichem Versand als gemeldet merken
+    state_store.mark_reported(endpoint_id, {**reported_state, **{k: device.raw_state[k] for k in report}})
+    throttle.mark_reported(report)
+
+
+def extract_updates(event):
+    """
+    Liefert die Updates eines Batch-Events als Liste von (id, update) oder
+    None für ein einzelnes {item_name, state}.
+      SQS:         {"Records": [{"messageId": ..., "body": "{...}"}]}
+                   (der Body darf selbst eine Liste von Updates sein)
+      IoT-Rule:    [{...}, {...}] oder {"updates": [...]}
+    """
+    if isinstance(event, list):
+        return [(str(n), u) for n, u in enumerate(event)]
+    if "updates" in event:
+        return [(str(n), u) for n, u in enumerate(event["updates"])]
+    if "Records" not in event:
+        return None
+
+    updates = []
+    for message in event["Records"]:
+        message_id = message.get("messageId")
+        try:
+            body = json.loads(message.get("body") or "null")
+        except ValueError:
+            # Ein erneuter Versuch ändert daran nichts -> verwerfen
+            logger.error(f"Nachricht {message_id} ist kein JSON, verworfen.")
+            continue
+        for update in body if isinstance(body, list) else [body]:
+            updates.append((message_id, update))
+    return updates
+
+
+def handle_batch(updates):
+    """
+    Batch-Modus: alle Items in einem Durchgang auflösen, Updates pro Gerät
+    zusammenführen und die Geräte parallel speichern/melden.
+    Fehlgeschlagene Nachrichten werden als batchItemFailures gemeldet,
+    damit SQS nur diese erneut zustellt.
+    """
+    start = time.perf_counter()
+    valid = []
+    for message_id, update in updates:
+        if not isinstance(update, dict) or not update.get("item_name") or update.get("state") is None:
+            logger.error(f"Update {message_id} unvollständig, verworfen.")
+            continue
+        valid.append((message_id, update))
+
+    records, failed_items = resolve_items(u["item_name"] for _, u in valid)
+
+    # device_id -> (record, [states], [ids])
+    devices = {}
+    failures = []
+    for message_id, update in valid:
+        item_name = update["item_name"]
+        if item_name in failed_items:
+            failures.append(message_id)
+            continue
+        record = records.get(item_name)
+        if record is None:
+            logger.warning(f"Item {item_name} unbekannt.")
+            continue
+        entry = devices.setdefault(record["device_id"], (record, [], []))
+        entry[1].append(update["state"])
+        entry[2].append(message_id)
+
+    futures = {batch_executor.submit(process_device, record, states): (record, ids)
+               for record, states, ids in devices.values()}
+    for future, (record, ids) in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Fehler bei {record['device_id']}: {str(e)}")
+            failures.extend(ids)
+
+    # Eine Nachricht kann mehrere Updates enthalten -> jede ID nur einmal melden
+    failures = list(dict.fromkeys(failures))
+    logger.info(f"Batch: {len(updates)} Updates, {len(devices)} Geräte, {len(failures)} fehlgeschlagen "
+                f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    logger.info(f"Item-Cache: {item_cache.stats()}")
+    logger.info(f"ChangeReports: {throttle.stats()}")
+    return {"batchItemFailures": [{"itemIdentifier": i} for i in failures]}
+
+
+def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return handle_warmup()
+
+    validate_item_cache()
+
+    try:
+        updates = extract_updates(event)
+        if updates is not None:
+            return handle_batch(updates)
+        handle_single(event)
+    finally:
+        emit_metrics(throttle.drain())
+
+
+def handle_single(event):
+    """Ein einzelnes {item_name, state} (IoT-Rule ohne Batching)."""
+    try:
+        item_name = event.get("item_name")
+        raw_state_oh = event.get("state")  # z.B. "OPEN", "ON", 22.5
+
+        if not item_name or raw_state_oh is None:
+            logger.error("Event unvollständig.")
             return
 
-        # 3. DB UPDATE (nur wenn sich wirklich was geändert hat)
-        new_state_ddb = float_to_decimal(alexa_updates)
-        table.update_item(
-            Key={"device_id": endpoint_id},
-            UpdateExpression="SET #s = :val",
-            ExpressionAttributeNames={"#s": "state"},
-            ExpressionAttributeValues={":val": new_state_ddb}
-        )
-
-        # 4. CHANGE REPORT BAUEN
-        # Wir müssen die alexa_updates in das Property-Format von Alexa bringen
-        device.raw_state.update(alexa_updates)  # Device-State lokal aktualisieren
-        all_props = device.get_all_properties()
-
-        # Wir filtern nur die Properties, die wir gerade geändert haben
-        # (Einfacher MVP-Check: Ist der Name der Property im alexa_updates Dict?)
-        changed_props_for_alexa = []
-        for p in all_props:
-            if p["name"] in alexa_updates:
-                p["timeOfSample"] = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-                p["uncertaintyInMilliseconds"] = 0
-                changed_props_for_alexa.append(p)
-
-        if not changed_props_for_alexa:
+        # 1. Device laden
+        record = query_item(item_name)
+        if record is None:
+            logger.warning(f"Item {item_name} unbekannt.")
             return
 
-        # 5. SENDEN
-        token = get_valid_access_token()
-        try:
-            status = attempt_send(token, endpoint_id, changed_props_for_alexa)
-            logger.info(f"Alexa Gateway Status: {status}")
-        except urllib.error.HTTPError as e:
-            if e.code == 401:
-                token = refresh_alexa_token()
-                attempt_send(token, endpoint_id, changed_props_for_alexa)
-            else:
-                raise e
+        process_device(record, [raw_state_oh])
 
     except Exception as e:
         logger.error(f"Fehler: {str(e)}")
\ No newline at end of file
@@ -1,11 +1,13 @@
-import boto3, json, os, uuid
-from decimal import Decimal
+import json, os, uuid
+from alexa_dynamodb import Table
+from alexa_device_report import invalidate_catalog, sync_discovery
+from alexa_discovery import DISCOVERY_INDEX_ATTRIBUTE, DISCOVERY_INDEX_VALUE
 
-table = boto3.resource("dynamodb").Table(os.environ["DEVICE_TABLE"])
+table = Table(os.environ["DEVICE_TABLE"])
 
 def add_device(event, context=None):
     try:
-        body = json.loads(event.get("body") or "{}", parse_float=Decimal)
+        body = json.loads(event.get("body") or "{}")
     except Exception as e:
         return {"statusCode": 400, "body": json.dumps({"error": "Invalid JSON"})}
 
@@ -25,7 +27,14 @@ def add_device(event, context=None):
         "item_name": body.get("item_name", "")
     }
     
+    # Nur enabled Geräte bekommen das Attribut für den sparse Discovery-Index
+    if item["enabled"]:
+        item[DISCOVERY_INDEX_ATTRIBUTE] = DISCOVERY_INDEX_VALUE
+
     table.put_item(Item=item)
+    # Discovery-Dokument invalidieren und Alexa das neue Gerät melden
+    invalidate_catalog()
+    sync_discovery(table, item)
     
     return {
         "statusCode": 201,
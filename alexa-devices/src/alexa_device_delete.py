@@ -1,9 +1,15 @@
-import boto3, json, os
-table = boto3.resource("dynamodb").Table(os.environ["DEVICE_TABLE"])
+import json, os
+from alexa_dynamodb import Table
+from alexa_device_report import invalidate_catalog, sync_discovery_delete
+
+table = Table(os.environ["DEVICE_TABLE"])
 
 def delete_device(event, context=None):
     device_id = event["pathParameters"]["device_id"]
-    table.delete_item(Key={"device_id": device_id})
+    res = table.delete_item(Key={"device_id": device_id}, ReturnValues="ALL_OLD")
+    # Discovery-Dokument invalidieren und Alexa das Löschen melden
+    invalidate_catalog()
+    sync_discovery_delete(res.get("Attributes"))
     return {
         "statusCode": 200,
         "headers": {"Access-Control-Allow-Origin": os.environ.get("CORS_DOMAIN", "*")},
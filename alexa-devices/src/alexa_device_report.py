@@ -0,0 +1,55 @@
+import logging
+from alexa_catalog import bump_catalog_version
+from alexa_discovery import report_device_update, report_device_delete
+
+logger = logging.getLogger()
+
+
+def invalidate_catalog():
+    """
+    Erhöht die Katalog-Version (Discovery-Dokument und Geräte-Caches der
+    Skill-Lambda verfallen). Das Gerät ist zu diesem Zeitpunkt schon
+    gespeichert, Fehler werden daher nur geloggt.
+    """
+    try:
+        return bump_catalog_version()
+    except Exception as e:
+        logger.error(f"Katalog-Version nicht erhöht: {str(e)}")
+        return None
+
+
+def sync_discovery(table, record):
+    """
+    Meldet die Änderung eines Geräts inkrementell an Alexa, statt eine
+    komplette Discovery zu erzwingen. Fehler werden nur geloggt.
+    """
+    device_id = record["device_id"]
+    try:
+        if record.get("enabled", True):
+            new_hash = report_device_update(record)
+            if new_hash:
+                table.update_item(
+                    Key={"device_id": device_id},
+                    UpdateExpression="SET discovery_hash = :h",
+                    ExpressionAttributeValues={":h": new_hash}
+                )
+        elif record.get("discovery_hash"):
+            # Deaktiviert -> für Alexa ist das Gerät gelöscht
+            report_device_delete([device_id])
+            table.update_item(
+                Key={"device_id": device_id},
+                UpdateExpression="REMOVE discovery_hash"
+            )
+    except Exception as e:
+        logger.error(f"Discovery Report für {device_id} fehlgeschlagen: {str(e)}")
+
+
+def sync_discovery_delete(record):
+    """Meldet ein gelöschtes Gerät per DeleteReport an Alexa."""
+    # Nie an Alexa gemeldete Geräte brauchen keinen DeleteReport
+    if not record or not (record.get("enabled", True) or record.get("discovery_hash")):
+        return
+    try:
+        report_device_delete([record["device_id"]])
+    except Exception as e:
+        logger.error(f"DeleteReport für {record['device_id']} fehlgeschlagen: {str(e)}")
@@ -1,11 +1,13 @@
-import boto3, json, os, logging
-from decimal import Decimal
+import json, os, logging
+from alexa_dynamodb import Table
+from alexa_device_report import invalidate_catalog, sync_discovery
+from alexa_discovery import DISCOVERY_INDEX_ATTRIBUTE, DISCOVERY_INDEX_VALUE
 
 # Logging konfigurieren
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-table = boto3.resource("dynamodb").Table(os.environ["DEVICE_TABLE"])
+table = Table(os.environ["DEVICE_TABLE"])
 
 def update_device(event, context=None):
     device_id = event.get("pathParameters", {}).get("device_id")
@@ -16,7 +18,7 @@ def update_device(event, context=None):
     logger.info(f"Raw Body: {raw_body}")
 
     try:
-        body = json.loads(raw_body, parse_float=Decimal)
+        body = json.loads(raw_body)
     except Exception as e:
         logger.error(f"JSON Parse Error: {str(e)}")
         return {"statusCode": 400, "body": json.dumps({"error": "Invalid JSON"})}
@@ -62,10 +64,28 @@ def update_device(event, context=None):
         logger.warning("No valid fields found to update!")
         return {"statusCode": 400, "body": json.dumps({"error": "No valid fields in body"})}
 
+    # Attribut für den sparse Discovery-Index mit 'enabled' synchron halten
+    update_expression = "SET " + ", ".join(update_parts)
+    remove_parts = []
+    if "enabled" in body:
+        if body["enabled"]:
+            update_expression += f", {DISCOVERY_INDEX_ATTRIBUTE} = :disc"
+            attr_values[":disc"] = DISCOVERY_INDEX_VALUE
+        else:
+            remove_parts.append(DISCOVERY_INDEX_ATTRIBUTE)
+
+    # Vorgerenderte ReportState-Properties passen nicht mehr zu State/Capabilities
+    if "state" in body or "capabilities" in body:
+        remove_parts.append("reported_properties")
+
+    if remove_parts:
+        update_expression += " REMOVE " + ", ".join(remove_parts)
+
     update_params = {
         "Key": {"device_id": device_id},
-        "UpdateExpression": "SET " + ", ".join(update_parts),
-        "ExpressionAttributeValues": attr_values
+        "UpdateExpression": update_expression,
+        "ExpressionAttributeValues": attr_values,
+        "ReturnValues": "ALL_NEW"
     }
     
     if attr_names:
@@ -77,6 +97,10 @@ def update_device(event, context=None):
     try:
         response = table.update_item(**update_params)
         logger.info(f"DynamoDB Success: {json.dumps(response, default=str)}")
+        # Discovery-Dokument invalidieren (der State ist nicht Teil der Discovery)
+        if any(field in body for field in fields if field != "state"):
+            invalidate_catalog()
+            sync_discovery(table, response["Attributes"])
     except Exception as e:
         logger.error(f"DynamoDB Exception: {str(e)}")
         return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
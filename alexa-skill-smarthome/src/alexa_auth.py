@@ -1,19 +1,156 @@
 # alexa_auth.py
 
-import urllib.request
-import urllib.parse
 import json
 import logging
-import uuid
-import boto3
 import os
+import threading
+import time
+import uuid
 
 logger = logging.getLogger()
-ssm = boto3.client("ssm")
+
+# SSM Client erst bei Bedarf (AcceptGrant / Token-Cache leer oder abgelaufen) anlegen
+_ssm = None
+
+
+def get_ssm():
+    global _ssm
+    if _ssm is None:
+        import boto3
+        _ssm = boto3.client("ssm")
+    return _ssm
 
 CLIENT_ID = os.environ.get("ALEXA_CLIENT_ID")
 CLIENT_SECRET = os.environ.get("ALEXA_CLIENT_SECRET")
 
+LWA_TOKEN_URL = "https://api.amazon.com/auth/o2/token"
+
+ACCESS_TOKEN_PARAMETER = "/alexa/access_token"
+REFRESH_TOKEN_PARAMETER = "/alexa/refresh_token"
+
+# Access Token so viele Sekunden vor Ablauf erneuern
+TOKEN_REFRESH_MARGIN = int(os.environ.get("TOKEN_REFRESH_MARGIN", "300"))
+
+
+def request_lwa_token(params):
+    """POST an den LWA Token-Endpunkt, liefert die JSON-Antwort."""
+    # urllib erst hier laden (Cold Start)
+    import urllib.parse
+    import urllib.request
+
+    data = urllib.parse.urlencode(params).encode("utf-8")
+    req = urllib.request.Request(LWA_TOKEN_URL, data=data, method="POST")
+    req.add_header("Content-Type", "application/x-www-form-urlencoded;charset=UTF-8")
+    with urllib.request.urlopen(req) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def load_access_token():
+    """
+    Access Token und Ablaufzeit aus SSM. Der Parameter enthält
+    {"access_token", "expires_at"}; ältere Werte ohne Ablaufzeit gelten als abgelaufen.
+    """
+    value = get_ssm().get_parameter(Name=ACCESS_TOKEN_PARAMETER, WithDecryption=True)["Parameter"]["Value"]
+    try:
+        stored = json.loads(value)
+        return stored["access_token"], float(stored["expires_at"])
+    except (ValueError, TypeError, KeyError):
+        return value, 0.0
+
+
+def store_access_token(access_token, expires_at):
+    get_ssm().put_parameter(
+        Name=ACCESS_TOKEN_PARAMETER,
+        Value=json.dumps({"access_token": access_token, "expires_at": int(expires_at)}),
+        Type="SecureString",
+        Overwrite=True
+    )
+
+
+def store_refresh_token(refresh_token):
+    get_ssm().put_parameter(
+        Name=REFRESH_TOKEN_PARAMETER,
+        Value=refresh_token,
+        Type="SecureString",
+        Overwrite=True
+    )
+
+
+class TokenManager:
+    """
+    Hält das LWA Access Token samt Ablaufzeit im warmen Container.
+    Solange das Token noch länger als refresh_margin gilt, gibt es keinen
+    SSM-Zugriff. Erneuert wird vor dem Ablauf und nur von einem Thread
+    (Single-Flight), die anderen warten und übernehmen sein Token.
+    """
+
+    def __init__(self, refresh_margin=TOKEN_REFRESH_MARGIN, clock=time.time):
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.access_token = None
+        self.expires_at = 0.0
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def _is_fresh(self, expires_at=None):
+        expires_at = self.expires_at if expires_at is None else expires_at
+        return self.clock() < expires_at - self.refresh_margin
+
+    def get(self):
+        if self.access_token and self._is_fresh():
+            return self.access_token
+        with self._lock:
+            # Ein anderer Thread hat inzwischen erneuert
+            if self.access_token and self._is_fresh():
+                return self.access_token
+            # Vielleicht hat ein anderer Container schon erneuert
+            try:
+                access_token, expires_at = load_access_token()
+                if self._is_fresh(expires_at):
+                    self.access_token, self.expires_at = access_token, expires_at
+                    return access_token
+            except Exception as e:
+                logger.info(f"Kein gültiges Access Token in SSM: {e}")
+            return self._refresh()
+
+    def refresh(self, rejected_token=None):
+        """
+        Erneuert das Token (z.B. nach 401). Hat ein anderer Thread das
+        abgelehnte Token bereits ersetzt, wird dessen Token übernommen.
+        """
+        with self._lock:
+            if rejected_token and self.access_token and self.access_token != rejected_token and self._is_fresh():
+                return self.access_token
+            return self._refresh()
+
+    def _refresh(self):
+        logger.info("Refreshe LWA Token...")
+        refresh_token = get_ssm().get_parameter(Name=REFRESH_TOKEN_PARAMETER, WithDecryption=True)["Parameter"]["Value"]
+        res = request_lwa_token({
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+            "client_id": CLIENT_ID,
+            "client_secret": CLIENT_SECRET
+        })
+        self.refreshes += 1
+        if res.get("refresh_token") and res["refresh_token"] != refresh_token:
+            store_refresh_token(res["refresh_token"])
+        return self._seed(res["access_token"], res.get("expires_in", 3600))
+
+    def seed(self, access_token, expires_in):
+        """Übernimmt ein frisches Token (AcceptGrant) und speichert es in SSM."""
+        with self._lock:
+            return self._seed(access_token, expires_in)
+
+    def _seed(self, access_token, expires_in):
+        expires_at = self.clock() + int(expires_in)
+        store_access_token(access_token, expires_at)
+        self.access_token, self.expires_at = access_token, expires_at
+        return access_token
+
+
+token_manager = TokenManager()
+
 def handle_accept_grant(request):
     """Verarbeitet den Alexa.Authorization / AcceptGrant Request."""
     payload = request.get("directive", {}).get("payload", {})
@@ -23,31 +160,23 @@ def handle_accept_grant(request):
         logger.error("AcceptGrant fehlgeschlagen: Kein grant_code vorhanden.")
         return {"error": "no_grant_code"}
 
-    url = "https://api.amazon.com/auth/o2/token"
     params = {
         "grant_type": "authorization_code",
         "code": grant_code,
         "client_id": CLIENT_ID,
         "client_secret": CLIENT_SECRET,
     }
-    
-    data = urllib.parse.urlencode(params).encode("utf-8")
-    req = urllib.request.Request(url, data=data, method="POST")
-    req.add_header("Content-Type", "application/x-www-form-urlencoded;charset=UTF-8")
 
     try:
-        with urllib.request.urlopen(req) as response:
-            res_body = json.loads(response.read().decode("utf-8"))
-            refresh_token = res_body.get("refresh_token")
-            
-            if refresh_token:
-                ssm.put_parameter(
-                    Name="/alexa/refresh_token", 
-                    Value=refresh_token, 
-                    Type="SecureString", 
-                    Overwrite=True
-                )
-                logger.info("ERFOLG: Refresh Token in SSM gespeichert.")
+        res_body = request_lwa_token(params)
+        refresh_token = res_body.get("refresh_token")
+
+        if refresh_token:
+            store_refresh_token(refresh_token)
+            logger.info("ERFOLG: Refresh Token in SSM gespeichert.")
+        # Das mitgelieferte Access Token direkt verwenden (kein Refresh nötig)
+        if res_body.get("access_token"):
+            token_manager.seed(res_body["access_token"], res_body.get("expires_in", 3600))
     except Exception as e:
         logger.error(f"Amazon Auth API Fehler: {str(e)}")
         # In der Produktivphase sollte hier ein Error-Event an Alexa zurückgehen
@@ -63,4 +192,14 @@ def handle_accept_grant(request):
             },
             "payload": {}
         }
-    }
\ No newline at end of file
+    }
+
+
+def get_valid_access_token():
+    """Liefert das LWA Access Token für das Alexa Event Gateway (aus dem Container-Cache)."""
+    return token_manager.get()
+
+
+def refresh_alexa_token(rejected_token=None):
+    """Holt mit dem Refresh Token ein neues Access Token und legt es in SSM ab."""
+    return token_manager.refresh(rejected_token)
@@ -0,0 +1,202 @@
+# alexa_catalog.py
+#
+# Vorberechnetes Discovery-Dokument in einer eigenen DynamoDB-Tabelle
+# (Partition Key: catalog_id, Typ String).
+#
+#   discovery#0  -> Kopf: catalog_version, built_version, chunk_count, endpoints
+#   discovery#N  -> weitere Chunks: built_version, endpoints
+#
+# Die alexa-devices Lambda erhöht catalog_version bei jedem Add/Update/Delete.
+# Stimmt built_version nicht mehr mit catalog_version überein, ist das
+# Dokument veraltet und wird bei der nächsten Discovery neu gebaut.
+
+import logging
+import os
+import time
+
+from alexa_dynamodb import Table, batch_get_item
+
+logger = logging.getLogger()
+
+CATALOG_TABLE_NAME = os.environ.get("CATALOG_TABLE", "smarthome_catalog")
+
+# DynamoDB erlaubt max. 400 KB pro Item, wir lassen Luft für die Attribute
+CATALOG_CHUNK_BYTES = int(os.environ.get("CATALOG_CHUNK_BYTES", str(350 * 1024)))
+
+# Anzahl der Folge-Chunks pro BatchGetItem beim Lesen
+CATALOG_READ_AHEAD = int(os.environ.get("CATALOG_READ_AHEAD", "4"))
+
+# Wie oft ein warmer Container die Katalog-Version höchstens nachliest (Sekunden)
+CATALOG_VERSION_CHECK_SECONDS = float(os.environ.get("CATALOG_VERSION_CHECK_SECONDS", "30"))
+
+DOCUMENT_PREFIX = "discovery#"
+HEAD_KEY = DOCUMENT_PREFIX + "0"
+
+catalog_table = Table(CATALOG_TABLE_NAME)
+
+
+def bump_catalog_version():
+    """Erhöht die Katalog-Version atomar und liefert die neue Version."""
+    res = catalog_table.update_item(
+        Key={"catalog_id": HEAD_KEY},
+        UpdateExpression="ADD catalog_version :one",
+        ExpressionAttributeValues={":one": 1},
+        ReturnValues="UPDATED_NEW"
+    )
+    return int(res["Attributes"]["catalog_version"])
+
+
+class StaleDiscoveryDocument(Exception):
+    """Das Dokument wurde während des Lesens ersetzt oder ist unvollständig."""
+
+
+_version_check = {"version": None, "checked_at": 0.0}
+
+
+def get_catalog_version():
+    """Liest die aktuelle Katalog-Version (ein kleines GetItem)."""
+    res = catalog_table.get_item(
+        Key={"catalog_id": HEAD_KEY},
+        ProjectionExpression="catalog_version"
+    )
+    return int(res.get("Item", {}).get("catalog_version", 0))
+
+
+def current_catalog_version(max_age=None):
+    """
+    Katalog-Version als günstiger Versions-Stempel für Caches.
+    Der Wert wird pro Container höchstens alle max_age Sekunden nachgelesen.
+    """
+    max_age = CATALOG_VERSION_CHECK_SECONDS if max_age is None else max_age
+    now = time.monotonic()
+    if _version_check["version"] is None or now - _version_check["checked_at"] >= max_age:
+        _version_check["version"] = get_catalog_version()
+        _version_check["checked_at"] = now
+    return _version_check["version"]
+
+
+def load_discovery_document():
+    """
+    Lädt den Kopf des vorberechneten Discovery-Dokuments.
+    Liefert (encoded_endpoints, catalog_version). encoded_endpoints ist ein
+    Generator über die Endpunkte als JSON-Strings, der die Folge-Chunks erst
+    beim Iterieren nachlädt, oder None, wenn das Dokument fehlt oder nicht zur
+    aktuellen Katalog-Version passt.
+    """
+    head = catalog_table.get_item(Key={"catalog_id": HEAD_KEY}).get("Item")
+    if not head:
+        return None, 0
+
+    catalog_version = int(head.get("catalog_version", 0))
+    built_version = head.get("built_version")
+    if built_version is None or int(built_version) != catalog_version:
+        logger.info(f"Discovery-Dokument veraltet (gebaut: {built_version}, aktuell: {catalog_version})")
+        return None, catalog_version
+
+    return _iter_document(head, catalog_version), catalog_version
+
+
+def _iter_document(head, catalog_version):
+    """Liefert die Endpunkte des Dokuments chunkweise (wirft StaleDiscoveryDocument)."""
+    yield from head.get("endpoints", [])
+
+    chunk_count = int(head.get("chunk_count", 1))
+    for start in range(1, chunk_count, CATALOG_READ_AHEAD):
+        numbers = range(start, min(start + CATALOG_READ_AHEAD, chunk_count))
+        chunks = _batch_get([{"catalog_id": f"{DOCUMENT_PREFIX}{n}"} for n in numbers])
+        if len(chunks) != len(numbers):
+            raise StaleDiscoveryDocument("Discovery-Dokument unvollständig")
+
+        for chunk in sorted(chunks, key=lambda c: int(c["catalog_id"].split("#")[1])):
+            # Ein halb geschriebenes Dokument erkennen wir an abweichenden Versionen
+            if int(chunk.get("built_version", -1)) != catalog_version:
+                raise StaleDiscoveryDocument("Discovery-Dokument inkonsistent")
+            yield from chunk.get("endpoints", [])
+
+
+class DiscoveryDocumentWriter:
+    """
+    Schreibt das Discovery-Dokument für catalog_version chunkweise, während
+    die Endpunkte gerendert werden. Im Speicher liegen nur der Kopf-Chunk
+    und der aktuelle Chunk.
+    """
+
+    def __init__(self, catalog_version):
+        self.catalog_version = catalog_version
+        self.head = None
+        self.chunk = []
+        self.chunk_bytes = 0
+        self.chunk_count = 0
+        self.endpoint_count = 0
+        self.failed = False
+
+    def add(self, encoded):
+        """Nimmt einen serialisierten Endpunkt (JSON-String) auf."""
+        if self.chunk and self.chunk_bytes + len(encoded) > CATALOG_CHUNK_BYTES:
+            self._flush()
+        self.chunk.append(encoded)
+        self.chunk_bytes += len(encoded)
+        self.endpoint_count += 1
+
+    def close(self):
+        """Schreibt den letzten Chunk und zuletzt den Kopf, der das Dokument gültig macht."""
+        if self.chunk or self.head is None:
+            self._flush()
+
+        # catalog_version bleibt unangetastet, damit parallele Bumps nicht verloren gehen
+        catalog_table.update_item(
+            Key={"catalog_id": HEAD_KEY},
+            UpdateExpression="SET built_version = :v, chunk_count = :c, endpoints = :e",
+            ExpressionAttributeValues={":v": self.catalog_version, ":c": self.chunk_count, ":e": self.head}
+        )
+        logger.info(f"Discovery-Dokument v{self.catalog_version} gespeichert ({self.endpoint_count} Endpunkte, {self.chunk_count} Chunks)")
+
+    def write_through(self, encoded_endpoints):
+        """
+        Reicht die Endpunkte unverändert durch und schreibt sie nebenbei mit.
+        Fehler beim Schreiben werden geloggt, die Discovery läuft weiter.
+        """
+        for encoded in encoded_endpoints:
+            if not self.failed:
+                try:
+                    self.add(encoded)
+                except Exception as e:
+                    self._fail(e)
+            yield encoded
+
+        if not self.failed:
+            try:
+                self.close()
+            except Exception as e:
+                self._fail(e)
+
+    def _flush(self):
+        # Der erste Chunk ist der Kopf und wird erst in close() geschrieben
+        if self.head is None:
+            self.head = self.chunk
+        else:
+            catalog_table.put_item(Item={
+                "catalog_id": f"{DOCUMENT_PREFIX}{self.chunk_count}",
+                "built_version": self.catalog_version,
+                "endpoints": self.chunk
+            })
+        self.chunk_count += 1
+        self.chunk = []
+        self.chunk_bytes = 0
+
+    def _fail(self, error):
+        logger.error(f"Discovery-Dokument konnte nicht gespeichert werden: {error}")
+        self.failed = True
+        self.head = None
+        self.chunk = []
+
+
+def _batch_get(keys):
+    """BatchGetItem inklusive UnprocessedKeys."""
+    items = []
+    request = {CATALOG_TABLE_NAME: {"Keys": keys}}
+    while request:
+        res = batch_get_item(RequestItems=request)
+        items.extend(res.get("Responses", {}).get(CATALOG_TABLE_NAME, []))
+        request = res.get("UnprocessedKeys") or None
+    return items
@@ -0,0 +1,136 @@
+# alexa_dedup.py
+#
+# Erkennt von Alexa wiederholte Direktiven (Retry nach Timeout) anhand von
+# header.messageId + correlationToken, damit die Hardware nicht doppelt
+# schaltet. Zwei Stufen:
+#   1. In-Process LRU im warmen Container
+#   2. Conditional Put in einer DynamoDB-Tabelle (Partition Key: directive_key,
+#      Typ String) mit TTL-Attribut expires_at, für Retries auf anderen Containern
+# Eine laufende Direktive hält ihren Eintrag nur DEDUP_CLAIM_SECONDS, erst mit
+# der gespeicherten Antwort gilt DEDUP_TTL_SECONDS. Stirbt der erste Aufruf
+# (Exception, Timeout), darf der Retry die Direktive danach selbst ausführen.
+
+import json
+import logging
+import os
+import time
+
+from alexa_cache import LRUCache
+from alexa_dynamodb import Table, error_code
+
+logger = logging.getLogger()
+
+DEDUP_TABLE_NAME = os.environ.get("DEDUP_TABLE", "smarthome_directives")
+
+# Alexa wiederholt innerhalb weniger Sekunden, 5 Minuten reichen dicke
+DEDUP_TTL_SECONDS = int(os.environ.get("DEDUP_TTL_SECONDS", "300"))
+DEDUP_CACHE_SIZE = int(os.environ.get("DEDUP_CACHE_SIZE", "512"))
+# Reservierung einer laufenden Direktive (Alexa wartet max. 8 Sekunden)
+DEDUP_CLAIM_SECONDS = int(os.environ.get("DEDUP_CLAIM_SECONDS", "8"))
+# So lange wartet ein Duplikat auf die Antwort des ersten Aufrufs
+DEDUP_WAIT_SECONDS = float(os.environ.get("DEDUP_WAIT_SECONDS", "3"))
+DEDUP_POLL_SECONDS = 0.2
+
+
+def directive_key(directive):
+    """messageId#correlationToken oder None, wenn keine messageId vorhanden ist."""
+    header = directive.get("header", {})
+    message_id = header.get("messageId")
+    if not message_id:
+        return None
+    return f"{message_id}#{header.get('correlationToken', '')}"
+
+
+class DirectiveDeduplicator:
+    """
+    claim() reserviert eine Direktive, complete() hinterlegt die Antwort,
+    release() gibt sie nach einem Fehler wieder frei (der Retry soll dann
+    erneut ausgeführt werden). Fehler der Dedup-Tabelle blockieren nie
+    die eigentliche Direktive.
+    """
+
+    def __init__(self, table=None, cache=None, ttl=DEDUP_TTL_SECONDS, claim_ttl=DEDUP_CLAIM_SECONDS,
+                 wait=DEDUP_WAIT_SECONDS, clock=time.time, sleep=time.sleep):
+        self._table = table
+        self.cache = cache if cache is not None else LRUCache(maxsize=DEDUP_CACHE_SIZE, ttl=ttl)
+        self.ttl = ttl
+        self.claim_ttl = claim_ttl
+        self.wait = wait
+        self.clock = clock
+        self.sleep = sleep
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = Table(DEDUP_TABLE_NAME)
+        return self._table
+
+    def claim(self, key):
+        """
+        Liefert (neu, gecachte_antwort). Läuft der erste Aufruf noch, wartet
+        ein Duplikat bis zu self.wait Sekunden auf dessen Antwort. Wird der
+        Eintrag in der Zeit freigegeben oder läuft ab, übernimmt das Duplikat
+        (neu=True). Sonst (False, None): die Direktive ist noch in Arbeit.
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            return False, cached
+
+        deadline = self.clock() + self.wait
+        while True:
+            if self._put_claim(key):
+                return True, None
+
+            # Duplikat -> gespeicherte Antwort holen (falls der erste Aufruf fertig ist)
+            try:
+                item = self.table.get_item(Key={"directive_key": key}, ConsistentRead=True).get("Item")
+            except Exception as e:
+                logger.error(f"Dedup-Eintrag {key} nicht lesbar: {e}")
+                return False, None
+            if item and item.get("response"):
+                response = json.loads(item["response"])
+                self.cache.put(key, response)
+                return False, response
+
+            if self.clock() >= deadline:
+                return False, None
+            # Eintrag weg oder abgelaufen -> sofort erneut reservieren
+            if item and int(item.get("expires_at", 0)) >= int(self.clock()):
+                self.sleep(DEDUP_POLL_SECONDS)
+
+    def _put_claim(self, key):
+        """Reserviert die Direktive für claim_ttl Sekunden (True, wenn das geklappt hat)."""
+        now = int(self.clock())
+        try:
+            self.table.put_item(
+                Item={"directive_key": key, "expires_at": now + self.claim_ttl},
+                ConditionExpression="attribute_not_exists(directive_key) OR expires_at < :now",
+                ExpressionAttributeValues={":now": now}
+            )
+            return True
+        except Exception as e:
+            if error_code(e) != "ConditionalCheckFailedException":
+                # Fehler der Dedup-Tabelle blockieren nie die Direktive
+                logger.error(f"Dedup-Tabelle nicht erreichbar: {e}")
+                return True
+        return False
+
+    def complete(self, key, response, encoded=None):
+        self.cache.put(key, response)
+        try:
+            self.table.update_item(
+                Key={"directive_key": key},
+                UpdateExpression="SET #r = :r, expires_at = :e",
+                ExpressionAttributeNames={"#r": "response"},
+                ExpressionAttributeValues={":r": encoded or json.dumps(response),
+                                           ":e": int(self.clock()) + self.ttl}
+            )
+        except Exception as e:
+            logger.error(f"Antwort für {key} nicht gespeichert: {e}")
+
+    def release(self, key):
+        self.cache.invalidate(key)
+        try:
+            self.table.delete_item(Key={"directive_key": key})
+        except Exception as e:
+            logger.error(f"Dedup-Eintrag {key} nicht freigegeben: {e}")
@@ -1,36 +1,40 @@
 # alexa_device.py
 
-import boto3
+import json
 import os
 from decimal import Decimal
 
+from alexa_state_store import get_state_store
+
 
 DEFAULT_MANUFACTURER_NAME = os.environ.get("MANUFACTURER_NAME", "A.C.M.E. Corp")
+DEFAULT_DEFERRAL_SECONDS = int(os.environ.get("DEFAULT_DEFERRAL_SECONDS", "10"))
+
+from controllers import CONTROLLER_MAPPING, load_controller
+from controllers.capability_cache import (
+    ENDPOINT_HEALTH_CAPABILITY, ALEXA_CAPABILITY, ENDPOINT_HEALTH_JSON, ALEXA_JSON,
+    JSON_SEPARATORS, get_capability_fragment, get_capability_json
+)
+from controllers.registry import get_dispatch_table
+
+def _json_number(obj):
+    """DynamoDB liefert Zahlen als Decimal, JSON braucht int/float."""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
 
-from controllers import (
-    PowerController, BrightnessController, SpeakerController, 
-    TemperatureSensor, RollershutterController, ColorController,
-    ColorTemperatureController, MotionSensor, ContactSensor,
-    HumiditySensor, ThermostatController, StepSpeakerController,
-    SceneController, ToggleController
+# Attribute, die AlexaDevice für die Discovery liest (ProjectionExpression).
+# 'state' gehört bewusst nicht dazu.
+DISCOVERY_ATTRIBUTES = (
+    "device_id", "item_name", "friendly_name", "description", "manufacturer_name",
+    "firmware_version", "software_version", "model_name", "serial_number",
+    "device_category", "capabilities", "proactivelyReported", "retrievable",
+    "OpenHABHandleGeneric", "enabled"
 )
 
-CONTROLLER_MAPPING = {
-    "PowerController": PowerController,
-    "BrightnessController": BrightnessController,
-    "SpeakerController": SpeakerController,
-    "TemperatureSensor": TemperatureSensor,
-    "RollershutterController": RollershutterController,
-    "ColorController": ColorController,
-    "ColorTemperatureController": ColorTemperatureController,
-    "MotionSensor": MotionSensor,
-    "ContactSensor": ContactSensor,
-    "HumiditySensor": HumiditySensor,
-    "ThermostatController": ThermostatController,
-    "StepSpeakerController": StepSpeakerController,
-    "SceneController": SceneController,
-    "ToggleController": ToggleController
-}
+class InvalidDirectiveValue(ValueError):
+    """Der Payload einer Direktive enthält einen Wert, den der Controller nicht versteht."""
+
 
 class AlexaDevice:
     def __init__(self, record):
@@ -54,44 +58,50 @@ class AlexaDevice:
         self.retrievable = record.get('retrievable', True)
         self.handle_generic = record.get('OpenHABHandleGeneric', True)
         self.enabled = record.get('enabled', True)
+        # DeferredResponse pro Gerät: True/False oder geschätzte Sekunden,
+        # ohne Angabe entscheidet der Controller (deferral_seconds)
+        self.deferred_response = record.get('deferred_response')
+        # ChangeReport-Drosselung pro Gerät: {"deadband": x},
+        # auch pro Property ({"deadband": {"temperature": 0.5}})
+        self.report_throttle = record.get('report_throttle') or {}
         
         # Den State als Member speichern
         self.raw_state = record.get('state', {})
+        # Beim Schreiben des States vorgerenderte Properties (JSON-String)
+        self.reported_properties = record.get('reported_properties')
+        # Durch Direktiven geänderte, noch nicht gespeicherte State-Werte
+        self.pending_state = {}
+        # Beim Speichern mitgeschriebene ausstehende DeferredResponse
+        self.pending_response = None
 
-        # Controller initialisieren
+        # Controller initialisieren, die Dispatch-Tabelle entsteht erst bei Bedarf
+        self._dispatch_table = None
         self.controllers = []
-        for cap_name in record.get('capabilities', []):
-            controller_class = CONTROLLER_MAPPING.get(cap_name)
-            if controller_class:
-                self.controllers.append(controller_class)
+        for cap in record.get('capabilities', []):
+            # "ToggleController" oder mit eigener Instanz
+            # {"name": "ToggleController", "instance": "Fan.Oscillate", "friendly_name": "Schwenken"}
+            if isinstance(cap, dict):
+                cap_name, instance, friendly_name = cap.get('name'), cap.get('instance'), cap.get('friendly_name')
+            else:
+                cap_name, instance, friendly_name = cap, None, None
+            # Controller-Module werden erst beim ersten Gerät damit geladen
+            if cap_name in CONTROLLER_MAPPING:
+                self.controllers.append(load_controller(cap_name, instance, friendly_name))
 
     def get_discovery_capabilities(self):
         """Erstellt die Liste aller Capabilities für die Discovery."""
-        # Jedes Smart Home Gerät braucht das Basis-Interface
-        caps = []
-        
         # Alle dynamischen Controller (Power, Brightness, etc.)
-        for ctrl in self.controllers:
-            caps.append(ctrl.get_capability(self.proactive, self.retrievable))
-            
+        # Die Fragmente kommen aus dem Cache und werden von allen Geräten geteilt
+        caps = [
+            get_capability_fragment(ctrl, self.proactive, self.retrievable)
+            for ctrl in self.controllers
+        ]
+
         # Jedes Gerät braucht EndpointHealth
-        caps.append({
-            "type": "AlexaInterface",
-            "interface": "Alexa.EndpointHealth",
-            "version": "3",
-            "properties": {
-                "supported": [{"name": "connectivity"}],
-                "retrievable": True,
-                "proactivelyReported": True
-            }
-        })
+        caps.append(ENDPOINT_HEALTH_CAPABILITY)
 
-        # 3. Das Basis Alexa Interface (immer am Schluss)
-        caps.append({
-            "type": "AlexaInterface",
-            "interface": "Alexa",
-            "version": "3"
-        })
+        # Das Basis Alexa Interface (immer am Schluss)
+        caps.append(ALEXA_CAPABILITY)
 
         return caps
 
@@ -120,14 +130,51 @@ class AlexaDevice:
             
         return all_props
         
+    def state_key(self, prop):
+        """State-Key einer Property im Alexa-Format (weitere Instanzen: 'name#instance')."""
+        for controller in self.controllers:
+            if controller.namespace == prop.get("namespace") and controller.instance == prop.get("instance"):
+                return controller.state_key(prop["name"])
+        return prop["name"]
+
+    def render_properties(self):
+        """
+        Rendert die Properties im Alexa-Format einmal beim Schreiben des States,
+        damit ReportState ohne Controller-Logik auskommt (ohne timeOfSample).
+        """
+        return json.dumps(self.get_all_properties(), separators=JSON_SEPARATORS, default=_json_number)
+
+    def get_report_properties(self):
+        """Properties für ReportState: vorgerendert, sonst frisch aus den Controllern."""
+        if self.reported_properties:
+            return json.loads(self.reported_properties)
+        return self.get_all_properties()
+
     def get_discovery_payload(self):
         """Erzeugt das vollständige Objekt für einen Endpunkt im Discovery-Payload."""
-        
-        # 1. Capabilities sammeln (Nutzt deine Logik aus get_discovery_capabilities)
-        # Wir können get_discovery_capabilities() hier direkt aufrufen
-        capabilities = self.get_discovery_capabilities()
+        endpoint = self._get_discovery_attributes()
+        endpoint["capabilities"] = self.get_discovery_capabilities()
+        endpoint["cookie"] = {}
+        return endpoint
+
+    def get_discovery_payload_json(self):
+        """
+        Wie get_discovery_payload(), aber direkt als JSON-String.
+        Die Capabilities werden aus vorserialisierten Fragmenten zusammengesetzt.
+        """
+        capabilities = [
+            get_capability_json(ctrl, self.proactive, self.retrievable)
+            for ctrl in self.controllers
+        ]
+        capabilities.append(ENDPOINT_HEALTH_JSON)
+        capabilities.append(ALEXA_JSON)
 
-        # 2. Das vollständige Endpunkt-Objekt zurückgeben
+        # Die schließende Klammer des Attribut-Objekts durch die Capabilities ersetzen
+        attributes = json.dumps(self._get_discovery_attributes(), separators=JSON_SEPARATORS)
+        return f'{attributes[:-1]},"capabilities":[{",".join(capabilities)}],"cookie":{{}}}}'
+
+    def _get_discovery_attributes(self):
+        """Die gerätespezifischen Felder eines Endpunkts (ohne Capabilities)."""
         return {
             "endpointId": self.endpoint_id,
             "friendlyName": self.friendly_name,
@@ -141,67 +188,113 @@ class AlexaDevice:
                 "serialNumber": self.serial_number,
                 "customIdentifier": f"redfive-{self.endpoint_id[-4:]}",
                 "softwareVersion": self.software_version
-            },
-            "capabilities": capabilities,
-            "cookie": {}
+            }
         }
 
-    def execute_directive(self, directive):
+    @property
+    def dispatch_table(self):
+        """(namespace, instance, name) -> Handler, geteilt von gleich konfigurierten Geräten."""
+        if self._dispatch_table is None:
+            self._dispatch_table = get_dispatch_table(tuple(self.controllers))
+        return self._dispatch_table
+
+    def get_handler(self, directive):
+        """Handler für die Direktive oder None, wenn kein Controller des Geräts sie kennt."""
         header = directive.get('header', {})
+        return self.dispatch_table.get((header.get('namespace'), header.get('instance'), header.get('name')))
+
+    def get_deferral(self, directive):
+        """Geschätzte Sekunden für eine DeferredResponse oder None (sofort antworten)."""
+        handler = self.get_handler(directive)
+        if not handler or self.deferred_response is False:
+            return None
+        if self.deferred_response is None or self.deferred_response is True:
+            seconds = handler.controller.deferral_seconds
+            if self.deferred_response and seconds is None:
+                seconds = DEFAULT_DEFERRAL_SECONDS
+            return seconds
+        return int(self.deferred_response)
+
+    def get_report_deadband(self, controller, name):
+        """Totband für die ChangeReports einer Property: Gerät vor Controller."""
+        value = self.report_throttle.get('deadband')
+        if isinstance(value, dict):
+            value = value.get(name)
+        if value is None:
+            return controller.report_deadband if controller else None
+        return float(value)
+
+    def execute_directive(self, directive, store=None):
         payload = directive.get('payload', {})
-        namespace = header.get('namespace')
-        name = header.get('name')
+        handler = self.get_handler(directive)
 
-        target_controller = next((c for c in self.controllers if c.namespace == namespace), None)
+        if handler:
+            # Relative Direktiven (lauter, heller, ...) atomar in der DB rechnen
+            try:
+                adjustment = handler.adjustment(payload) if store else None
+            except (ValueError, TypeError) as e:
+                raise InvalidDirectiveValue(str(e)) from e
+            if adjustment:
+                value = self._execute_adjustment(adjustment, store)
+                if value is not None:
+                    return value
 
-        if target_controller:
             # Der Controller liefert jetzt beide Welten zurück
-            result = target_controller.handle_directive(name, payload, current_state=self.raw_state)
+            try:
+                result = handler.handle(payload, current_state=self.raw_state)
+            except (ValueError, TypeError) as e:
+                # Kaputte Werte im Payload (z.B. "brightness": "abc")
+                raise InvalidDirectiveValue(str(e)) from e
 
             if result:
-                # 1. Speichern im Alexa-Format (DynamoDB)
+                # 1. State im Alexa-Format lokal übernehmen, das Speichern
+                # (update_db) übernimmt der Aufrufer parallel zum MQTT-Publish
                 alexa_data = result.get("alexa")
                 if alexa_data:
                     self.raw_state.update(alexa_data)
-                    self.update_db()
+                    self.pending_state.update(alexa_data)
 
                 # 2. Rückgabe des OpenHAB-Formats für den Lambda-Handler
                 return result.get("openhab")
 
         return None
 
+    def _execute_adjustment(self, adjustment, store):
+        """
+        Führt die relative Änderung über store.adjust aus und übernimmt den
+        von der DB gelieferten Wert. Liefert das OpenHAB-Format oder None,
+        wenn das atomare Update nicht möglich war.
+        """
+        attribute = adjustment["attribute"]
+        try:
+            new_value = store.adjust(self.endpoint_id, attribute, adjustment["delta"],
+                                     adjustment["default"], adjustment["min"], adjustment["max"])
+        except Exception as e:
+            print(f"[DB] Atomares Update von {attribute} fehlgeschlagen: {e}")
+            return None
 
-    def update_db(self):
-        """Schreibt den aktuellen raw_state zurück in die DynamoDB."""
-
-        # Nutze die Umgebungsvariable oder einen Standardnamen
-        table_name = os.environ.get('DDB_TABLE', 'smarthome_devices')
-        region = os.environ.get('AWS_DEFAULT_REGION', 'eu-west-1') # Deine Region!
-
-        dynamodb = boto3.resource('dynamodb', region_name=region)
-        table = dynamodb.Table(table_name)
+        value = new_value
+        print(f"[DB] {attribute} für {self.endpoint_id} atomar angepasst -> {value}")
+        self.raw_state[attribute] = value
+        # Der Snapshot wurde beim Update entfernt, ReportState rechnet neu
+        self.reported_properties = None
+        return value
 
+    def update_db(self, store=None):
+        """Speichert die durch Direktiven geänderten State-Werte (pending_state)."""
+        store = store or get_state_store()
         print(f"[DB] Aktualisiere Status für {self.endpoint_id}...")
 
-        def to_decimal(obj):
-            if isinstance(obj, float):
-                return Decimal(str(obj))
-            if isinstance(obj, dict):
-                return {k: to_decimal(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [to_decimal(i) for i in obj]
-            return obj
-
-        # Wir säubern den kompletten State vor dem Speichern
-        safe_state = to_decimal(self.raw_state)
+        # Der restliche State kann aus dem Geräte-Cache stammen (nicht
+        # konsistent gelesen) -> keinen Snapshot daraus rendern, sondern den
+        # alten entfernen. ReportState rechnet dann neu, bis die MQTT-Lambda
+        # wieder einen aus dem konsistent gelesenen State schreibt.
+        self.reported_properties = None
 
         try:
-            table.update_item(
-                Key={'device_id': self.endpoint_id},
-                UpdateExpression="set #s = :s",
-                ExpressionAttributeNames={'#s': 'state'},
-                ExpressionAttributeValues={':s': safe_state}
-            )
+            store.save(self.endpoint_id, self.pending_state, self.raw_state,
+                       pending_response=self.pending_response, drop_reported=True)
+            self.pending_state = {}
             return True
         except Exception as e:
             print(f"[DB] Fehler beim Update: {e}")
@@ -0,0 +1,277 @@
+# alexa_discovery.py
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from alexa_device import AlexaDevice, DISCOVERY_ATTRIBUTES
+from alexa_dynamodb import projection_kwargs
+from alexa_events import send_event
+from alexa_response import AlexaResponse
+
+logger = logging.getLogger()
+
+# Anzahl der parallelen Scan-Segmente (DynamoDB Parallel Scan)
+DISCOVERY_SCAN_SEGMENTS = int(os.environ.get("DISCOVERY_SCAN_SEGMENTS", "4"))
+
+# Sparse GSI mit allen enabled Geräten. Nur Items mit dem Attribut
+# DISCOVERY_INDEX_ATTRIBUTE landen im Index, die CRUD-Lambda pflegt es.
+# Standardmäßig aus (Scan über die ganze Tabelle): vor dem Einschalten müssen
+# alle vorhandenen enabled Geräte das Attribut haben, sonst fehlen sie in
+# der Discovery.
+DISCOVERY_INDEX_NAME = os.environ.get("DISCOVERY_INDEX", "")
+DISCOVERY_INDEX_ATTRIBUTE = "discoverable"
+DISCOVERY_INDEX_VALUE = "1"
+
+# Alexa-Limits pro Discover.Response bzw. AddOrUpdateReport
+MAX_DISCOVERY_ENDPOINTS = int(os.environ.get("MAX_DISCOVERY_ENDPOINTS", "300"))
+# Reserve für Header, Scope usw. unterhalb der erlaubten Payload-Größe
+MAX_DISCOVERY_PAYLOAD_BYTES = int(os.environ.get("MAX_DISCOVERY_PAYLOAD_BYTES", str(240 * 1024)))
+
+# Parallele Requests für die Überlauf-Batches
+DISCOVERY_REPORT_WORKERS = int(os.environ.get("DISCOVERY_REPORT_WORKERS", "4"))
+
+
+def discovery_scan_kwargs():
+    """
+    Scan-Parameter für die Discovery: sparse Index (falls konfiguriert) und
+    eine ProjectionExpression nur mit den Attributen, die AlexaDevice braucht.
+    """
+    kwargs = projection_kwargs(DISCOVERY_ATTRIBUTES)
+    if DISCOVERY_INDEX_NAME:
+        kwargs["IndexName"] = DISCOVERY_INDEX_NAME
+    return kwargs
+
+
+def iter_segment_pages(table, segment, total_segments, **scan_kwargs):
+    """
+    Liest ein Scan-Segment seitenweise und folgt dabei LastEvaluatedKey.
+    Liefert die Items jeder Seite als eigene Liste.
+    """
+    kwargs = dict(scan_kwargs)
+    if total_segments > 1:
+        kwargs["Segment"] = segment
+        kwargs["TotalSegments"] = total_segments
+
+    while True:
+        response = table.scan(**kwargs)
+        yield response.get("Items", [])
+
+        # Ohne LastEvaluatedKey ist das Segment komplett gelesen
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            break
+        kwargs["ExclusiveStartKey"] = last_key
+
+
+def iter_discovery_pages(table, total_segments=None, stats=None, **scan_kwargs):
+    """
+    Liefert die Scan-Seiten aller Segmente, sobald sie gelesen sind.
+    Die Segmente laufen parallel im Thread-Pool, eine kleine Queue begrenzt
+    die Anzahl der Seiten, die gleichzeitig im Speicher liegen.
+    Seiten- und Item-Zähler landen im übergebenen stats-Dict.
+    """
+    total_segments = max(1, int(total_segments or DISCOVERY_SCAN_SEGMENTS))
+    if stats is None:
+        stats = {}
+    stats.update({"segments": total_segments, "pages": 0, "items": 0})
+
+    pages = queue.Queue(maxsize=total_segments * 2)
+    stop = threading.Event()
+    segment_done = object()
+
+    def put(entry):
+        # Nicht ewig blockieren, falls der Verbraucher vorzeitig aufhört
+        while not stop.is_set():
+            try:
+                pages.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_worker(segment):
+        try:
+            for page in iter_segment_pages(table, segment, total_segments, **scan_kwargs):
+                if not put(page):
+                    return
+            put(segment_done)
+        except Exception as e:
+            put(e)
+
+    executor = ThreadPoolExecutor(max_workers=total_segments)
+    try:
+        for segment in range(total_segments):
+            executor.submit(scan_worker, segment)
+
+        running = total_segments
+        while running:
+            entry = pages.get()
+            if entry is segment_done:
+                running -= 1
+                continue
+            if isinstance(entry, Exception):
+                raise entry
+            stats["pages"] += 1
+            stats["items"] += len(entry)
+            yield entry
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+
+
+def iter_discovery_records(table, total_segments=None, stats=None, **scan_kwargs):
+    """Liefert die Geräte-Records aller Scan-Seiten einzeln."""
+    for page in iter_discovery_pages(table, total_segments, stats, **scan_kwargs):
+        yield from page
+
+
+def iter_discovery_endpoints(records):
+    """
+    Filtert die Records und liefert die Endpunkte als JSON-Strings.
+    Es wird immer nur ein AlexaDevice gleichzeitig gebaut.
+    """
+    for record in records:
+        # Nur enabled Geräte, hier reicht der record, ohne das Objekt zu bauen
+        if not record.get('enabled', True):
+            continue
+        # get_discovery_payload_json() liefert genau das Format, das Alexa erwartet
+        yield AlexaDevice(record).get_discovery_payload_json()
+
+
+def discovery_hash(device):
+    """Hash über den Discovery-Payload eines Geräts (erkennt unveränderte Endpunkte)."""
+    return hashlib.sha256(device.get_discovery_payload_json().encode("utf-8")).hexdigest()
+
+
+def build_add_or_update_report(endpoints, token):
+    """Baut ein Alexa.Discovery AddOrUpdateReport Event."""
+    adr = AlexaResponse(name="AddOrUpdateReport", namespace="Alexa.Discovery")
+    adr.set_payload({
+        "endpoints": endpoints,
+        "scope": {"type": "BearerToken", "token": token}
+    })
+    return adr.get()
+
+
+def build_delete_report(endpoint_ids, token):
+    """Baut ein Alexa.Discovery DeleteReport Event."""
+    adr = AlexaResponse(name="DeleteReport", namespace="Alexa.Discovery")
+    adr.set_payload({
+        "endpoints": [{"endpointId": endpoint_id} for endpoint_id in endpoint_ids],
+        "scope": {"type": "BearerToken", "token": token}
+    })
+    return adr.get()
+
+
+def report_device_update(record):
+    """
+    Meldet ein neues oder geändertes Gerät per AddOrUpdateReport an Alexa.
+    Liefert den neuen Discovery-Hash, oder None wenn sich der Endpunkt
+    gegenüber record['discovery_hash'] nicht geändert hat.
+    """
+    device = AlexaDevice(record)
+    new_hash = discovery_hash(device)
+    if new_hash == record.get("discovery_hash"):
+        logger.info(f"Discovery: {device.endpoint_id} unverändert, kein AddOrUpdateReport.")
+        return None
+
+    endpoint = device.get_discovery_payload()
+    status = send_event(lambda token: build_add_or_update_report([endpoint], token))
+    logger.info(f"AddOrUpdateReport für {device.endpoint_id}: {status}")
+    return new_hash
+
+
+def report_device_delete(endpoint_ids):
+    """Meldet gelöschte oder deaktivierte Geräte per DeleteReport an Alexa."""
+    status = send_event(lambda token: build_delete_report(endpoint_ids, token))
+    logger.info(f"DeleteReport für {endpoint_ids}: {status}")
+    return status
+
+
+def first_discovery_batch(encoded_endpoints, max_endpoints=None, max_bytes=None):
+    """
+    Nimmt den Batch für die Discover.Response (auch leer) von den
+    serialisierten Endpunkten. Liefert (batch, more): more sagt, ob weitere
+    Endpunkte folgen. Dafür wird nur ein Endpunkt vorausgelesen, nicht der
+    nächste Batch gebaut.
+    """
+    source = iter(encoded_endpoints)
+    batch, encoded = _fill_discovery_batch(source, next(source, None), max_endpoints, max_bytes)
+    return batch, encoded is not None
+
+
+def split_discovery_batches(encoded_endpoints, max_endpoints=None, max_bytes=None):
+    """
+    Teilt die serialisierten Endpunkte (JSON-Strings) in Batches auf, die
+    sowohl das Endpunkt-Limit als auch das Größenlimit einhalten.
+    Generator: es liegt immer nur der aktuelle Batch im Speicher.
+    Ohne Endpunkte gibt es keinen (leeren) Batch.
+    """
+    source = iter(encoded_endpoints)
+    encoded = next(source, None)
+    while encoded is not None:
+        batch, encoded = _fill_discovery_batch(source, encoded, max_endpoints, max_bytes)
+        yield batch
+
+
+def _fill_discovery_batch(source, encoded, max_endpoints, max_bytes):
+    # Füllt einen Batch ab encoded, liefert (batch, erster Endpunkt des nächsten Batches oder None)
+    max_endpoints = max_endpoints or MAX_DISCOVERY_ENDPOINTS
+    max_bytes = max_bytes or MAX_DISCOVERY_PAYLOAD_BYTES
+
+    batch = []
+    batch_bytes = 0
+    while encoded is not None:
+        # +1 für das Komma zwischen den Endpunkten
+        size = len(encoded.encode("utf-8")) + 1
+        if batch and (len(batch) >= max_endpoints or batch_bytes + size > max_bytes):
+            return batch, encoded
+        batch.append(encoded)
+        batch_bytes += size
+        encoded = next(source, None)
+    return batch, None
+
+
+def report_discovery_overflow(batches):
+    """
+    Schickt die Endpunkte, die nicht mehr in die Discover.Response passen,
+    parallel als AddOrUpdateReport-Batches an Alexa. batches darf ein
+    Generator sein, es sind nur wenige Batches gleichzeitig unterwegs.
+    Liefert (gesendete Batches, fehlgeschlagene Batches).
+    """
+    def send_batch(batch):
+        endpoints = [json.loads(encoded) for encoded in batch]
+        return send_event(lambda token: build_add_or_update_report(endpoints, token))
+
+    sent = 0
+    failed = 0
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=DISCOVERY_REPORT_WORKERS) as executor:
+        for batch in batches:
+            # Nicht mehr Batches vorhalten als gerade gesendet werden können
+            if len(in_flight) >= DISCOVERY_REPORT_WORKERS:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                failed += _count_failed(finished)
+            in_flight.add(executor.submit(send_batch, batch))
+            sent += 1
+        failed += _count_failed(wait(in_flight).done)
+
+    if sent:
+        logger.info(f"Discovery-Überlauf: {sent} Batches gesendet, {failed} fehlgeschlagen")
+    return sent, failed
+
+
+def _count_failed(futures):
+    failed = 0
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            failed += 1
+            logger.error(f"AddOrUpdateReport Batch fehlgeschlagen: {e}")
+    return failed
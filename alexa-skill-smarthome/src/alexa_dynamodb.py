@@ -0,0 +1,190 @@
+# alexa_dynamodb.py
+#
+# Schlanker DynamoDB-Zugriff über den Low-Level-Client, genutzt von allen
+# drei Lambdas. Table bietet dieselben Methoden wie boto3.resource(...).Table
+# (get_item, put_item, update_item, delete_item, query, scan), übersetzt die
+# Attribute aber mit einem eigenen Codec:
+#   N -> int bzw. float (statt Decimal über den TypeDeserializer)
+#   int/float/Decimal -> N
+# Dadurch braucht kein Paket mehr eigene Decimal-Konverter und json.dumps
+# funktioniert direkt auf den gelesenen Items.
+# Bedingungen werden als Strings übergeben (keine boto3.dynamodb.conditions).
+# boto3 wird erst beim ersten Zugriff importiert (Cold Start).
+
+from decimal import Decimal
+
+# Ein Client pro Container, wird bei Warm-Starts wiederverwendet
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        import boto3
+        _client = boto3.client("dynamodb")
+    return _client
+
+
+def error_code(exc):
+    """Fehlercode einer botocore ClientError (ohne botocore beim Import zu laden)."""
+    return getattr(exc, "response", {}).get("Error", {}).get("Code")
+
+
+def serialize(value):
+    """Python -> DynamoDB AttributeValue."""
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, float, Decimal)):
+        return {"N": _number_to_str(value)}
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, dict):
+        return {"M": {k: serialize(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [serialize(v) for v in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {"B": bytes(value)}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(v, str) for v in value):
+            return {"SS": list(value)}
+        if all(isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) for v in value):
+            return {"NS": [_number_to_str(v) for v in value]}
+        return {"BS": [bytes(v) for v in value]}
+    raise TypeError(f"Typ {value.__class__.__name__} kann nicht in DynamoDB gespeichert werden")
+
+
+def deserialize(attribute):
+    """DynamoDB AttributeValue -> Python (Zahlen als int/float)."""
+    (kind, value), = attribute.items()
+    if kind == "S":
+        return value
+    if kind == "N":
+        return _str_to_number(value)
+    if kind == "BOOL":
+        return value
+    if kind == "M":
+        return {k: deserialize(v) for k, v in value.items()}
+    if kind == "L":
+        return [deserialize(v) for v in value]
+    if kind == "NULL":
+        return None
+    if kind == "SS":
+        return set(value)
+    if kind == "NS":
+        return {_str_to_number(v) for v in value}
+    if kind == "B":
+        return value
+    if kind == "BS":
+        return set(value)
+    raise TypeError(f"Unbekannter DynamoDB-Typ {kind}")
+
+
+def _number_to_str(value):
+    if isinstance(value, float):
+        if value != value or value in (float("inf"), float("-inf")):
+            raise ValueError("NaN/Infinity kann nicht in DynamoDB gespeichert werden")
+        return repr(value)
+    return str(value)
+
+
+def _str_to_number(value):
+    # DynamoDB liefert ganze Zahlen ohne Dezimalpunkt (21.0 -> "21")
+    if "." in value or "e" in value or "E" in value:
+        return float(value)
+    return int(value)
+
+
+def serialize_item(item):
+    return {k: serialize(v) for k, v in item.items()}
+
+
+def deserialize_item(item):
+    return {k: deserialize(v) for k, v in item.items()}
+
+
+def projection_kwargs(attributes):
+    """ProjectionExpression mit Platzhaltern (#a0, #a1, ...) für reservierte Namen wie 'state'."""
+    names = {f"#a{n}": name for n, name in enumerate(attributes)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names
+    }
+
+
+# Request-Parameter mit Items/Keys, die serialisiert werden müssen
+_ITEM_PARAMS = ("Key", "Item", "ExclusiveStartKey")
+# Response-Felder mit Items, die zurückübersetzt werden
+_ITEM_RESULTS = ("Item", "Attributes", "LastEvaluatedKey")
+
+
+def _encode_request(kwargs):
+    for param in _ITEM_PARAMS:
+        if param in kwargs:
+            kwargs[param] = serialize_item(kwargs[param])
+    if "ExpressionAttributeValues" in kwargs:
+        kwargs["ExpressionAttributeValues"] = serialize_item(kwargs["ExpressionAttributeValues"])
+    return kwargs
+
+
+def _decode_response(response):
+    for field in _ITEM_RESULTS:
+        if field in response:
+            response[field] = deserialize_item(response[field])
+    if "Items" in response:
+        response["Items"] = [deserialize_item(i) for i in response["Items"]]
+    return response
+
+
+class Table:
+    """Low-Level-Variante von boto3.resource('dynamodb').Table(name)."""
+
+    def __init__(self, name, client=None):
+        self.name = name
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client or get_client()
+
+    def _call(self, operation, kwargs):
+        kwargs = _encode_request(dict(kwargs, TableName=self.name))
+        return _decode_response(getattr(self.client, operation)(**kwargs))
+
+    def get_item(self, **kwargs):
+        return self._call("get_item", kwargs)
+
+    def put_item(self, **kwargs):
+        return self._call("put_item", kwargs)
+
+    def update_item(self, **kwargs):
+        return self._call("update_item", kwargs)
+
+    def delete_item(self, **kwargs):
+        return self._call("delete_item", kwargs)
+
+    def query(self, **kwargs):
+        return self._call("query", kwargs)
+
+    def scan(self, **kwargs):
+        return self._call("scan", kwargs)
+
+
+def batch_get_item(RequestItems, client=None):
+    """BatchGetItem mit denselben Formaten wie die Resource-API (inkl. UnprocessedKeys)."""
+    request = {}
+    for table_name, spec in RequestItems.items():
+        request[table_name] = dict(spec, Keys=[serialize_item(k) for k in spec["Keys"]])
+
+    response = (client or get_client()).batch_get_item(RequestItems=request)
+
+    response["Responses"] = {
+        table_name: [deserialize_item(i) for i in items]
+        for table_name, items in response.get("Responses", {}).items()
+    }
+    response["UnprocessedKeys"] = {
+        table_name: dict(spec, Keys=[deserialize_item(k) for k in spec["Keys"]])
+        for table_name, spec in response.get("UnprocessedKeys", {}).items()
+    }
+    return response
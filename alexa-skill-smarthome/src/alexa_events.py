@@ -0,0 +1,92 @@
+# alexa_events.py
+
+import json
+import logging
+import os
+import uuid
+
+from alexa_auth import get_valid_access_token, refresh_alexa_token
+
+logger = logging.getLogger()
+
+ALEXA_EVENTS_URL = os.environ.get("ALEXA_EVENTS_URL", "https://api.eu.amazonalexa.com/v3/events")
+
+
+def post_event(token, payload):
+    """Schickt ein fertiges Event an das Alexa Event Gateway."""
+    # urllib erst beim ersten Event laden (Cold Start)
+    import urllib.request
+
+    req = urllib.request.Request(ALEXA_EVENTS_URL, data=json.dumps(payload).encode('utf-8'), method='POST')
+    req.add_header("Authorization", f"Bearer {token}")
+    req.add_header("Content-Type", "application/json")
+
+    with urllib.request.urlopen(req) as response:
+        return response.getcode()
+
+
+def build_change_report(endpoint_id, properties, token, cause="PHYSICAL_INTERACTION"):
+    """ChangeReport Event für geänderte Properties (bereits im Alexa-Format)."""
+    return {
+        "context": {
+            "properties": []  # Hier könnten zusätzliche Zustände stehen
+        },
+        "event": {
+            "header": {
+                "namespace": "Alexa",
+                "name": "ChangeReport",
+                "messageId": str(uuid.uuid4()),
+                "payloadVersion": "3"
+            },
+            "endpoint": {
+                "scope": {"type": "BearerToken", "token": token},
+                "endpointId": endpoint_id
+            },
+            "payload": {
+                "change": {
+                    "cause": {"type": cause},
+                    "properties": properties
+                }
+            }
+        }
+    }
+
+
+def build_deferred_response(endpoint_id, correlation_token, properties, token):
+    """Nachgereichte Response auf eine mit DeferredResponse beantwortete Direktive."""
+    return {
+        "context": {
+            "properties": properties
+        },
+        "event": {
+            "header": {
+                "namespace": "Alexa",
+                "name": "Response",
+                "messageId": str(uuid.uuid4()),
+                "correlationToken": correlation_token,
+                "payloadVersion": "3"
+            },
+            "endpoint": {
+                "scope": {"type": "BearerToken", "token": token},
+                "endpointId": endpoint_id
+            },
+            "payload": {}
+        }
+    }
+
+
+def send_event(build_payload):
+    """
+    Holt ein gültiges LWA Token, baut damit das Event (build_payload(token))
+    und schickt es ab. Das Token wird vor Ablauf erneuert, bei 401
+    trotzdem noch einmal (z.B. widerrufen).
+    """
+    token = get_valid_access_token()
+    try:
+        return post_event(token, build_payload(token))
+    except Exception as e:
+        # urllib.error.HTTPError, ohne urllib beim Import zu laden
+        if getattr(e, "code", None) != 401:
+            raise
+        token = refresh_alexa_token(rejected_token=token)
+        return post_event(token, build_payload(token))
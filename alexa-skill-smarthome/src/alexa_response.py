@@ -11,16 +11,31 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
 
+import json
 import random
 import uuid
 
 from alexa_utils import get_utc_timestamp
 
 
+class AlexaResponseDict(dict):
+    """Fertige Antwort, die ihr JSON (z.B. fürs Logging) nur einmal erzeugt."""
+
+    _json = None
+
+    def to_json(self):
+        # Nach to_json() darf die Antwort nicht mehr verändert werden
+        if self._json is None:
+            self._json = json.dumps(self)
+        return self._json
+
+
 class AlexaResponse:
 
     def __init__(self, **kwargs):
 
+        # Ein Zeitstempel für alle Properties dieser Antwort
+        self.timestamp = get_utc_timestamp()
         self.context_properties = []
         self.payload_endpoints = []
 
@@ -49,13 +64,33 @@ class AlexaResponse:
         if 'cookie' in kwargs:
             self.event['endpoint']['cookie'] = kwargs.get('cookie', '{}')
 
-        # No endpoint in an AcceptGrant or Discover request
-        if self.event['header']['name'] == 'AcceptGrant.Response' or self.event['header']['name'] == 'Discover.Response':
+        # No endpoint in an AcceptGrant or Discover request (or the proactive discovery reports, DeferredResponse)
+        if self.event['header']['name'] in ('AcceptGrant.Response', 'Discover.Response', 'AddOrUpdateReport', 'DeleteReport', 'DeferredResponse'):
             self.event.pop('endpoint')
 
     def add_context_property(self, **kwargs):
         self.context_properties.append(self.create_context_property(**kwargs))
 
+    def add_context_properties(self, properties):
+        """
+        Schneller Weg für die Properties aus AlexaDevice.get_all_properties():
+        feste Form, gemeinsamer Zeitstempel, keine kwargs.
+        """
+        timestamp = self.timestamp
+        append = self.context_properties.append
+        for prop in properties:
+            entry = {
+                'namespace': prop['namespace'],
+                'name': prop['name'],
+                'value': prop['value'],
+                'timeOfSample': timestamp,
+                'uncertaintyInMilliseconds': 0
+            }
+            instance = prop.get('instance')
+            if instance:
+                entry['instance'] = instance
+            append(entry)
+
     def add_cookie(self, key, value):
 
         if "cookies" in self is None:
@@ -71,7 +106,7 @@ class AlexaResponse:
             'namespace': kwargs.get('namespace', 'Alexa.EndpointHealth'),
             'name': kwargs.get('name', 'connectivity'),
             'value': kwargs.get('value', {'value': 'OK'}),
-            'timeOfSample': get_utc_timestamp(),
+            'timeOfSample': self.timestamp,
             'uncertaintyInMilliseconds': kwargs.get('uncertainty_in_milliseconds', 0)
         }
     
@@ -114,10 +149,7 @@ class AlexaResponse:
 
     def get(self, remove_empty=True):
 
-        response = {
-            'context': self.context,
-            'event': self.event
-        }
+        response = AlexaResponseDict(context=self.context, event=self.event)
 
         if len(self.context_properties) > 0:
             response['context']['properties'] = self.context_properties
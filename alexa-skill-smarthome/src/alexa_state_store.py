@@ -0,0 +1,214 @@
+# alexa_state_store.py
+#
+# Schreibt Geräte-States in die DynamoDB. Genutzt von der Skill-Lambda
+# (Control-Direktiven) und der MQTT-Lambda (Hardware-Updates).
+# Pro Direktive genau ein UpdateItem, das nur die geänderten State-Attribute
+# setzt (SET #state.#k0 = :v0, ...) statt die komplette Map zu überschreiben.
+
+import logging
+import os
+
+from alexa_dynamodb import Table, error_code
+
+logger = logging.getLogger()
+
+
+class DeviceStateStore:
+    """Speichert State-Änderungen eines Geräts mit einem UpdateItem."""
+
+    def __init__(self, table=None, table_name=None):
+        self._table = table
+        self.table_name = table_name or os.environ.get("DDB_TABLE", "smarthome_devices")
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = Table(self.table_name)
+        return self._table
+
+    def save(self, device_id, changes, state=None, reported_properties=None, pending_response=None,
+             drop_reported=False):
+        """
+        Setzt nur die geänderten Attribute unter 'state'. Existiert die
+        State-Map im Item noch nicht, ist der Pfad ungültig -> dann wird
+        einmalig der komplette State (state) geschrieben.
+        drop_reported entfernt den ReportState-Snapshot: wer den restlichen
+        State nicht konsistent gelesen hat, darf keinen neuen rendern.
+        """
+        names, values, assignments = self._build_update(changes, reported_properties, pending_response)
+        expression = "SET " + ", ".join(assignments) if assignments else ""
+        if drop_reported:
+            expression = f"{expression} REMOVE reported_properties".strip()
+
+        try:
+            self.table.update_item(
+                Key={"device_id": device_id},
+                UpdateExpression=expression,
+                **({"ExpressionAttributeValues": values} if values else {}),
+                **({"ExpressionAttributeNames": names} if names else {})
+            )
+        except Exception as e:
+            if state is None or error_code(e) != "ValidationException":
+                raise
+            logger.info(f"State-Map für {device_id} fehlt, schreibe kompletten State.")
+            self.save_full(device_id, state, reported_properties, pending_response, drop_reported)
+
+    @staticmethod
+    def _build_update(changes, reported_properties=None, pending_response=None):
+        """Namen, Werte und SET-Zuweisungen für die geänderten State-Attribute."""
+        # Ungenutzte Namen lehnt DynamoDB ab -> #state nur bei Änderungen
+        names = {"#state": "state"} if changes else {}
+        values = {}
+        assignments = []
+        for n, (key, value) in enumerate(changes.items()):
+            names[f"#k{n}"] = key
+            values[f":v{n}"] = value
+            assignments.append(f"#state.#k{n} = :v{n}")
+
+        if reported_properties is not None:
+            values[":p"] = reported_properties
+            assignments.append("reported_properties = :p")
+        if pending_response is not None:
+            values[":r"] = pending_response
+            assignments.append("pending_response = :r")
+        return names, values, assignments
+
+    def save_if_changed(self, device_id, changes, state=None, reported_properties=None):
+        """
+        Wie save, aber als ein bedingtes UpdateItem: geschrieben wird nur,
+        wenn mindestens ein Attribut in der DB abweicht. Liefert die
+        tatsächlich geänderten Attribute (über UPDATED_OLD), {} wenn die DB
+        bereits alle Werte hatte.
+        """
+        if not changes:
+            return {}
+        names, values, assignments = self._build_update(changes, reported_properties)
+        condition = " OR ".join(
+            f"attribute_not_exists(#state.#k{n}) OR #state.#k{n} <> :v{n}" for n in range(len(changes)))
+
+        try:
+            res = self.table.update_item(
+                Key={"device_id": device_id},
+                UpdateExpression="SET " + ", ".join(assignments),
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues="UPDATED_OLD"
+            )
+        except Exception as e:
+            code = error_code(e)
+            if code == "ConditionalCheckFailedException":
+                return {}
+            if state is None or code != "ValidationException":
+                raise
+            logger.info(f"State-Map für {device_id} fehlt, schreibe kompletten State.")
+            self.save_full(device_id, state, reported_properties)
+            return dict(changes)
+
+        old = res.get("Attributes", {}).get("state", {})
+        return {key: value for key, value in changes.items() if key not in old or old[key] != value}
+
+    def mark_reported(self, device_id, reported_state):
+        """
+        Merkt sich die zuletzt erfolgreich an Alexa gemeldeten Werte. Ein
+        fehlgeschlagener ChangeReport fehlt hier, der Retry meldet ihn erneut.
+        """
+        self.table.update_item(
+            Key={"device_id": device_id},
+            UpdateExpression="SET reported_state = :m",
+            ExpressionAttributeValues={":m": reported_state}
+        )
+
+    def save_full(self, device_id, state, reported_properties=None, pending_response=None, drop_reported=False):
+        """Überschreibt die komplette State-Map."""
+        expression = "SET #state = :s"
+        values = {":s": state}
+        if reported_properties is not None:
+            expression += ", reported_properties = :p"
+            values[":p"] = reported_properties
+        if pending_response is not None:
+            expression += ", pending_response = :r"
+            values[":r"] = pending_response
+        if drop_reported:
+            expression += " REMOVE reported_properties"
+        self.table.update_item(
+            Key={"device_id": device_id},
+            UpdateExpression=expression,
+            ExpressionAttributeNames={"#state": "state"},
+            ExpressionAttributeValues=values
+        )
+
+    def adjust(self, device_id, attribute, delta, default, minimum, maximum):
+        """
+        Relative Änderung atomar in der DB (kein Read-Modify-Write):
+        SET #state.#a = if_not_exists(#state.#a, :default) + :d
+        Die Bedingung verhindert das Überschreiten der Grenzen, schlägt sie
+        fehl, wird auf die Grenze gesetzt. Liefert den neuen Wert.
+        Der vorgerenderte ReportState-Snapshot wird dabei entfernt.
+        """
+        names = {"#state": "state", "#a": attribute}
+        values = {":default": default, ":d": delta}
+        if delta >= 0:
+            condition = "#state.#a <= :limit"
+            values[":limit"] = maximum - delta
+            bound = maximum
+        else:
+            condition = "#state.#a >= :limit"
+            values[":limit"] = minimum - delta
+            bound = minimum
+        # Fehlt das Attribut, gilt der Default (sofern das Ergebnis in den Grenzen bleibt)
+        if minimum <= default + delta <= maximum:
+            condition = f"attribute_not_exists(#state.#a) OR {condition}"
+
+        try:
+            res = self.table.update_item(
+                Key={"device_id": device_id},
+                UpdateExpression="SET #state.#a = if_not_exists(#state.#a, :default) + :d REMOVE reported_properties",
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues="UPDATED_NEW"
+            )
+            return res["Attributes"]["state"][attribute]
+        except Exception as e:
+            if error_code(e) != "ConditionalCheckFailedException":
+                raise
+
+        # Grenze erreicht -> auf die Grenze setzen
+        logger.info(f"{attribute} für {device_id} an der Grenze, setze {bound}.")
+        self.table.update_item(
+            Key={"device_id": device_id},
+            UpdateExpression="SET #state.#a = :bound REMOVE reported_properties",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues={":bound": bound}
+        )
+        return bound
+
+    def take_pending_response(self, device_id):
+        """
+        Entfernt die ausstehende DeferredResponse atomar und liefert sie
+        zurück. Nur ein Aufrufer bekommt sie, alle anderen erhalten None.
+        """
+        try:
+            res = self.table.update_item(
+                Key={"device_id": device_id},
+                UpdateExpression="REMOVE pending_response",
+                ConditionExpression="attribute_exists(pending_response)",
+                ReturnValues="UPDATED_OLD"
+            )
+        except Exception as e:
+            if error_code(e) == "ConditionalCheckFailedException":
+                return None
+            raise
+        return res.get("Attributes", {}).get("pending_response")
+
+
+_stores = {}
+
+
+def get_state_store(table_name=None):
+    """Ein Store pro Tabelle und Container."""
+    table_name = table_name or os.environ.get("DDB_TABLE", "smarthome_devices")
+    if table_name not in _stores:
+        _stores[table_name] = DeviceStateStore(table_name=table_name)
+    return _stores[table_name]
@@ -0,0 +1,101 @@
+# alexa_throttle.py
+#
+# Drosselung der ChangeReports pro Endpunkt und Property für die MQTT-Lambda.
+# Dimmer, Leistungsmesser und Sensoren schicken Update-Salven, jede davon
+# wäre ein POST an das Alexa Event Gateway.
+#   Totband:  numerische Werte, die weniger als 'deadband' vom zuletzt
+#             gemeldeten Wert (reported_state im Geräte-Item) abweichen,
+#             werden nicht gemeldet (suppressed)
+# Ein Zeitfenster gibt es bewusst nicht: ohne Timer in der Lambda bliebe der
+# letzte Wert einer Salve liegen, bis irgendwann ein weiteres Update kommt.
+# Der State in der DB (und damit ReportState) bleibt immer exakt.
+
+import json
+import os
+import threading
+import time
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "SmartHome")
+
+COUNTERS = ("reported", "suppressed")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class ChangeReportThrottle:
+    """Entscheidet, welche geänderten Properties eines Endpunkts gemeldet werden."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self._pending = dict.fromkeys(COUNTERS, 0)
+
+    def select(self, candidates, reported_state, deadband):
+        """
+        Liefert die Namen der zu meldenden Properties.
+        candidates:     {property: aktueller Wert}
+        reported_state: {property: zuletzt erfolgreich gemeldeter Wert}
+        deadband:       property -> Totband oder None
+        """
+        report = []
+        suppressed = 0
+
+        for name, value in candidates.items():
+            if name in reported_state:
+                previous_value = reported_state[name]
+                if previous_value == value:
+                    continue
+                band = deadband(name)
+                if band and _is_number(value) and _is_number(previous_value) \
+                        and abs(value - previous_value) < band:
+                    suppressed += 1
+                    continue
+            report.append(name)
+
+        self._count({"suppressed": suppressed})
+        return report
+
+    def mark_reported(self, names):
+        """Nach erfolgreichem Versand: zählt die gemeldeten Properties."""
+        self._count({"reported": len(names)})
+
+    def _count(self, counts):
+        with self._lock:
+            for counter, n in counts.items():
+                self.totals[counter] += n
+                self._pending[counter] += n
+
+    def drain(self):
+        """Zähler seit dem letzten Aufruf (für die Metriken einer Invocation)."""
+        with self._lock:
+            counts, self._pending = self._pending, dict.fromkeys(COUNTERS, 0)
+        return counts
+
+    def stats(self):
+        with self._lock:
+            return dict(self.totals)
+
+
+def emit_metrics(counts, service="alexa-device-update-state-mqtt"):
+    """
+    Schreibt die Zähler im CloudWatch Embedded Metric Format ins Log,
+    CloudWatch macht daraus Metriken (ohne API-Aufruf).
+    Invocations ohne ChangeReport-Entscheidung schreiben nichts.
+    """
+    if not any(counts.values()):
+        return
+    metrics = {f"ChangeReports{counter.capitalize()}": n for counter, n in counts.items()}
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Service"]],
+                "Metrics": [{"Name": name, "Unit": "Count"} for name in metrics]
+            }]
+        },
+        "Service": service,
+        **metrics
+    }))
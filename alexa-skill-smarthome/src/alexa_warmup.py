@@ -0,0 +1,62 @@
+# alexa_warmup.py
+#
+# Warm-up für die Skill- und die MQTT-Lambda. Ein Warm-up-Event ist
+#   {"warmup": true}                                  (z.B. nach dem Deployment)
+#   ein geplantes EventBridge-Event (Scheduled Event) (regelmäßiger Ping)
+# Die Lambdas führen dann ihre Warm-up-Schritte aus (Clients/Verbindungen,
+# Katalog, Controller, LWA Token), damit der erste echte Sprachbefehl nach
+# Deployment oder Scale-out den warmen Pfad nimmt.
+
+import logging
+import time
+
+logger = logging.getLogger()
+
+
+def is_warmup_event(event):
+    if not isinstance(event, dict):
+        return False
+    if event.get("warmup"):
+        return True
+    return event.get("source") == "aws.events" and event.get("detail-type") == "Scheduled Event"
+
+
+def run_warmup(steps):
+    """
+    Führt die Warm-up-Schritte (Name -> Funktion) nacheinander aus.
+    Ein fehlgeschlagener Schritt bricht das Warm-up nicht ab.
+    """
+    results = {}
+    for name, step in steps.items():
+        start = time.perf_counter()
+        try:
+            step()
+            ok = True
+        except Exception as e:
+            logger.warning(f"Warm-up {name} fehlgeschlagen: {e}")
+            ok = False
+        results[name] = {"ok": ok, "ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    logger.info(f"Warm-up: {results}")
+    return {"warmup": True, "steps": results}
+
+
+def warm_up_controllers():
+    """Lädt alle Controller, die Dispatch-Registry und die Capability-Fragmente."""
+    from controllers import CONTROLLER_MAPPING, load_controller, get_directive_registry
+    from controllers.capability_cache import get_capability_json
+
+    get_directive_registry()
+    for name in CONTROLLER_MAPPING:
+        controller = load_controller(name)
+        for proactive in (False, True):
+            for retrievable in (False, True):
+                get_capability_json(controller, proactive, retrievable)
+
+
+def warm_up_https():
+    """Lädt urllib/ssl für die Aufrufe des Alexa Event Gateways und von LWA."""
+    import ssl
+    import urllib.request  # noqa: F401
+
+    ssl.create_default_context()
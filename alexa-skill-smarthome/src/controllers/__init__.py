@@ -1,34 +1,52 @@
 # controllers/__init__.py
+#
+# Die Controller-Module werden erst beim ersten Zugriff importiert
+# (Cold Start), z.B. über load_controller("PowerController") oder
+# "from controllers import PowerController".
 
-from .power_controller import PowerController
-from .brightness_controller import BrightnessController
-from .speaker_controller import SpeakerController
-from .temperature_sensor import TemperatureSensor
-from .rollershutter_controller import RollershutterController
-from .color_controller import ColorController
-from .color_temperature_controller  import ColorTemperatureController
-from .contact_sensor import ContactSensor
-from .humidity_sensor import HumiditySensor
-from .motion_sensor import MotionSensor
-from .scene_controller import SceneController
-from .step_speaker_controller import StepSpeakerController
-from .thermostat_controller import ThermostatController
-from .toggle_controller import ToggleController
+import importlib
+from functools import lru_cache
+
+# Capability-Name (wie in der DB) -> Modul im Paket controllers
+CONTROLLER_MAPPING = {
+    "PowerController": "power_controller",
+    "BrightnessController": "brightness_controller",
+    "SpeakerController": "speaker_controller",
+    "TemperatureSensor": "temperature_sensor",
+    "RollershutterController": "rollershutter_controller",
+    "ColorController": "color_controller",
+    "ColorTemperatureController": "color_temperature_controller",
+    "ContactSensor": "contact_sensor",
+    "HumiditySensor": "humidity_sensor",
+    "MotionSensor": "motion_sensor",
+    "SceneController": "scene_controller",
+    "StepSpeakerController": "step_speaker_controller",
+    "ThermostatController": "thermostat_controller",
+    "ToggleController": "toggle_controller"
+}
 
 # Optional: Eine Liste aller verfügbaren Controller für dynamische Checks
-__all__ = [
-    'PowerController',
-    'BrightnessController',
-    'SpeakerController',
-    'TemperatureSensor',
-    'RollershutterController',
-    "ColorController",
-    "ColorTemperatureController",
-    "ContactSensor",
-    "HumiditySensor",
-    "MotionSensor",
-    "SceneController",
-    "StepSpeakerController",
-    "ThermostatController",
-    "ToggleController"
-]
\ No newline at end of file
+__all__ = list(CONTROLLER_MAPPING)
+
+
+@lru_cache(maxsize=None)
+def load_controller(name, instance=None, friendly_name=None):
+    """
+    Importiert das Modul des Controllers beim ersten Zugriff. Mit instance
+    bzw. friendly_name (Multi-Instanz-Interfaces) entsteht einmal pro
+    Konfiguration eine eigene Klasse, Controller ohne Instanz ignorieren beides.
+    """
+    module = importlib.import_module(f".{CONTROLLER_MAPPING[name]}", __name__)
+    controller = getattr(module, name)
+    if controller.instance is None or (instance in (None, controller.instance) and not friendly_name):
+        return controller
+    return controller.for_instance(instance or controller.instance, friendly_name)
+
+
+def __getattr__(name):
+    if name in CONTROLLER_MAPPING:
+        return load_controller(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+from .registry import get_directive_registry, get_dispatch_table  # noqa: E402
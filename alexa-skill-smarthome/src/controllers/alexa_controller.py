@@ -3,6 +3,37 @@
 from abc import ABC, abstractmethod
 
 class AlexaController(ABC):
+    # Instanz für Multi-Instanz-Interfaces (ModeController, ToggleController, ...)
+    instance = None
+    # Weitere Instanzen (for_instance) speichern ihren State unter 'name#instance'
+    state_suffix = ""
+    # Anzeigename der Instanz (capabilityResources), None = Vorgabe des Controllers
+    friendly_name = None
+    # Unterstützte Direktiven-Namen, daraus wird die Dispatch-Registry gebaut
+    directives = ()
+    # Langsame Aktoren antworten sofort mit DeferredResponse (geschätzte Sekunden)
+    deferral_seconds = None
+    # ChangeReport-Drosselung: Totband für numerische Werte
+    report_deadband = None
+
+    @classmethod
+    def state_key(cls, name):
+        """Key einer Property im State des Geräts."""
+        return name + cls.state_suffix
+
+    @classmethod
+    def for_instance(cls, instance, friendly_name=None):
+        """
+        Eigene Controller-Klasse für eine konfigurierte Instanz. Capability-
+        Fragmente und Dispatch-Tabellen werden pro Klasse gecacht und bleiben
+        so auch mit mehreren Instanzen auf einem Gerät gültig.
+        """
+        return type(cls.__name__, (cls,), {
+            "instance": instance,
+            "state_suffix": "" if instance == cls.instance else f"#{instance}",
+            "friendly_name": friendly_name or cls.friendly_name
+        })
+
     @property
     @abstractmethod
     def namespace(self):
@@ -25,6 +56,14 @@ class AlexaController(ABC):
         """Verarbeitet eine Direktive"""
         return {}
 
+    @staticmethod
+    def get_adjustment(name, payload):
+        """
+        Beschreibt eine relative Direktive für das atomare Update in der DB:
+        {"attribute", "delta", "default", "min", "max"} oder None.
+        """
+        return None
+
     @staticmethod
     def handle_update(update_dict):
         """Übersetzt Hardware-Status (z.B. von OpenHAB) -> Datenbank-Status."""
@@ -8,6 +8,8 @@ logger = logging.getLogger(__name__)
 
 class BrightnessController(AlexaController):
     namespace = "Alexa.BrightnessController"
+    directives = ("SetBrightness", "AdjustBrightness")
+    report_deadband = 2
 
     @staticmethod
     def get_capability(proactive=False, retrievable=True):
@@ -38,6 +40,13 @@ class BrightnessController(AlexaController):
         }]
 
 
+    @staticmethod
+    def get_adjustment(name, payload):
+        if name == "AdjustBrightness":
+            return {"attribute": "brightness", "delta": int(payload.get('brightnessDelta', 0)),
+                    "default": 50, "min": 0, "max": 100}
+        return None
+
     @staticmethod
     def handle_directive(name, payload, current_state=None):
         logger.info(f"BrightnessController: Handling directive '{name}' with payload: {payload}")
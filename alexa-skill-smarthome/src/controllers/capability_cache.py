@@ -0,0 +1,44 @@
+# controllers/capability_cache.py
+
+import json
+from functools import lru_cache
+
+# Konstante Interfaces, die jedes Gerät in der Discovery braucht.
+# Die Dicts werden von allen Geräten geteilt und dürfen NICHT verändert werden.
+ENDPOINT_HEALTH_CAPABILITY = {
+    "type": "AlexaInterface",
+    "interface": "Alexa.EndpointHealth",
+    "version": "3",
+    "properties": {
+        "supported": [{"name": "connectivity"}],
+        "retrievable": True,
+        "proactivelyReported": True
+    }
+}
+
+ALEXA_CAPABILITY = {
+    "type": "AlexaInterface",
+    "interface": "Alexa",
+    "version": "3"
+}
+
+JSON_SEPARATORS = (",", ":")
+
+
+@lru_cache(maxsize=None)
+def get_capability_fragment(controller, proactive, retrievable):
+    """
+    Liefert das Discovery-Dict eines Controllers, einmal pro Container gebaut.
+    Das Ergebnis wird geteilt und ist als unveränderlich zu behandeln.
+    """
+    return controller.get_capability(proactive, retrievable)
+
+
+@lru_cache(maxsize=None)
+def get_capability_json(controller, proactive, retrievable):
+    """Liefert das vorserialisierte JSON-Fragment eines Controllers."""
+    return json.dumps(get_capability_fragment(controller, proactive, retrievable), separators=JSON_SEPARATORS)
+
+
+ENDPOINT_HEALTH_JSON = json.dumps(ENDPOINT_HEALTH_CAPABILITY, separators=JSON_SEPARATORS)
+ALEXA_JSON = json.dumps(ALEXA_CAPABILITY, separators=JSON_SEPARATORS)
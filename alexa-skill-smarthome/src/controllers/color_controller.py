@@ -9,6 +9,7 @@ logger = logging.getLogger(__name__)
 
 class ColorController(AlexaController):
     namespace = "Alexa.ColorController"
+    directives = ("SetColor",)
 
     @staticmethod
     def get_capability(proactive=False, retrievable=True):
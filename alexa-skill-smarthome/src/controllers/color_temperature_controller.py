@@ -9,6 +9,7 @@ logger = logging.getLogger(__name__)
 
 class ColorTemperatureController(AlexaController):
     namespace = "Alexa.ColorTemperatureController"
+    directives = ("SetColorTemperature", "IncreaseColorTemperature", "DecreaseColorTemperature")
 
     @staticmethod
     def get_capability(proactive=False, retrievable=True):
@@ -49,6 +50,14 @@ class ColorTemperatureController(AlexaController):
             "value": formatted_value
         }]
 
+    @staticmethod
+    def get_adjustment(name, payload):
+        if name in ("IncreaseColorTemperature", "DecreaseColorTemperature"):
+            return {"attribute": "colorTemperatureInKelvin",
+                    "delta": 500 if name == "IncreaseColorTemperature" else -500,
+                    "default": 2700, "min": 1000, "max": 10000}
+        return None
+
     @staticmethod
     def handle_directive(name, payload, current_state=None):
         logger.info(f"ColorTemperatureController: Handling '{name}'")
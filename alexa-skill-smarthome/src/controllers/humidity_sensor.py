@@ -5,6 +5,7 @@ from .alexa_controller import AlexaController
 
 class HumiditySensor(AlexaController):
     namespace = "Alexa.HumiditySensor"
+    report_deadband = 1
 
     @staticmethod
     def get_capability(proactive=True, retrievable=True):
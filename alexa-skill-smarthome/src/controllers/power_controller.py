@@ -8,6 +8,7 @@ logger = logging.getLogger(__name__)
 
 class PowerController(AlexaController):
     namespace = "Alexa.PowerController"
+    directives = ("TurnOn", "TurnOff")
 
     @staticmethod
     def get_capability(proactive=False, retrievable=True):
@@ -0,0 +1,63 @@
+# controllers/registry.py
+#
+# Dispatch-Registry für Direktiven: (namespace, instance, name) -> Handler.
+# Die Einträge werden einmal pro Controller-Klasse gebaut, sobald der
+# Controller geladen ist. Pro Geräte-Konfiguration (Tupel der Controller-
+# Klassen) entsteht daraus lazy eine Dispatch-Tabelle, die in warmen
+# Containern wiederverwendet wird.
+
+from collections import namedtuple
+from functools import lru_cache, partial
+
+# handle(payload, current_state) und adjustment(payload) mit fest gebundenem Namen
+DirectiveHandler = namedtuple("DirectiveHandler", ["controller", "handle", "adjustment"])
+
+
+@lru_cache(maxsize=None)
+def controller_directives(controller):
+    """Registry-Einträge eines Controllers, einmal pro Klasse gebaut."""
+    return {
+        (controller.namespace, controller.instance, name): DirectiveHandler(
+            controller,
+            partial(controller.handle_directive, name),
+            partial(controller.get_adjustment, name)
+        )
+        for name in controller.directives
+    }
+
+
+def build_registry(controllers):
+    registry = {}
+    for controller in controllers:
+        for key, handler in controller_directives(controller).items():
+            if key in registry:
+                raise ValueError(f"Direktive {key} ist doppelt registriert.")
+            registry[key] = handler
+    return registry
+
+
+@lru_cache(maxsize=None)
+def get_directive_registry():
+    """Registry über alle Controller (lädt alle Controller-Module)."""
+    from . import CONTROLLER_MAPPING, load_controller
+    return build_registry([load_controller(name) for name in CONTROLLER_MAPPING])
+
+
+@lru_cache(maxsize=128)
+def get_dispatch_table(controllers):
+    """
+    Dispatch-Tabelle für ein Gerät (controllers als Tupel von Klassen).
+    Hat ein Interface auf dem Gerät genau eine Instanz, wird es zusätzlich
+    ohne Instanz eingetragen (Direktiven ohne 'instance' im Header).
+    """
+    table = {}
+    for controller in controllers:
+        table.update(controller_directives(controller))
+
+    namespaces = {}
+    for controller in controllers:
+        namespaces.setdefault(controller.namespace, set()).add(controller.instance)
+    for (namespace, instance, name), handler in list(table.items()):
+        if instance is not None and len(namespaces[namespace]) == 1:
+            table.setdefault((namespace, None, name), handler)
+    return table
@@ -10,14 +10,19 @@ logger = logging.getLogger(__name__)
 class RollershutterController(AlexaController):
     namespace = "Alexa.ModeController"
     instance = "Blind.Position"
+    directives = ("SetMode",)
+    # Der Rolladen braucht bis zur Endlage, Alexa bekommt die Response nachgereicht
+    deferral_seconds = 20
 
-    @staticmethod
-    def get_capability(proactive=False, retrievable=True):
+    @classmethod
+    def get_capability(cls, proactive=False, retrievable=True):
+        if cls.friendly_name:
+            friendly_name = {"@type": "text", "value": {"text": cls.friendly_name, "locale": "de-DE"}}
+        else:
+            friendly_name = {"@type": "asset", "value": {"assetId": "Alexa.Setting.Opening"}}
         return {
             "capabilityResources": {
-                "friendlyNames": [
-                    {"@type": "asset", "value": {"assetId": "Alexa.Setting.Opening"}}
-                ]
+                "friendlyNames": [friendly_name]
             },
             "configuration": {
                 "ordered": False,
@@ -97,7 +102,7 @@ class RollershutterController(AlexaController):
             },
             "type": "AlexaInterface",
             "interface": "Alexa.ModeController",
-            "instance": RollershutterController.instance,
+            "instance": cls.instance,
             "version": "3",
             "properties": {
                 "proactivelyReported": proactive,
@@ -106,24 +111,24 @@ class RollershutterController(AlexaController):
             },
         }
 
-    @staticmethod
-    def get_properties(state_dict):
+    @classmethod
+    def get_properties(cls, state_dict):
         # Wir erwarten in der DB Werte wie "Position.Up", "Position.Down" oder "Position.Stopped"
         # Falls in der DB nur "opened" steht, muss hier gemappt werden:
-        value = state_dict.get("mode", "Position.Stopped")
+        value = state_dict.get(cls.state_key("mode"), "Position.Stopped")
 
         return [
             {
                 "namespace": "Alexa.ModeController",
-                "instance": RollershutterController.instance,
+                "instance": cls.instance,
                 "name": "mode",
                 "value": value,
             }
         ]
 
-    @staticmethod
-    def handle_directive(name, payload, current_state=None):
-        logger.info(f"Rollershutter: Handling '{name}'")
+    @classmethod
+    def handle_directive(cls, name, payload, current_state=None):
+        logger.info(f"Rollershutter: Handling '{name}' ({cls.instance})")
 
         if name == "SetMode":
             # 1. Wir behalten den VOLLEN Namen für die Datenbank/Alexa (Status-Reporting)
@@ -141,24 +146,25 @@ class RollershutterController(AlexaController):
                 oh_command = "STOP"
 
             return {
-                "alexa": {"mode": full_mode},  # Speichert "Position.Up" in DynamoDB
+                "alexa": {cls.state_key("mode"): full_mode},  # Speichert "Position.Up" in DynamoDB
                 "openhab": oh_command  # Sendet "UP" via MQTT
             }
 
         logger.warning(f"Rollershutter: Directive '{name}' not supported.")
         return {}
 
-    @staticmethod
-    def handle_update(update_dict):
+    @classmethod
+    def handle_update(cls, update_dict):
         oh_state = update_dict.get("state")  # z.B. "CLOSED", "OPEN" oder "MOVE"/"STOP"
 
         # Mapping von OpenHAB Status auf Alexa Mode-Werte
+        key = cls.state_key("mode")
         if oh_state == "CLOSED":
-            return {"mode": "Position.Down"}
+            return {key: "Position.Down"}
         elif oh_state == "OPEN":
-            return {"mode": "Position.Up"}
+            return {key: "Position.Up"}
         elif oh_state in ["STOP", "MOVE", "UNDEF"]:
             # Wenn der Rolladen mitten im Lauf gestoppt wurde
-            return {"mode": "Position.Stopped"}
+            return {key: "Position.Stopped"}
 
         return {}
@@ -8,6 +8,7 @@ logger = logging.getLogger(__name__)
 
 class SceneController(AlexaController):
     namespace = "Alexa.SceneController"
+    directives = ("Activate", "Deactivate")
 
     @staticmethod
     def get_capability(proactive=False, retrievable=False):
@@ -7,6 +7,7 @@ logger = logging.getLogger(__name__)
 
 class SpeakerController(AlexaController):
     namespace = "Alexa.Speaker"
+    directives = ("SetVolume", "AdjustVolume", "SetMute")
 
     @staticmethod
     def get_capability(proactive=False, retrievable=True):
@@ -34,6 +35,13 @@ class SpeakerController(AlexaController):
             }
         ]
 
+    @staticmethod
+    def get_adjustment(name, payload):
+        if name == "AdjustVolume":
+            return {"attribute": "volume", "delta": int(payload.get('volume', 0)),
+                    "default": 10, "min": 0, "max": 100}
+        return None
+
     @staticmethod
     def handle_directive(name, payload, current_state=None):
         logger.info(f"SpeakerController: Handling '{name}'")
@@ -8,6 +8,7 @@ logger = logging.getLogger(__name__)
 
 class StepSpeakerController(AlexaController):
     namespace = "Alexa.StepSpeakerController"
+    directives = ("AdjustVolume",)
 
     @staticmethod
     def get_capability(proactive=False, retrievable=False):
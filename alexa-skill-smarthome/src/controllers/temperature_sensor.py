@@ -4,6 +4,7 @@ from .alexa_controller import AlexaController
 
 class TemperatureSensor(AlexaController):
     namespace = "Alexa.TemperatureSensor"
+    report_deadband = 0.2
 
     @staticmethod
     def get_capability(proactive=True, retrievable=True):
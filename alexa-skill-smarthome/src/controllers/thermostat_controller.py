@@ -8,6 +8,7 @@ logger = logging.getLogger(__name__)
 
 class ThermostatController(AlexaController):
     namespace = "Alexa.ThermostatController"
+    directives = ("SetTargetSetpoint", "AdjustTargetSetpoint", "SetThermostatMode")
 
     @staticmethod
     def get_capability(proactive=False, retrievable=True):
@@ -56,6 +57,15 @@ class ThermostatController(AlexaController):
             }
         ]
 
+    @staticmethod
+    def get_adjustment(name, payload):
+        if name == "AdjustTargetSetpoint":
+            # Grenzen wie beim Plausibilitätscheck in handle_update
+            return {"attribute": "targetSetpoint",
+                    "delta": payload.get('targetSetpointDelta', {}).get('value', 0),
+                    "default": 21.0, "min": 4.0, "max": 35.0}
+        return None
+
     @staticmethod
     def handle_directive(name, payload, current_state=None):
         logger.info(f"ThermostatController: Handling '{name}'")
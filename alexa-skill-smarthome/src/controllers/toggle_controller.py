@@ -8,16 +8,19 @@ logger = logging.getLogger(__name__)
 
 class ToggleController(AlexaController):
     namespace = "Alexa.ToggleController"
-    # Eine Instanz ist bei ToggleController PFLICHT
+    # Eine Instanz ist bei ToggleController PFLICHT, weitere Instanzen
+    # kommen aus der Capability-Konfiguration (siehe for_instance)
     instance = "Light.Backlight"
+    friendly_name = "Hintergrundlicht"
+    directives = ("TurnOn", "TurnOff")
 
-    @staticmethod
-    def get_capability(proactive=False, retrievable=True):
+    @classmethod
+    def get_capability(cls, proactive=False, retrievable=True):
         return {
             "type": "AlexaInterface",
             "interface": "Alexa.ToggleController",
             "version": "3",
-            "instance": ToggleController.instance, # Instanz hier definieren
+            "instance": cls.instance, # Instanz hier definieren
             "properties": {
                 "supported": [{"name": "toggleState"}],
                 "retrievable": retrievable,
@@ -25,37 +28,37 @@ class ToggleController(AlexaController):
             },
             "capabilityResources": {
                 "friendlyNames": [
-                    {"@type": "text", "value": {"text": "Hintergrundlicht", "locale": "de-DE"}}
+                    {"@type": "text", "value": {"text": cls.friendly_name, "locale": "de-DE"}}
                 ]
             }
         }
 
-    @staticmethod
-    def get_properties(state_dict):
-        # Wir speichern den State spezifisch für diese Instanz in der DB
-        # Falls du mehrere Toggles hast, wäre der Key z.B. 'toggleState#Light.Backlight'
-        value = state_dict.get('toggleState', 'OFF')
+    @classmethod
+    def get_properties(cls, state_dict):
+        # Wir speichern den State spezifisch für diese Instanz in der DB,
+        # weitere Toggles unter z.B. 'toggleState#Fan.Oscillate'
+        value = state_dict.get(cls.state_key('toggleState'), 'OFF')
         return [{
             "namespace": "Alexa.ToggleController",
-            "instance": ToggleController.instance, # Instanz auch hier zurückgeben
+            "instance": cls.instance, # Instanz auch hier zurückgeben
             "name": "toggleState",
             "value": value
         }]
 
-    @staticmethod
-    def handle_directive(name, payload, current_state=None):
-        logger.info(f"ToggleController: Handling '{name}'")
+    @classmethod
+    def handle_directive(cls, name, payload, current_state=None):
+        logger.info(f"ToggleController: Handling '{name}' ({cls.instance})")
         # Alexa sendet TurnOn oder TurnOff
         value = "ON" if name == "TurnOn" else "OFF"
 
         return {
-            "alexa": {"toggleState": value},
+            "alexa": {cls.state_key("toggleState"): value},
             "openhab": value
         }
 
-    @staticmethod
-    def handle_update(update_dict):
+    @classmethod
+    def handle_update(cls, update_dict):
         state = update_dict.get("state")
         if state in ["ON", "OFF"]:
-            return {"toggleState": state}
+            return {cls.state_key("toggleState"): state}
         return {}
@@ -2,86 +2,278 @@
 import logging
 import json
 import time
-from alexa_auth import handle_accept_grant
-from alexa_device import AlexaDevice
+from alexa_auth import handle_accept_grant, get_valid_access_token
+from alexa_device import AlexaDevice, InvalidDirectiveValue
 
-import boto3
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from alexa_device import AlexaDevice
 from alexa_response import AlexaResponse
+from alexa_discovery import (
+    iter_discovery_records, iter_discovery_endpoints, first_discovery_batch, split_discovery_batches,
+    report_discovery_overflow, discovery_scan_kwargs
+)
+from alexa_catalog import (
+    load_discovery_document, DiscoveryDocumentWriter, StaleDiscoveryDocument, current_catalog_version
+)
+from alexa_cache import LRUCache
+from alexa_state_store import DeviceStateStore
+from alexa_dynamodb import Table
+from alexa_dedup import DirectiveDeduplicator, directive_key
+from alexa_warmup import is_warmup_event, run_warmup, warm_up_controllers, warm_up_https
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 DEPLOY_DATE = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
 
-# alexa_discovery.py
-from alexa_device import AlexaDevice
-from alexa_response import AlexaResponse
-
-# Boto3 Ressourcen außerhalb des Handlers initialisieren
-# (Dadurch werden sie bei Warm-Starts wiederverwendet)
-db_resource = boto3.resource("dynamodb")
+# AWS Clients werden erst beim ersten Zugriff angelegt (Cold Start) und
+# danach bei Warm-Starts wiederverwendet
 
 # Den Tabellennamen aus einer Umgebungsvariable lesen (Best Practice)
 # Falls nicht gesetzt, nutzen wir den Fallback-Namen
 DDB_TABLE_NAME = os.environ.get("DDB_TABLE", "smarthome_devices")
 
 # Die Table-Referenz erstellen
-table = db_resource.Table(DDB_TABLE_NAME)
+table = Table(DDB_TABLE_NAME)
 
-# IoT Client für MQTT (außerhalb der Funktion für Re-use)
-iot_client = boto3.client("iot-data")
+# State-Writes der Control-Direktiven über dieselbe Table-Referenz
+state_store = DeviceStateStore(table)
 
-def handle_discovery(devices_records):
+# IoT Client für MQTT (außerhalb der Funktion für Re-use)
+iot_client = None
+
+
+def get_iot_client():
+    global iot_client
+    if iot_client is None:
+        import boto3
+        iot_client = boto3.client("iot-data")
+    return iot_client
+
+# Lambda Client für den asynchronen Discovery-Überlauf (Aufruf der eigenen Funktion)
+lambda_client = None
+DISCOVERY_OVERFLOW_FUNCTION = os.environ.get(
+    "DISCOVERY_OVERFLOW_FUNCTION", os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "alexa-skill-smarthome"))
+
+
+def get_lambda_client():
+    global lambda_client
+    if lambda_client is None:
+        import boto3
+        lambda_client = boto3.client("lambda")
+    return lambda_client
+
+# Gemeinsamer Thread-Pool für parallele I/O im Control-Pfad (MQTT + DynamoDB)
+IO_WORKERS = int(os.environ.get("IO_WORKERS", "4"))
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS)
+# Max. Wartezeit pro I/O-Schritt, damit wir im Alexa-Timeout bleiben (Sekunden)
+CONTROL_IO_TIMEOUT = float(os.environ.get("CONTROL_IO_TIMEOUT", "4"))
+
+# Erkennung wiederholter Direktiven (Alexa-Retries)
+deduplicator = DirectiveDeduplicator()
+
+# Wie lange eine DeferredResponse nachgereicht werden darf (Sekunden)
+DEFERRED_RESPONSE_TTL = int(os.environ.get("DEFERRED_RESPONSE_TTL", "120"))
+
+# Cache der Geräte-Records für ReportState/Control in warmen Containern
+DEVICE_CACHE_SIZE = int(os.environ.get("DEVICE_CACHE_SIZE", "256"))
+DEVICE_CACHE_TTL = float(os.environ.get("DEVICE_CACHE_TTL", "5"))
+device_cache = LRUCache(maxsize=DEVICE_CACHE_SIZE, ttl=DEVICE_CACHE_TTL)
+
+# Negativ-Cache für unbekannte Endpunkte (Alexa fragt gelöschte Geräte weiter an)
+MISSING_ENDPOINT_TTL = float(os.environ.get("MISSING_ENDPOINT_TTL", "60"))
+missing_endpoints = LRUCache(maxsize=DEVICE_CACHE_SIZE, ttl=MISSING_ENDPOINT_TTL)
+
+def validate_device_caches():
+    """Bindet die Geräte-Caches an die aktuelle Katalog-Version."""
+    version = current_catalog_version()
+    device_cache.validate(version)
+    # Neu angelegte Geräte erhöhen die Version -> auch der Negativ-Cache verfällt
+    missing_endpoints.validate(version)
+
+def load_device_record(endpoint_id):
+    """
+    Holt den Geräte-Record aus dem Container-Cache oder aus der DynamoDB.
+    Ändert sich die Katalog-Version (Add/Update/Delete), wird der Cache verworfen.
     """
-    Erstellt die Antwort auf den Alexa.Discovery / Discover Request.
-    Nutzt die Logik der AlexaDevice-Klasse.
+    try:
+        validate_device_caches()
+    except Exception as e:
+        logger.warning(f"Katalog-Version nicht lesbar: {e}")
+
+    record = device_cache.get(endpoint_id)
+    if record is None:
+        # Bekannt unbekannte Endpunkte ohne DB-Read beantworten
+        if missing_endpoints.get(endpoint_id):
+            return None
+        record = table.get_item(Key={'device_id': endpoint_id}).get('Item')
+        if record:
+            device_cache.put(endpoint_id, record)
+        else:
+            missing_endpoints.put(endpoint_id, True)
+    return record
+
+def build_discovery_response(encoded_endpoints):
+    """
+    Baut die Discover.Response aus den serialisierten Endpunkten (Iterator).
+    Alexa-Limits (Anzahl + Größe) werden eingehalten. Passt nicht alles in die
+    Response, übernimmt ein asynchroner Aufruf den Rest (AddOrUpdateReport),
+    Alexa bekommt die Antwort sofort. Liefert (response, stats).
     """
     # Initialisiere die Antwort-Struktur
     adr = AlexaResponse(name="Discover.Response", namespace="Alexa.Discovery")
-    
-    endpoints = []
-    for record in devices_records:
-        # 1. Filter: Nur enabled Geräte
-        # Hier nutzen wir den record direkt, um gar nicht erst das Objekt zu bauen
-        if not record.get('enabled', True):
-            continue
-
-        # 2. AlexaDevice Objekt erstellen
-        # Das Objekt weiß selbst, wie es seine Capabilities und Payloads baut
-        device = AlexaDevice(record)
-        
-        # 3. Das fertige Endpunkt-Dict von der Klasse abholen
-        # get_discovery_payload() liefert genau das Format, das Alexa erwartet
-        endpoints.append(device.get_discovery_payload())
-
-    # 4. Die Liste der Endpunkte in die Response setzen und das finale JSON liefern
+
+    batch, more = first_discovery_batch(encoded_endpoints)
+    endpoints = [json.loads(encoded) for encoded in batch]
+    stats = {"endpoints": len(endpoints), "overflow": None}
+    # Der Rest wird asynchron gesendet
+    if more:
+        answered = [endpoint["endpointId"] for endpoint in endpoints]
+        stats["overflow"] = "scheduled" if schedule_discovery_overflow(answered) else "failed"
+
+    # Die Liste der Endpunkte in die Response setzen und das finale JSON liefern
     adr.set_payload_endpoints(endpoints)
+    return adr.get(), stats
+
+def schedule_discovery_overflow(answered):
+    """
+    Ruft die eigene Lambda asynchron (InvocationType Event) für den
+    Discovery-Überlauf auf. answered sind die Endpunkt-IDs, die schon in der
+    Discover.Response stehen. Liefert True, wenn der Aufruf angenommen wurde.
+    """
+    try:
+        get_lambda_client().invoke(
+            FunctionName=DISCOVERY_OVERFLOW_FUNCTION,
+            InvocationType="Event",
+            Payload=json.dumps({"discovery_overflow": {"answered": answered}})
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Discovery-Überlauf konnte nicht gestartet werden: {e}")
+        return False
+
+def run_discovery(build):
+    """
+    Ruft build(encoded_endpoints) mit den Endpunkten aus dem vorberechneten
+    Dokument auf. Nur bei fehlendem oder veraltetem Dokument wird die Tabelle
+    neu gescannt (und das Dokument dabei neu geschrieben).
+    Die Endpunkte laufen als Generator-Kette durch, der Speicherbedarf hängt
+    von Seiten- und Batch-Größe ab, nicht von der Anzahl der Geräte.
+    Liefert (Ergebnis von build, Quelle fürs Log).
+    """
+    try:
+        encoded_endpoints, catalog_version = load_discovery_document()
+    except Exception as e:
+        logger.error(f"Discovery-Dokument nicht lesbar: {e}")
+        encoded_endpoints, catalog_version = None, None
+
+    if encoded_endpoints is not None:
+        try:
+            return build(encoded_endpoints), f"Dokument v{catalog_version}"
+        except StaleDiscoveryDocument as e:
+            logger.warning(f"{e}, baue neu.")
+
+    # Alle enabled Geräte aus dem sparse Index laden (paginiert, parallele Segmente, ohne State)
+    scan_stats = {}
+    records = iter_discovery_records(table, stats=scan_stats, **discovery_scan_kwargs())
+    encoded_endpoints = iter_discovery_endpoints(records)
+    if catalog_version is not None:
+        # Das Dokument wird nebenbei für die nächsten Discoveries geschrieben
+        encoded_endpoints = DiscoveryDocumentWriter(catalog_version).write_through(encoded_endpoints)
+
+    result = build(encoded_endpoints)
+    return result, f"{scan_stats['items']} Records aus {scan_stats['pages']} Seiten / {scan_stats['segments']} Segmenten"
+
+def handle_discovery():
+    """Erstellt die Antwort auf den Alexa.Discovery / Discover Request."""
+    (response, stats), source = run_discovery(build_discovery_response)
+    logger.info(f"Discovery aus {source}: {stats}")
+    return response
+
+def handle_discovery_overflow(event):
+    """
+    Asynchroner Teil der Discovery: meldet alle Endpunkte, die nicht in der
+    Discover.Response standen, parallel per AddOrUpdateReport.
+    """
+    answered = set(event.get("answered", []))
+
+    def report_overflow(encoded_endpoints):
+        overflow = (encoded for encoded in encoded_endpoints
+                    if json.loads(encoded)["endpointId"] not in answered)
+        return report_discovery_overflow(split_discovery_batches(overflow))
+
+    (sent, failed), source = run_discovery(report_overflow)
+    logger.info(f"Discovery-Überlauf aus {source}: {sent} Batches, {failed} fehlgeschlagen")
+    if failed:
+        # Lambda wiederholt asynchrone Aufrufe, AddOrUpdateReport ist idempotent
+        raise RuntimeError(f"{failed} AddOrUpdateReport Batches fehlgeschlagen")
+    return {"overflow_batches": sent}
+
+def build_error_response(request, error_type, message):
+    """Baut ein Alexa ErrorResponse Event passend zur Direktive."""
+    directive = request["directive"]
+    endpoint = directive.get("endpoint", {})
+    adr = AlexaResponse(
+        name="ErrorResponse",
+        namespace="Alexa",
+        correlation_token=directive["header"].get("correlationToken"),
+        endpoint_id=endpoint.get("endpointId", "INVALID"),
+        token=endpoint.get("scope", {}).get("token", "no-token"),
+        payload={"type": error_type, "message": message}
+    )
     return adr.get()
 
+def publish_mqtt(alexa_message):
+    """Hardware informieren via MQTT."""
+    get_iot_client().publish(
+        topic="alexa",
+        qos=1,
+        payload=json.dumps(alexa_message)
+    )
+
+def timed(func, *args):
+    """Führt func aus und liefert (Ergebnis, Dauer in ms)."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
 def handle_control(device, request):
     """
     Verarbeitet alle Steuerungsbefehle (TurnOn, SetBrightness, SetMode, etc.)
+    MQTT-Publish und State-Speicherung laufen parallel im io_executor:
+    - Publish fehlgeschlagen -> ErrorResponse ENDPOINT_UNREACHABLE (der State
+      wird über das nächste Hardware-Update der MQTT-Lambda korrigiert)
+    - Speichern fehlgeschlagen -> nur Log, die Hardware hat den Befehl bekommen
+    Bei langsamen Aktoren (DeferredResponse) wird die ausstehende Response
+    vor dem Publish gespeichert und Alexa sofort vertröstet.
     """
     directive = request["directive"]
     header = directive["header"]
     endpoint_id = directive["endpoint"]["endpointId"]
-    correlation_token = header.get("correlationToken")
-    token = directive["endpoint"]["scope"]["token"]
-    # Sicherer Zugriff auf das Token (analog zu handle_report_state)
-    scope = directive["endpoint"].get("scope", {})
-    token = scope.get("token", "no-token")
 
     namespace = header.get("namespace")
     name = header.get("name")
-    payload = directive.get("payload", {})
     
-    # Befehl ausführen (Die Magie der Controller nutzen)
-    mqtt_data = device.execute_directive(directive)
+    # Direktiven, die kein Controller des Geräts kennt, gar nicht erst ausführen
+    if not device.get_handler(directive):
+        logger.error(f"Direktive {namespace}.{name} wird von {endpoint_id} nicht unterstützt.")
+        return build_error_response(request, "INVALID_DIRECTIVE", f"{namespace}.{name} wird nicht unterstützt.")
 
-    if mqtt_data:
+    # Langsame Aktoren: sofort DeferredResponse, die Response schickt die MQTT-Lambda
+    deferral = device.get_deferral(directive)
+
+    # Befehl ausführen (Die Magie der Controller nutzen)
+    try:
+        mqtt_data, execute_ms = timed(device.execute_directive, directive, state_store)
+    except InvalidDirectiveValue as e:
+        logger.error(f"Ungültiger Wert in {namespace}.{name} für {endpoint_id}: {e}")
+        return build_error_response(request, "INVALID_VALUE", f"Ungültiger Wert: {e}")
+    timings = {"execute_ms": execute_ms}
+
+    # 0 (z.B. Helligkeit) ist ein gültiger Payload
+    if mqtt_data is not None:
       handle_generic = getattr(device, 'handle_generic', True) 
       item_name = getattr(device, 'item_name', device.endpoint_id)
       alexa_message = {
@@ -92,19 +284,78 @@ def handle_control(device, request):
             "requestMethod": name,
             "payload": mqtt_data
         }
+      # Multi-Instanz-Interfaces: die Bridge braucht die Instanz (z.B. Fan.Oscillate)
+      if header.get("instance"):
+          alexa_message["instance"] = header["instance"]
       logger.info("mqtt alexa message: %s\n", json.dumps(alexa_message))
-      # Hardware informieren via MQTT
-      iot_client.publish(
-          topic="alexa",
-          qos=1,
-          payload=json.dumps(alexa_message)
-      )
-        
-      # Neuen Status permanent in DB speichern
-      device.update_db()
+
+      if deferral:
+          # Die ausstehende Response muss vor dem Publish gespeichert sein,
+          # die Quittung der Bridge kann sehr schnell kommen
+          device.pending_response = {
+              "correlation_token": header.get("correlationToken"),
+              "expires_at": int(time.time()) + DEFERRED_RESPONSE_TTL
+          }
+          saved, timings["db_ms"] = timed(device.update_db, state_store)
+          if not saved:
+              logger.error(f"DeferredResponse für {endpoint_id} nicht gespeichert, antworte synchron.")
+              device.pending_response = None
+              deferral = None
+
+      # Publish und DB-Write sind unabhängig voneinander -> parallel
+      publish_future = io_executor.submit(timed, publish_mqtt, alexa_message)
+      db_future = io_executor.submit(timed, device.update_db, state_store) if device.pending_state else None
+
+      publish_error = None
+      try:
+          _, timings["publish_ms"] = publish_future.result(timeout=CONTROL_IO_TIMEOUT)
+      except Exception as e:
+          publish_error = e
+
+      if db_future:
+          try:
+              saved, timings["db_ms"] = db_future.result(timeout=CONTROL_IO_TIMEOUT)
+              if not saved:
+                  logger.error(f"State für {endpoint_id} nicht gespeichert.")
+          except Exception as e:
+              logger.error(f"State für {endpoint_id} nicht gespeichert: {e}")
+
+      logger.info(f"Control Timings: {timings}")
+      if publish_error is not None:
+          logger.error(f"MQTT Publish für {endpoint_id} fehlgeschlagen: {publish_error}")
+          if deferral:
+              # Alexa bekommt jetzt die ErrorResponse, die MQTT-Lambda darf für
+              # diesen correlationToken keine Response mehr nachreichen
+              try:
+                  state_store.take_pending_response(endpoint_id)
+              except Exception as e:
+                  logger.error(f"Ausstehende Response für {endpoint_id} nicht entfernt: {e}")
+          return build_error_response(request, "ENDPOINT_UNREACHABLE", "Gerät ist über MQTT nicht erreichbar.")
     else:
       logger.error("no mqtt payload!")
-    # Erfolgs-Antwort für Alexa bauen
+      return build_error_response(request, "INVALID_DIRECTIVE", f"Ungültiger Payload für {namespace}.{name}.")
+
+    if deferral:
+        return build_deferred_response(request, deferral)
+    return build_control_response(device, request)
+
+def build_deferred_response(request, seconds):
+    """Sofortige Antwort für langsame Aktoren, die Response folgt über das Event Gateway."""
+    adr = AlexaResponse(
+        name="DeferredResponse",
+        namespace="Alexa",
+        correlation_token=request["directive"]["header"].get("correlationToken"),
+        payload={"estimatedDeferralInSeconds": seconds}
+    )
+    return adr.get()
+
+def build_control_response(device, request):
+    """Erfolgs-Antwort für Alexa mit dem aktuellen State des Geräts."""
+    directive = request["directive"]
+    endpoint_id = directive["endpoint"]["endpointId"]
+    correlation_token = directive["header"].get("correlationToken")
+    token = directive["endpoint"].get("scope", {}).get("token", "no-token")
+
     adr = AlexaResponse(
         name="Response",
         namespace="Alexa",
@@ -114,8 +365,7 @@ def handle_control(device, request):
     )
 
     # Alle aktuellen Properties (inkl. der Änderung) in den Context packen
-    for prop in device.get_all_properties():
-        adr.add_context_property(**prop)
+    adr.add_context_properties(device.get_all_properties())
 
     return adr.get()
 
@@ -141,15 +391,82 @@ def handle_report_state(device, request):
         token=token
     )
 
-    for prop in device.get_all_properties():
-        adr.add_context_property(**prop)
+    # Vorgerenderte Properties aus dem Record, nur timeOfSample kommt frisch dazu
+    adr.add_context_properties(device.get_report_properties())
 
     return adr.get()
     
 
+def response_json(response):
+    """JSON der Antwort, bei AlexaResponse nur einmal erzeugt (Logging, Dedup)."""
+    to_json = getattr(response, "to_json", None)
+    return to_json() if to_json else json.dumps(response)
+
+def warm_up_iot():
+    """Baut die Verbindung zum IoT Data Endpoint auf (ohne etwas zu publishen)."""
+    get_iot_client().list_retained_messages(maxResults=1)
+
+def warm_up_executor():
+    """Startet die Threads des io_executor vorab."""
+    for future in [io_executor.submit(time.sleep, 0) for _ in range(IO_WORKERS)]:
+        future.result()
+
+def handle_warmup():
+    return run_warmup({
+        "catalog": validate_device_caches,
+        "iot": warm_up_iot,
+        "controllers": warm_up_controllers,
+        "https": warm_up_https,
+        "lwa_token": get_valid_access_token,
+        "executor": warm_up_executor
+    })
+
+def handle_directive(request, endpoint_id, name, dedup_key):
+    """ReportState bzw. Control für einen Endpunkt (nach der Dedup-Prüfung)."""
+    # Device-Daten aus dem Cache bzw. der DynamoDB holen
+    record = load_device_record(endpoint_id)
+    logger.info(f"Device-Cache: {device_cache.stats()}")
+    if not record:
+        logger.error(f"Device {endpoint_id} nicht in Datenbank gefunden!")
+        if dedup_key:
+            deduplicator.release(dedup_key)
+        # Sauberer Fehler statt {}, sonst wiederholt Alexa die Direktive
+        return build_error_response(request, "NO_SUCH_ENDPOINT", f"Endpunkt {endpoint_id} ist unbekannt.")
+
+    # Jetzt erstellen wir das device-Objekt
+    device = AlexaDevice(record)
+
+    if name == "ReportState":
+        return handle_report_state(device, request)
+
+    # Standard: Control Directives (TurnOn, SetPercentage, etc.)
+    response = handle_control(device, request)
+    if response["event"]["header"]["name"] == "ErrorResponse":
+        # Hardware hat den Befehl nicht bekommen -> Record neu aus der DB lesen
+        if response["event"]["payload"]["type"] == "ENDPOINT_UNREACHABLE":
+            device_cache.invalidate(endpoint_id)
+        # Der Retry von Alexa soll es erneut versuchen dürfen
+        if dedup_key:
+            deduplicator.release(dedup_key)
+    else:
+        if dedup_key:
+            deduplicator.complete(dedup_key, response, response_json(response))
+        # Write-through: der Cache kennt sofort den neuen State
+        record['state'] = device.raw_state
+        record['reported_properties'] = device.reported_properties
+        device_cache.put(endpoint_id, record)
+    return response
+
 def lambda_handler(request, context):
     logger.info(f"--- LAMBDA START: {DEPLOY_DATE} ---")
 
+    if is_warmup_event(request):
+        return handle_warmup()
+
+    # Asynchroner Aufruf aus build_discovery_response
+    if "discovery_overflow" in request:
+        return handle_discovery_overflow(request["discovery_overflow"])
+
     # Logge den kompletten Request, damit wir sehen, was Alexa genau will
     logger.info("FULL REQUEST: %s", json.dumps(request))
     
@@ -168,38 +485,34 @@ def lambda_handler(request, context):
 
     # 2. DISCOVERY
     if namespace == "Alexa.Discovery" and name == "Discover":
-        # Alle aktiven Geräte aus der DynamoDB laden
-        response = table.scan() # Oder ein Filter auf 'active'
-        records = response.get('Items', [])
-        
-        response = handle_discovery(records)
-        logger.info("DISCOVERY RESPONSE: %s", json.dumps(response))
-        
+        # Die Response wird nicht komplett geloggt, handle_discovery loggt die Kennzahlen
+        response = handle_discovery()
+
         return response
 
     # 3. STATUS & CONTROL
     # Hier laden wir das Device und entscheiden zwischen ReportState und Control
     endpoint_id = request["directive"]["endpoint"]["endpointId"]
 
-    # Device-Daten aus DynamoDB holen
-    res = table.get_item(Key={'device_id': endpoint_id})
-    record = res.get('Item')
-    if not record:
-        logger.error(f"Device {endpoint_id} nicht in Datenbank gefunden!")
-        # Hier könnte man eine Error-Response schicken, 
-        # aber wir definieren jetzt das device-Objekt:
-        return {} 
-
-    # Jetzt erstellen wir das device-Objekt
-    device = AlexaDevice(record)
-    
-    if name == "ReportState":
-        response = handle_report_state(device, request)
-        logger.info("CONTROL RESPONSE: %s", json.dumps(response))
-        return response
-
-    # Standard: Control Directives (TurnOn, SetPercentage, etc.)
-
-    response = handle_control(device, request)
-    logger.info("CONTROL RESPONSE: %s", json.dumps(response))
+    # Von Alexa wiederholte Control-Direktiven nicht erneut ausführen
+    dedup_key = directive_key(request["directive"]) if name != "ReportState" else None
+    if dedup_key:
+        is_new, cached_response = deduplicator.claim(dedup_key)
+        if cached_response is not None:
+            logger.info(f"Direktive {dedup_key} bereits beantwortet, sende gespeicherte Antwort.")
+            return cached_response
+        if not is_new:
+            # Der erste Aufruf läuft noch -> nicht erneut publishen und keine
+            # erfundene Erfolgsmeldung, Alexa darf es später erneut versuchen
+            logger.info(f"Direktive {dedup_key} wird bereits ausgeführt, kein erneuter Publish.")
+            return build_error_response(request, "ENDPOINT_BUSY", "Die Direktive wird bereits ausgeführt.")
+
+    try:
+        response = handle_directive(request, endpoint_id, name, dedup_key)
+    except Exception:
+        # Ohne Freigabe bliebe die Reservierung ohne Antwort stehen
+        if dedup_key:
+            deduplicator.release(dedup_key)
+        raise
+    logger.info("CONTROL RESPONSE: %s", response_json(response))
     return response
@@ -1,5 +1,9 @@
+import copy
+import importlib.util
 import sys
 import os
+import threading
+
 import pytest
 
 # Pfade sofort setzen, nicht erst in einer Fixture!
@@ -14,4 +18,172 @@ for p in paths:
         sys.path.insert(0, p)
 
 # Die URL setzen [cite: 2026-01-03]
-os.environ["ALEXA_EVENTS_URL"] = "https://api.eu.amazonalexa.com/v3/events"
\ No newline at end of file
+os.environ["ALEXA_EVENTS_URL"] = "https://api.eu.amazonalexa.com/v3/events"
+# Region für boto3-Clients, die beim Import angelegt werden
+os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-1")
+# Tabellenname der CRUD-Lambda (alexa-devices), wird beim Import gelesen
+os.environ.setdefault("DEVICE_TABLE", "smarthome_devices")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Laufzeitmessungen hängen von der Maschine ab und laufen nur auf Wunsch
+    if os.environ.get("RUN_BENCHMARKS"):
+        return
+    skip = pytest.mark.skip(reason="Benchmark, mit RUN_BENCHMARKS=1 ausführen")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+MQTT_LAMBDA = os.path.join(BASE_DIR, "alexa-device-update-state-mqtt", "src", "lambda_function.py")
+
+
+class DeviceTable:
+    """Geräte-Tabelle der MQTT-Lambda: GSI-Query auf item_name und GetItem."""
+
+    def __init__(self, records=()):
+        self.records = {r["device_id"]: r for r in records}
+        self.queries = []
+        self.gets = 0
+        self.lock = threading.Lock()
+
+    def query(self, **kwargs):
+        name = kwargs["ExpressionAttributeValues"][":n"]
+        assert kwargs["ProjectionExpression"] == "device_id"
+        with self.lock:
+            self.queries.append(name)
+        return {"Items": [{"device_id": r["device_id"]} for r in self.records.values() if r["item_name"] == name]}
+
+    def get_item(self, **kwargs):
+        assert kwargs["ConsistentRead"]
+        with self.lock:
+            self.gets += 1
+        record = self.records.get(kwargs["Key"]["device_id"])
+        return {"Item": copy.deepcopy(record)} if record else {}
+
+
+class MemoryStateStore:
+    """DeviceStateStore im Speicher, schreibt in die Records der DeviceTable."""
+
+    def __init__(self, table, failing=()):
+        self.table = table
+        self.failing = set(failing)
+        self.saved = []
+        self.lock = threading.Lock()
+
+    def save_if_changed(self, device_id, changes, state=None, reported_properties=None):
+        if device_id in self.failing:
+            raise RuntimeError("ProvisionedThroughputExceeded")
+        with self.lock:
+            self.saved.append((device_id, dict(changes)))
+            record = self.table.records[device_id]
+            record.setdefault("state", {}).update(changes)
+            if reported_properties is not None:
+                record["reported_properties"] = reported_properties
+        return dict(changes)
+
+    def save(self, device_id, changes, state=None, reported_properties=None, pending_response=None):
+        record = self.table.records[device_id]
+        record.setdefault("state", {}).update(changes)
+        if reported_properties is not None:
+            record["reported_properties"] = reported_properties
+        if pending_response is not None:
+            record["pending_response"] = pending_response
+
+    def mark_reported(self, device_id, reported_state):
+        self.table.records[device_id]["reported_state"] = dict(reported_state)
+
+    def take_pending_response(self, device_id):
+        return self.table.records[device_id].pop("pending_response", None)
+
+
+class EventGateway:
+    """Alexa Event Gateway: sammelt die Events, failing=True simuliert einen Fehler."""
+
+    def __init__(self):
+        self.sent = []
+        self.failing = False
+
+    def __call__(self, build_payload):
+        if self.failing:
+            raise RuntimeError("HTTP Error 503: Service Unavailable")
+        self.sent.append(build_payload("lwa-token"))
+        return 202
+
+
+class RecordingIot:
+    """
+    IoT-Data Client der Skill-Lambda: sammelt die Publishes,
+    failing=True simuliert einen Fehler, on_publish(kwargs) prüft vor dem Publish.
+    """
+
+    def __init__(self):
+        self.published = []
+        self.failing = False
+        self.on_publish = None
+
+    def publish(self, **kwargs):
+        if self.failing:
+            raise RuntimeError("MQTT down")
+        if self.on_publish:
+            self.on_publish(kwargs)
+        self.published.append(kwargs)
+
+    def list_retained_messages(self, **kwargs):
+        return {"retainedTopics": []}
+
+
+class FakeClock:
+    """Uhr für clock=/sleep=-Parameter, sleep() lässt nur die Zeit weiterlaufen."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def iot(monkeypatch):
+    """Ersetzt den IoT-Client der Skill-Lambda."""
+    import lambda_function
+
+    client = RecordingIot()
+    monkeypatch.setattr(lambda_function, "iot_client", client)
+    return client
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def new_mqtt_container():
+    """
+    Lädt die MQTT-Lambda bei jedem Aufruf frisch (wie ein neuer Container).
+    Alle Container teilen sich Tabelle, State-Store und Event Gateway im Speicher.
+    """
+    table = DeviceTable()
+    store = MemoryStateStore(table)
+    gateway = EventGateway()
+
+    def load():
+        spec = importlib.util.spec_from_file_location("mqtt_lambda_function", MQTT_LAMBDA)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.current_catalog_version = lambda: 1
+        module.table = table
+        module.state_store = store
+        module.send_event = gateway
+        return module
+
+    return load
+
+
+@pytest.fixture
+def mqtt_lambda(new_mqtt_container):
+    return new_mqtt_container()
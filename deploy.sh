@@ -4,7 +4,8 @@
 SKILL_DIR="alexa-skill-smarthome/src"
 MQTT_DIR="alexa-device-update-state-mqtt/src"
 DEVICES_DIR="alexa-devices/src"
-COMMON_FILES=("alexa_device.py" "alexa_utils.py" "alexa_auth.py" "alexa_response.py" "alexa_discovery.py")
+COMMON_FILES=("alexa_device.py" "alexa_utils.py" "alexa_auth.py" "alexa_response.py" "alexa_discovery.py" "alexa_events.py" "alexa_cache.py" "alexa_state_store.py" "alexa_dynamodb.py" "alexa_warmup.py" "alexa_catalog.py" "alexa_throttle.py")
+DEVICES_COMMON_FILES=("${COMMON_FILES[@]}")
 CONTROLLERS_DIR="controllers"
 
 # AWS Lambda Funktionsnamen
@@ -20,8 +21,15 @@ for file in "${COMMON_FILES[@]}"; do
     fi
 done
 
+for file in "${DEVICES_COMMON_FILES[@]}"; do
+    if [ -f "$SKILL_DIR/$file" ]; then
+        cp "$SKILL_DIR/$file" "$DEVICES_DIR/"
+    fi
+done
+
 # Controller-Ordner synchronisieren OHNE Pycache
 rsync -av --delete --exclude "__pycache__" "$SKILL_DIR/$CONTROLLERS_DIR/" "$MQTT_DIR/$CONTROLLERS_DIR/"
+rsync -av --delete --exclude "__pycache__" "$SKILL_DIR/$CONTROLLERS_DIR/" "$DEVICES_DIR/$CONTROLLERS_DIR/"
 
 # 2. Deployment Funktion
 deploy_lambda() {
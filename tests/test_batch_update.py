@@ -0,0 +1,114 @@
+# test_batch_update.py
+
+import json
+
+import pytest
+
+
+def add_lights(table):
+    table.records.update({
+        "a1": {"device_id": "a1", "item_name": "Licht_Flur",
+               "capabilities": ["PowerController", "BrightnessController"], "state": {}},
+        "b2": {"device_id": "b2", "item_name": "Licht_Bad", "capabilities": ["PowerController"], "state": {}},
+    })
+
+
+def sqs_event(*bodies):
+    return {"Records": [{"messageId": f"m{n}", "body": json.dumps(body)} for n, body in enumerate(bodies)]}
+
+
+def test_batch_merges_updates_per_device(mqtt_lambda):
+    add_lights(mqtt_lambda.table)
+
+    result = mqtt_lambda.lambda_handler(sqs_event(
+        {"item_name": "Licht_Flur", "state": "OFF"},
+        [{"item_name": "Licht_Flur", "state": "ON"}, {"item_name": "Licht_Flur", "state": "40"}],
+        {"item_name": "Licht_Bad", "state": "ON"},
+        {"item_name": "Unbekannt", "state": "ON"},
+        {"item_name": "Licht_Bad"},
+    ), None)
+
+    assert result == {"batchItemFailures": []}
+    # Jedes Item nur einmal abgefragt, ein UpdateItem und ein Event pro Gerät
+    assert sorted(mqtt_lambda.table.queries) == ["Licht_Bad", "Licht_Flur", "Unbekannt"]
+    assert sorted(mqtt_lambda.state_store.saved) == [("a1", {"powerState": "ON", "brightness": 40}),
+                                                     ("b2", {"powerState": "ON"})]
+    assert len(mqtt_lambda.send_event.sent) == 2
+
+
+def test_batch_reports_only_failed_messages(mqtt_lambda):
+    add_lights(mqtt_lambda.table)
+    mqtt_lambda.state_store.failing.add("b2")
+
+    result = mqtt_lambda.lambda_handler(sqs_event(
+        {"item_name": "Licht_Bad", "state": "ON"},
+        {"item_name": "Licht_Flur", "state": "ON"},
+        [{"item_name": "Licht_Bad", "state": "OFF"}, {"item_name": "Licht_Bad", "state": "ON"}],
+    ), None)
+
+    assert result == {"batchItemFailures": [{"itemIdentifier": "m0"}, {"itemIdentifier": "m2"}]}
+    assert mqtt_lambda.state_store.saved == [("a1", {"powerState": "ON"})]
+
+
+def test_iot_rule_list_is_a_batch(mqtt_lambda):
+    add_lights(mqtt_lambda.table)
+
+    result = mqtt_lambda.lambda_handler([{"item_name": "Licht_Bad", "state": "OFF"}], None)
+
+    assert result == {"batchItemFailures": []}
+    assert mqtt_lambda.state_store.saved == [("b2", {"powerState": "OFF"})]
+
+
+def test_unchanged_state_skips_write_and_change_report(mqtt_lambda):
+    add_lights(mqtt_lambda.table)
+    mqtt_lambda.table.records["b2"].update(state={"powerState": "ON"}, reported_state={"powerState": "ON"},
+                                           reported_properties="[]")
+
+    mqtt_lambda.lambda_handler({"item_name": "Licht_Bad", "state": "ON"}, None)
+
+    assert mqtt_lambda.state_store.saved == []
+    assert mqtt_lambda.send_event.sent == []
+
+
+def test_failed_change_report_is_sent_on_redelivery(new_mqtt_container):
+    first = new_mqtt_container()
+    add_lights(first.table)
+    first.send_event.failing = True
+
+    event = sqs_event({"item_name": "Licht_Bad", "state": "ON"})
+    assert first.lambda_handler(event, None) == {"batchItemFailures": [{"itemIdentifier": "m0"}]}
+    # Der State ist schon gespeichert, gemeldet wurde nichts
+    assert first.table.records["b2"]["state"] == {"powerState": "ON"}
+    assert "reported_state" not in first.table.records["b2"]
+
+    # SQS stellt die Nachricht erneut zu (anderer Container)
+    first.send_event.failing = False
+    retry = new_mqtt_container()
+    assert retry.lambda_handler(event, None) == {"batchItemFailures": []}
+    assert len(retry.send_event.sent) == 1
+    assert retry.table.records["b2"]["reported_state"] == {"powerState": "ON"}
+
+    # Danach ist das Update wirklich erledigt
+    retry.lambda_handler(event, None)
+    assert len(retry.send_event.sent) == 1
+
+
+def test_bridge_echo_after_directive_restores_report_snapshot(mqtt_lambda, monkeypatch):
+    from alexa_device import AlexaDevice
+
+    add_lights(mqtt_lambda.table)
+    # Sprach-Direktive: die Skill-Lambda hat den State gesetzt und den Snapshot entfernt
+    mqtt_lambda.table.records["b2"].update(state={"powerState": "ON"}, reported_state={"powerState": "ON"})
+
+    # Die Bridge quittiert mit demselben Wert
+    mqtt_lambda.lambda_handler({"item_name": "Licht_Bad", "state": "ON"}, None)
+
+    record = mqtt_lambda.table.records["b2"]
+    assert mqtt_lambda.state_store.saved == []
+    assert mqtt_lambda.send_event.sent == []
+    assert record["reported_properties"]
+
+    # ReportState kommt aus dem Snapshot, ohne die Controller zu fragen
+    monkeypatch.setattr(AlexaDevice, "get_all_properties", lambda self: pytest.fail("Snapshot nicht genutzt"))
+    properties = AlexaDevice(record).get_report_properties()
+    assert [(p["name"], p["value"]) for p in properties] == [("powerState", "ON")]
@@ -0,0 +1,41 @@
+# test_cache.py
+
+from alexa_cache import LRUCache
+
+
+def test_lru_eviction_and_stats():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" ist jetzt der jüngste Eintrag
+    cache.put("c", 3)           # verdrängt "b"
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_ttl_expiry(clock):
+    cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+    start = clock.now
+    cache.put("device", {"state": {}})
+
+    clock.now = start + 4.9
+    assert cache.get("device") is not None
+    clock.now = start + 5.0
+    assert cache.get("device") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_version_stamp_invalidates():
+    cache = LRUCache()
+    assert cache.validate(7) is False  # erste Version wird nur gemerkt
+    cache.put("device", "record")
+
+    assert cache.validate(7) is False
+    assert cache.get("device") == "record"
+    assert cache.validate(8) is True
+    assert cache.get("device") is None
@@ -0,0 +1,36 @@
+# test_capability_cache.py
+
+import json
+
+from alexa_device import AlexaDevice
+
+
+def make_record(device_id, capabilities):
+    return {
+        "device_id": device_id,
+        "item_name": f"Item_{device_id}",
+        "friendly_name": f"Rollo {device_id}",
+        "capabilities": capabilities,
+        "proactivelyReported": True,
+        "retrievable": True
+    }
+
+
+def test_capability_fragments_are_shared():
+    first = AlexaDevice(make_record("aaaa-0001", ["RollershutterController", "PowerController"]))
+    second = AlexaDevice(make_record("bbbb-0002", ["RollershutterController", "PowerController"]))
+
+    caps_first = first.get_discovery_capabilities()
+    caps_second = second.get_discovery_capabilities()
+
+    # Gleiche Controller + Flags -> dasselbe Dict-Objekt, kein Neubau pro Gerät
+    assert len(caps_first) == 4
+    assert all(a is b for a, b in zip(caps_first, caps_second))
+    assert caps_first[-2]["interface"] == "Alexa.EndpointHealth"
+    assert caps_first[-1]["interface"] == "Alexa"
+
+
+def test_discovery_payload_json_matches_dict():
+    device = AlexaDevice(make_record("cccc-0003", ["BrightnessController", "ToggleController"]))
+
+    assert json.loads(device.get_discovery_payload_json()) == device.get_discovery_payload()
@@ -0,0 +1,141 @@
+# test_catalog.py
+
+import copy
+import json
+
+import pytest
+
+import alexa_catalog
+import lambda_function
+from alexa_catalog import (
+    CATALOG_TABLE_NAME, DiscoveryDocumentWriter, StaleDiscoveryDocument, bump_catalog_version,
+    load_discovery_document
+)
+
+
+class CatalogTable:
+    """Katalog-Tabelle im Speicher (GetItem, PutItem, die beiden UpdateItems, BatchGetItem)."""
+
+    def __init__(self, items=()):
+        self.items = {i["catalog_id"]: dict(i) for i in items}
+
+    def get_item(self, **kwargs):
+        item = self.items.get(kwargs["Key"]["catalog_id"])
+        return {"Item": copy.deepcopy(item)} if item else {}
+
+    def put_item(self, **kwargs):
+        self.items[kwargs["Item"]["catalog_id"]] = copy.deepcopy(kwargs["Item"])
+
+    def update_item(self, **kwargs):
+        key = kwargs["Key"]["catalog_id"]
+        item = self.items.setdefault(key, {"catalog_id": key})
+        values = kwargs["ExpressionAttributeValues"]
+        if kwargs["UpdateExpression"].startswith("ADD catalog_version"):
+            item["catalog_version"] = item.get("catalog_version", 0) + values[":one"]
+            return {"Attributes": {"catalog_version": item["catalog_version"]}}
+        item.update(built_version=values[":v"], chunk_count=values[":c"], endpoints=copy.deepcopy(values[":e"]))
+        return {}
+
+    def batch_get_item(self, **kwargs):
+        keys = kwargs["RequestItems"][CATALOG_TABLE_NAME]["Keys"]
+        found = [copy.deepcopy(self.items[k["catalog_id"]]) for k in keys if k["catalog_id"] in self.items]
+        return {"Responses": {CATALOG_TABLE_NAME: found}}
+
+
+class DeviceScanTable:
+    """Geräte-Tabelle für den Discovery-Scan (alle Items in Segment 0)."""
+
+    def __init__(self, records):
+        self.records = records
+        self.scans = 0
+
+    def scan(self, **kwargs):
+        self.scans += 1
+        return {"Items": self.records if kwargs.get("Segment", 0) == 0 else []}
+
+
+def encoded_endpoints(count):
+    return [json.dumps({"endpointId": f"{n:04d}", "padding": "x" * 40}) for n in range(count)]
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    table = CatalogTable()
+    monkeypatch.setattr(alexa_catalog, "catalog_table", table)
+    monkeypatch.setattr(alexa_catalog, "batch_get_item", table.batch_get_item)
+    # Kleine Chunks, damit das Dokument aus mehreren Items besteht
+    monkeypatch.setattr(alexa_catalog, "CATALOG_CHUNK_BYTES", 200)
+    monkeypatch.setattr(alexa_catalog, "CATALOG_READ_AHEAD", 2)
+    return table
+
+
+def write_document(endpoints, version):
+    writer = DiscoveryDocumentWriter(version)
+    for encoded in endpoints:
+        writer.add(encoded)
+    writer.close()
+    return writer
+
+
+def test_document_is_written_in_chunks_and_read_back(catalog):
+    endpoints = encoded_endpoints(20)
+    bump_catalog_version()
+
+    writer = write_document(endpoints, 1)
+
+    # Mehr Chunks als ein BatchGetItem liest -> mehrere Nachlade-Runden
+    assert writer.chunk_count > alexa_catalog.CATALOG_READ_AHEAD + 1
+    assert all(sum(map(len, i["endpoints"])) <= 200 for i in catalog.items.values())
+    loaded, version = load_discovery_document()
+    assert version == 1
+    assert list(loaded) == endpoints
+
+
+def test_version_mismatch_rebuilds_the_document(catalog, monkeypatch):
+    write_document(encoded_endpoints(3), 1)
+    # Ein Gerät wurde angelegt -> Version 2, das Dokument ist veraltet
+    bump_catalog_version()
+    bump_catalog_version()
+    assert load_discovery_document() == (None, 2)
+
+    devices = DeviceScanTable([{"device_id": f"{n:04d}-0000", "item_name": f"Licht_{n}",
+                                "capabilities": ["PowerController"]} for n in range(5)])
+    monkeypatch.setattr(lambda_function, "table", devices)
+
+    response = lambda_function.handle_discovery()
+
+    assert len(response["event"]["payload"]["endpoints"]) == 5
+    assert devices.scans > 0
+    # Das neu gebaute Dokument bedient die nächste Discovery ohne Scan
+    loaded, version = load_discovery_document()
+    assert version == 2
+    assert [json.loads(e)["endpointId"] for e in loaded] == [f"{n:04d}-0000" for n in range(5)]
+    scans = devices.scans
+    lambda_function.handle_discovery()
+    assert devices.scans == scans
+
+
+def test_half_written_document_is_detected(catalog):
+    bump_catalog_version()
+    write_document(encoded_endpoints(20), 1)
+    loaded, _ = load_discovery_document()
+    assert next(loaded)
+
+    # Ein paralleler Neubau überschreibt die Folge-Chunks, der Kopf ist noch alt
+    writer = DiscoveryDocumentWriter(2)
+    for encoded in encoded_endpoints(20):
+        writer.add(encoded)
+
+    with pytest.raises(StaleDiscoveryDocument):
+        list(loaded)
+
+
+def test_missing_chunk_is_detected(catalog):
+    bump_catalog_version()
+    write_document(encoded_endpoints(20), 1)
+    del catalog.items["discovery#2"]
+
+    loaded, _ = load_discovery_document()
+
+    with pytest.raises(StaleDiscoveryDocument):
+        list(loaded)
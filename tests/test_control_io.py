@@ -0,0 +1,116 @@
+# test_control_io.py
+
+import lambda_function
+from alexa_device import AlexaDevice
+
+
+def make_request():
+    return {
+        "directive": {
+            "header": {"namespace": "Alexa.PowerController", "name": "TurnOn",
+                       "messageId": "m-1", "correlationToken": "c-1", "payloadVersion": "3"},
+            "endpoint": {"endpointId": "d78a4851-8615-44f2-a944-21977d272952",
+                         "scope": {"type": "BearerToken", "token": "t"}},
+            "payload": {}
+        }
+    }
+
+
+def make_device(saved):
+    device = AlexaDevice({"device_id": "d78a4851-8615-44f2-a944-21977d272952", "item_name": "Schalter_Labor",
+                          "capabilities": ["PowerController"], "state": {"powerState": "OFF"}})
+    device.update_db = lambda store=None: saved.append(dict(device.pending_state)) or True
+    return device
+
+
+def test_control_publishes_and_saves(iot):
+    saved = []
+
+    response = lambda_function.handle_control(make_device(saved), make_request())
+
+    assert response["event"]["header"]["name"] == "Response"
+    assert len(iot.published) == 1
+    assert saved == [{"powerState": "ON"}]
+
+
+def test_control_publish_failure_returns_unreachable(iot):
+    iot.failing = True
+
+    response = lambda_function.handle_control(make_device([]), make_request())
+
+    assert response["event"]["header"]["name"] == "ErrorResponse"
+    assert response["event"]["payload"]["type"] == "ENDPOINT_UNREACHABLE"
+
+
+def test_unsupported_directive_returns_invalid_directive(iot):
+    request = make_request()
+    request["directive"]["header"].update({"namespace": "Alexa.BrightnessController", "name": "SetBrightness"})
+
+    response = lambda_function.handle_control(make_device([]), request)
+
+    assert response["event"]["header"]["name"] == "ErrorResponse"
+    assert response["event"]["payload"]["type"] == "INVALID_DIRECTIVE"
+    assert response["event"]["header"]["correlationToken"] == "c-1"
+    assert iot.published == []
+
+
+def test_malformed_value_returns_invalid_value(iot):
+    device = AlexaDevice({"device_id": "d78a4851-8615-44f2-a944-21977d272952", "item_name": "Heizung_Labor",
+                          "capabilities": ["BrightnessController", "ThermostatController"], "state": {}})
+
+    for namespace, name, payload in [
+        ("Alexa.BrightnessController", "SetBrightness", {"brightness": "abc"}),
+        ("Alexa.ThermostatController", "SetTargetSetpoint", {"targetSetpoint": {"value": "x", "scale": "CELSIUS"}}),
+    ]:
+        request = make_request()
+        request["directive"]["header"].update(namespace=namespace, name=name)
+        request["directive"]["payload"] = payload
+
+        response = lambda_function.handle_control(device, request)
+
+        assert response["event"]["header"]["name"] == "ErrorResponse"
+        assert response["event"]["payload"]["type"] == "INVALID_VALUE"
+        assert response["event"]["header"]["correlationToken"] == "c-1"
+    assert iot.published == []
+    assert device.pending_state == {}
+
+
+class EmptyTable:
+    def __init__(self):
+        self.reads = 0
+
+    def get_item(self, **kwargs):
+        self.reads += 1
+        return {}
+
+
+def test_unknown_endpoint_is_answered_from_negative_cache(monkeypatch):
+    table = EmptyTable()
+    monkeypatch.setattr(lambda_function, "table", table)
+    monkeypatch.setattr(lambda_function, "current_catalog_version", lambda: 7)
+    request = make_request()
+    request["directive"]["header"]["name"] = "ReportState"
+    request["directive"]["header"]["namespace"] = "Alexa"
+
+    first = lambda_function.lambda_handler(request, None)
+    second = lambda_function.lambda_handler(request, None)
+
+    assert first["event"]["payload"]["type"] == "NO_SUCH_ENDPOINT"
+    assert second["event"]["payload"]["type"] == "NO_SUCH_ENDPOINT"
+    assert table.reads == 1
+
+    # Neue Katalog-Version (Gerät angelegt) -> wieder aus der DB lesen
+    monkeypatch.setattr(lambda_function, "current_catalog_version", lambda: 8)
+    lambda_function.lambda_handler(request, None)
+    assert table.reads == 2
+
+
+def test_warmup_event_runs_all_steps(monkeypatch, iot):
+    monkeypatch.setattr(lambda_function, "current_catalog_version", lambda: 3)
+    monkeypatch.setattr(lambda_function, "get_valid_access_token", lambda: "token")
+
+    result = lambda_function.lambda_handler({"source": "aws.events", "detail-type": "Scheduled Event"}, None)
+
+    assert result["warmup"] is True
+    assert all(step["ok"] for step in result["steps"].values())
+    assert lambda_function.device_cache.version == 3
@@ -0,0 +1,174 @@
+# test_dedup.py
+
+import copy
+
+import pytest
+from botocore.exceptions import ClientError
+
+import lambda_function
+from alexa_cache import LRUCache
+from alexa_dedup import DirectiveDeduplicator, directive_key
+
+
+@pytest.fixture(autouse=True)
+def fresh_device_cache(monkeypatch):
+    # Der Write-through soll keine Records in andere Tests tragen
+    monkeypatch.setattr(lambda_function, "device_cache", LRUCache())
+
+
+class DedupTable:
+    """Conditional Put, Get, Update und Delete wie DynamoDB (ohne TTL-Löschung)."""
+
+    def __init__(self):
+        self.items = {}
+
+    def put_item(self, Item, ConditionExpression, ExpressionAttributeValues):
+        existing = self.items.get(Item["directive_key"])
+        if existing and existing["expires_at"] >= ExpressionAttributeValues[":now"]:
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}}, "PutItem")
+        self.items[Item["directive_key"]] = dict(Item)
+
+    def get_item(self, Key, ConsistentRead=False):
+        item = self.items.get(Key["directive_key"])
+        return {"Item": dict(item)} if item else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues):
+        self.items[Key["directive_key"]]["response"] = ExpressionAttributeValues[":r"]
+        self.items[Key["directive_key"]]["expires_at"] = ExpressionAttributeValues[":e"]
+
+    def delete_item(self, Key):
+        self.items.pop(Key["directive_key"], None)
+
+
+REQUEST = {
+    "directive": {
+        "header": {"namespace": "Alexa.PowerController", "name": "TurnOn",
+                   "messageId": "m-42", "correlationToken": "c-42", "payloadVersion": "3"},
+        "endpoint": {"endpointId": "d78a4851-8615-44f2-a944-21977d272952",
+                     "scope": {"type": "BearerToken", "token": "t"}},
+        "payload": {}
+    }
+}
+
+
+def test_retry_on_other_container_gets_stored_response():
+    table = DedupTable()
+    first, second = DirectiveDeduplicator(table), DirectiveDeduplicator(table, wait=0)
+    key = directive_key(REQUEST["directive"])
+
+    assert first.claim(key) == (True, None)
+    # Retry während der erste Aufruf noch läuft
+    assert second.claim(key) == (False, None)
+    # Nur eine kurze Reservierung, erst die Antwort gilt DEDUP_TTL_SECONDS
+    assert table.items[key]["expires_at"] - int(first.clock()) == first.claim_ttl
+
+    first.complete(key, {"event": {"header": {"name": "Response"}}})
+    assert second.claim(key) == (False, {"event": {"header": {"name": "Response"}}})
+
+
+def test_released_directive_can_run_again():
+    table = DedupTable()
+    dedup = DirectiveDeduplicator(table)
+
+    dedup.claim("k")
+    dedup.release("k")
+
+    assert dedup.claim("k") == (True, None)
+
+
+def test_duplicate_directive_is_not_published_again(monkeypatch, iot):
+    record = {"device_id": "d78a4851-8615-44f2-a944-21977d272952", "item_name": "Schalter_Labor",
+              "capabilities": ["PowerController"], "state": {"powerState": "OFF"}}
+    monkeypatch.setattr(lambda_function, "deduplicator", DirectiveDeduplicator(DedupTable()))
+    monkeypatch.setattr(lambda_function, "load_device_record", lambda endpoint_id: copy.deepcopy(record))
+    monkeypatch.setattr(lambda_function.AlexaDevice, "update_db", lambda self, store=None: True)
+
+    first = lambda_function.lambda_handler(copy.deepcopy(REQUEST), None)
+    retry = lambda_function.lambda_handler(copy.deepcopy(REQUEST), None)
+
+    assert len(iot.published) == 1
+    assert retry == first
+
+
+def test_duplicate_waits_for_the_stored_response(clock):
+    table = DedupTable()
+    first = DirectiveDeduplicator(table)
+    first.claim("k")
+    clock.now = first.clock()
+
+    def sleep(seconds):
+        clock.sleep(seconds)
+        first.complete("k", {"event": {"header": {"name": "Response"}}})
+
+    second = DirectiveDeduplicator(table, clock=clock, sleep=sleep)
+    assert second.claim("k") == (False, {"event": {"header": {"name": "Response"}}})
+
+
+def test_abandoned_claim_expires_quickly(clock):
+    table = DedupTable()
+    first = DirectiveDeduplicator(table, clock=clock, sleep=clock.sleep)
+    second = DirectiveDeduplicator(table, clock=clock, sleep=clock.sleep)
+
+    first.claim("k")
+    # Der erste Aufruf stirbt (Timeout) -> nach claim_ttl darf der Retry ran
+    clock.now += first.claim_ttl + 1
+    assert second.claim("k") == (True, None)
+
+
+def make_light_record():
+    return {"device_id": "d78a4851-8615-44f2-a944-21977d272952", "item_name": "Licht_Labor",
+            "capabilities": ["PowerController", "BrightnessController"], "state": {"powerState": "OFF"}}
+
+
+def test_failed_directive_is_released_and_retried(monkeypatch, iot):
+    table = DedupTable()
+    monkeypatch.setattr(lambda_function, "load_device_record", lambda endpoint_id: make_light_record())
+    monkeypatch.setattr(lambda_function.AlexaDevice, "update_db", lambda self, store=None: True)
+    request = copy.deepcopy(REQUEST)
+    request["directive"]["header"].update(namespace="Alexa.BrightnessController", name="SetBrightness")
+    request["directive"]["payload"] = {"brightness": "abc"}
+
+    monkeypatch.setattr(lambda_function, "deduplicator", DirectiveDeduplicator(table))
+    response = lambda_function.lambda_handler(copy.deepcopy(request), None)
+
+    assert response["event"]["header"]["name"] == "ErrorResponse"
+    assert response["event"]["payload"]["type"] == "INVALID_VALUE"
+    # Die Reservierung ist freigegeben, nichts wurde gepublished
+    assert table.items == {}
+    assert iot.published == []
+
+    # Retry auf einem frischen Container führt die Direktive wirklich aus
+    monkeypatch.setattr(lambda_function, "deduplicator", DirectiveDeduplicator(table))
+    request["directive"]["payload"] = {"brightness": 40}
+    retry = lambda_function.lambda_handler(copy.deepcopy(request), None)
+
+    assert retry["event"]["header"]["name"] == "Response"
+    assert len(iot.published) == 1
+
+
+def test_crashing_directive_releases_the_claim(monkeypatch):
+    table = DedupTable()
+    monkeypatch.setattr(lambda_function, "deduplicator", DirectiveDeduplicator(table))
+
+    def unreachable(endpoint_id):
+        raise RuntimeError("DynamoDB nicht erreichbar")
+
+    monkeypatch.setattr(lambda_function, "load_device_record", unreachable)
+
+    with pytest.raises(RuntimeError):
+        lambda_function.lambda_handler(copy.deepcopy(REQUEST), None)
+    assert table.items == {}
+
+
+def test_in_flight_duplicate_gets_no_made_up_response(monkeypatch, iot, clock):
+    table = DedupTable()
+    DirectiveDeduplicator(table).claim(directive_key(REQUEST["directive"]))
+    monkeypatch.setattr(lambda_function, "deduplicator", DirectiveDeduplicator(table, clock=clock, sleep=clock.sleep))
+    monkeypatch.setattr(lambda_function, "load_device_record", lambda endpoint_id: make_light_record())
+    clock.now = table.items[directive_key(REQUEST["directive"])]["expires_at"] - 5
+
+    response = lambda_function.lambda_handler(copy.deepcopy(REQUEST), None)
+
+    assert response["event"]["header"]["name"] == "ErrorResponse"
+    assert response["event"]["payload"]["type"] == "ENDPOINT_BUSY"
+    assert iot.published == []
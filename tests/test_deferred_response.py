@@ -0,0 +1,111 @@
+# test_deferred_response.py
+
+import time
+
+import lambda_function
+from alexa_device import AlexaDevice
+
+
+def make_record(**extra):
+    return {"device_id": "57f0e723-e6b0-460b-a087-997957d2aac7", "item_name": "Rollo_Labor",
+            "capabilities": ["RollershutterController"], "state": {"mode": "Position.Up"}, **extra}
+
+
+SET_MODE = {
+    "directive": {
+        "header": {"namespace": "Alexa.ModeController", "instance": "Blind.Position", "name": "SetMode",
+                   "messageId": "m-7", "correlationToken": "c-7", "payloadVersion": "3"},
+        "endpoint": {"endpointId": "57f0e723-e6b0-460b-a087-997957d2aac7",
+                     "scope": {"type": "BearerToken", "token": "t"}},
+        "payload": {"mode": "Position.Down"}
+    }
+}
+
+
+def test_slow_actuator_answers_with_deferred_response(iot):
+    saved = []
+    saved_before_publish = []
+    # Beim Publish muss die ausstehende Response schon gespeichert sein
+    iot.on_publish = lambda kwargs: saved_before_publish.append(bool(saved))
+    device = AlexaDevice(make_record())
+    device.update_db = lambda store=None: saved.append(device.pending_response) or True
+
+    response = lambda_function.handle_control(device, SET_MODE)
+
+    assert response["event"]["header"]["name"] == "DeferredResponse"
+    assert response["event"]["header"]["correlationToken"] == "c-7"
+    assert response["event"]["payload"] == {"estimatedDeferralInSeconds": 20}
+    assert "endpoint" not in response["event"]
+    assert saved[0]["correlation_token"] == "c-7"
+    assert len(iot.published) == 1
+    assert saved_before_publish == [True]
+
+
+def test_device_can_disable_deferred_response():
+    device = AlexaDevice(make_record(deferred_response=False))
+    assert device.get_deferral(SET_MODE["directive"]) is None
+
+    light = AlexaDevice({"device_id": "d78a4851-8615-44f2-a944-21977d272952", "item_name": "Licht",
+                         "capabilities": ["PowerController"], "deferred_response": True})
+    turn_on = {"header": {"namespace": "Alexa.PowerController", "name": "TurnOn"}}
+    assert light.get_deferral(turn_on) == 10
+
+
+def test_bridge_ack_sends_deferred_response(mqtt_lambda):
+    pending = {"correlation_token": "c-7", "expires_at": int(time.time()) + 60}
+    mqtt_lambda.table.records["57f0e723-e6b0-460b-a087-997957d2aac7"] = make_record(pending_response=pending)
+
+    mqtt_lambda.lambda_handler({"item_name": "Rollo_Labor", "state": "CLOSED"}, None)
+
+    sent = mqtt_lambda.send_event.sent
+    event = sent[0]["event"]
+    assert event["header"]["name"] == "Response"
+    assert event["header"]["correlationToken"] == "c-7"
+    assert event["endpoint"]["scope"]["token"] == "lwa-token"
+    assert sent[0]["context"]["properties"][0]["value"] == "Position.Down"
+
+
+def test_bridge_ack_without_new_value_still_answers(mqtt_lambda):
+    pending = {"correlation_token": "c-8", "expires_at": int(time.time()) + 60}
+    # Die Skill-Lambda hat den Zielwert schon gespeichert
+    mqtt_lambda.table.records["57f0e723-e6b0-460b-a087-997957d2aac7"] = make_record(
+        pending_response=pending, state={"mode": "Position.Down"})
+
+    mqtt_lambda.lambda_handler({"item_name": "Rollo_Labor", "state": "CLOSED"}, None)
+
+    assert mqtt_lambda.state_store.saved == []
+    assert mqtt_lambda.send_event.sent[0]["event"]["header"]["correlationToken"] == "c-8"
+
+
+def test_failed_deferred_response_keeps_it_pending(mqtt_lambda):
+    pending = {"correlation_token": "c-9", "expires_at": int(time.time()) + 60}
+    record = make_record(pending_response=pending)
+    mqtt_lambda.table.records[record["device_id"]] = record
+    mqtt_lambda.send_event.failing = True
+
+    mqtt_lambda.lambda_handler({"item_name": "Rollo_Labor", "state": "CLOSED"}, None)
+
+    # Der Retry soll die Response nachreichen statt eines ChangeReports
+    assert record["pending_response"] == pending
+    assert "reported_state" not in record
+
+
+def test_failed_publish_withdraws_pending_response(mqtt_lambda, monkeypatch, iot):
+    endpoint_id = "57f0e723-e6b0-460b-a087-997957d2aac7"
+    mqtt_lambda.table.records[endpoint_id] = make_record(reported_state={"mode": "Position.Up"})
+    store = mqtt_lambda.state_store
+    iot.failing = True
+    monkeypatch.setattr(lambda_function, "state_store", store)
+    device = AlexaDevice(make_record())
+    device.update_db = lambda store=None: store.save(endpoint_id, dict(device.pending_state),
+                                                     pending_response=device.pending_response) or True
+
+    response = lambda_function.handle_control(device, SET_MODE)
+
+    assert response["event"]["payload"]["type"] == "ENDPOINT_UNREACHABLE"
+    assert "pending_response" not in mqtt_lambda.table.records[endpoint_id]
+
+    # Das nächste Hardware-Update wird ein normaler ChangeReport, keine
+    # Response für den schon mit Fehler beantworteten correlationToken
+    mqtt_lambda.lambda_handler({"item_name": "Rollo_Labor", "state": "CLOSED"}, None)
+    assert [e["event"]["header"]["name"] for e in mqtt_lambda.send_event.sent] == ["ChangeReport"]
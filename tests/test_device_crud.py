@@ -0,0 +1,73 @@
+# test_device_crud.py
+
+import json
+
+import pytest
+
+import alexa_device_add
+import alexa_device_delete
+import alexa_device_report
+import alexa_device_update
+
+
+class CrudTable:
+    def __init__(self):
+        self.puts = []
+        self.updates = []
+
+    def put_item(self, **kwargs):
+        self.puts.append(kwargs["Item"])
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+        return {"Attributes": {"device_id": kwargs["Key"]["device_id"], "item_name": "Licht_Labor"}}
+
+    def delete_item(self, **kwargs):
+        return {"Attributes": {"device_id": kwargs["Key"]["device_id"], "enabled": False}}
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = CrudTable()
+    monkeypatch.setattr(alexa_device_report, "bump_catalog_version", lambda: 1)
+    for module in (alexa_device_add, alexa_device_update, alexa_device_delete):
+        monkeypatch.setattr(module, "table", table)
+    for module in (alexa_device_add, alexa_device_update):
+        monkeypatch.setattr(module, "sync_discovery", lambda table, record: None)
+    return table
+
+
+def update(device_id, body):
+    return alexa_device_update.update_device({"pathParameters": {"device_id": device_id}, "body": json.dumps(body)})
+
+
+def test_add_sets_discoverable_only_for_enabled_devices(table):
+    alexa_device_add.add_device({"body": json.dumps({"item_name": "Licht_Labor"})})
+    alexa_device_add.add_device({"body": json.dumps({"item_name": "Licht_Keller", "enabled": False})})
+
+    enabled, disabled = table.puts
+    assert enabled["discoverable"] == "1"
+    assert "discoverable" not in disabled
+
+
+def test_update_keeps_discoverable_in_sync_with_enabled(table):
+    assert update("d-1", {"enabled": True})["statusCode"] == 200
+    assert update("d-1", {"enabled": False})["statusCode"] == 200
+    assert update("d-1", {"friendly_name": "Labor"})["statusCode"] == 200
+
+    enable, disable, rename = table.updates
+    assert "discoverable = :disc" in enable["UpdateExpression"]
+    assert enable["ExpressionAttributeValues"][":disc"] == "1"
+    assert disable["UpdateExpression"].endswith("REMOVE discoverable")
+    assert "discoverable" not in rename["UpdateExpression"]
+
+
+def test_failing_catalog_bump_does_not_fail_the_request(table, monkeypatch):
+    def bump():
+        raise RuntimeError("Katalog-Tabelle nicht erreichbar")
+
+    monkeypatch.setattr(alexa_device_report, "bump_catalog_version", bump)
+
+    assert alexa_device_add.add_device({"body": json.dumps({"item_name": "Licht_Labor"})})["statusCode"] == 201
+    assert update("d-1", {"friendly_name": "Labor"})["statusCode"] == 200
+    assert alexa_device_delete.delete_device({"pathParameters": {"device_id": "d-1"}})["statusCode"] == 200
@@ -0,0 +1,99 @@
+# test_device_report.py
+
+import pytest
+
+import alexa_device_report
+from alexa_discovery import discovery_hash
+from alexa_device import AlexaDevice
+
+
+class HashTable:
+    def __init__(self):
+        self.updates = []
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+
+
+@pytest.fixture
+def events(monkeypatch):
+    """Fängt die Events ans Alexa Gateway ab (alexa_discovery.send_event)."""
+    sent = []
+    monkeypatch.setattr("alexa_discovery.send_event", lambda build: sent.append(build("token")) or 202)
+    return sent
+
+
+def make_record(**extra):
+    return {"device_id": "d78a4851-8615-44f2-a944-21977d272952", "item_name": "Licht_Labor",
+            "capabilities": ["PowerController"], **extra}
+
+
+def event_name(event):
+    return event["event"]["header"]["name"]
+
+
+def test_new_device_is_reported_and_hash_stored(events):
+    table = HashTable()
+    record = make_record()
+
+    alexa_device_report.sync_discovery(table, record)
+
+    assert [event_name(e) for e in events] == ["AddOrUpdateReport"]
+    assert table.updates[0]["ExpressionAttributeValues"][":h"] == discovery_hash(AlexaDevice(record))
+
+
+def test_unchanged_discovery_hash_skips_the_report(events):
+    table = HashTable()
+    record = make_record()
+    record["discovery_hash"] = discovery_hash(AlexaDevice(record))
+
+    alexa_device_report.sync_discovery(table, record)
+
+    assert events == []
+    assert table.updates == []
+
+
+def test_disabling_sends_delete_report_and_removes_hash(events):
+    table = HashTable()
+
+    alexa_device_report.sync_discovery(table, make_record(enabled=False, discovery_hash="abc"))
+
+    assert [event_name(e) for e in events] == ["DeleteReport"]
+    assert events[0]["event"]["payload"]["endpoints"] == [{"endpointId": "d78a4851-8615-44f2-a944-21977d272952"}]
+    assert table.updates[0]["UpdateExpression"] == "REMOVE discovery_hash"
+
+
+def test_disabled_device_never_reported_sends_nothing(events):
+    table = HashTable()
+
+    alexa_device_report.sync_discovery(table, make_record(enabled=False))
+
+    assert events == []
+    assert table.updates == []
+
+
+def test_deleting_a_never_reported_device_sends_nothing(events):
+    alexa_device_report.sync_discovery_delete(make_record(enabled=False))
+    alexa_device_report.sync_discovery_delete(None)
+
+    assert events == []
+
+
+def test_deleting_a_reported_device_sends_delete_report(events):
+    alexa_device_report.sync_discovery_delete(make_record(enabled=False, discovery_hash="abc"))
+
+    assert [event_name(e) for e in events] == ["DeleteReport"]
+
+
+def test_gateway_errors_are_only_logged(monkeypatch):
+    def fail(build):
+        raise RuntimeError("Gateway down")
+
+    monkeypatch.setattr("alexa_discovery.send_event", fail)
+    table = HashTable()
+
+    alexa_device_report.sync_discovery(table, make_record())
+    alexa_device_report.sync_discovery_delete(make_record(discovery_hash="abc"))
+
+    # Ohne erfolgreichen Report kein Hash, der nächste Update versucht es erneut
+    assert table.updates == []
@@ -0,0 +1,77 @@
+# test_discovery_memory.py
+
+import json
+import tracemalloc
+
+from alexa_device import AlexaDevice
+from alexa_discovery import iter_discovery_records, iter_discovery_endpoints, split_discovery_batches
+
+FLEET_SIZE = 10_000
+
+
+class SyntheticTable:
+    """Erzeugt die Scan-Seiten erst beim Abruf, wie eine echte Tabelle."""
+
+    def __init__(self, size, page_size):
+        self.size = size
+        self.page_size = page_size
+
+    def scan(self, **kwargs):
+        segment = kwargs.get("Segment", 0)
+        total = kwargs.get("TotalSegments", 1)
+        start = kwargs.get("ExclusiveStartKey", {}).get("n", segment)
+
+        numbers = range(start, self.size, total)[:self.page_size]
+        response = {"Items": [self.make_record(n) for n in numbers]}
+        next_start = start + self.page_size * total
+        if next_start < self.size:
+            response["LastEvaluatedKey"] = {"n": next_start}
+        return response
+
+    @staticmethod
+    def make_record(n):
+        return {
+            "device_id": f"{n:08d}-0000-0000-0000-000000000000",
+            "item_name": f"Licht_{n}",
+            "friendly_name": f"Licht {n}",
+            "device_category": "LIGHT",
+            "capabilities": ["PowerController", "BrightnessController", "ColorController"],
+            "proactivelyReported": True,
+            "retrievable": True,
+            "state": {"powerState": "ON", "brightness": n % 100, "color": {"hue": 0, "saturation": 1, "brightness": 1}}
+        }
+
+
+def test_discovery_pipeline_memory_is_bounded():
+    table = SyntheticTable(FLEET_SIZE, page_size=100)
+
+    # Streaming: Seiten -> Records -> Endpunkt-JSON -> Batches
+    tracemalloc.start()
+    endpoints = 0
+    for batch in split_discovery_batches(iter_discovery_endpoints(iter_discovery_records(table, total_segments=4))):
+        endpoints += len(batch)
+    _, streaming_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Zum Vergleich der alte Weg: alles einlesen, alles bauen, alles serialisieren
+    tracemalloc.start()
+    records = []
+    for segment in range(4):
+        kwargs = {"Segment": segment, "TotalSegments": 4}
+        while True:
+            response = table.scan(**kwargs)
+            records.extend(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    payload = [AlexaDevice(r).get_discovery_payload() for r in records]
+    encoded = json.dumps(payload)
+    _, materialized_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"\n[Discovery Memory] {FLEET_SIZE} Geräte: streaming {streaming_peak / 1024:.0f} KB, "
+          f"materialisiert {materialized_peak / 1024:.0f} KB")
+
+    assert endpoints == FLEET_SIZE
+    assert len(encoded) > 0
+    assert streaming_peak < materialized_peak / 10
@@ -0,0 +1,110 @@
+# test_discovery_overflow.py
+
+import json
+
+import pytest
+
+import alexa_discovery
+import lambda_function
+
+
+class RecordingLambda:
+    def __init__(self):
+        self.invocations = []
+
+    def invoke(self, **kwargs):
+        self.invocations.append(kwargs)
+        return {"StatusCode": 202}
+
+
+def encoded_endpoints(count):
+    return (json.dumps({"endpointId": str(n)}) for n in range(count))
+
+
+@pytest.fixture
+def lambda_client(monkeypatch):
+    client = RecordingLambda()
+    monkeypatch.setattr(lambda_function, "lambda_client", client)
+    # Der synchrone Pfad darf nie selbst AddOrUpdateReports senden
+    monkeypatch.setattr(lambda_function, "report_discovery_overflow",
+                        lambda batches: pytest.fail("Überlauf im synchronen Pfad gesendet"))
+    return client
+
+
+def test_overflow_is_handed_off_asynchronously(lambda_client):
+    response, stats = lambda_function.build_discovery_response(encoded_endpoints(650))
+
+    endpoints = response["event"]["payload"]["endpoints"]
+    assert len(endpoints) == 300
+    assert stats == {"endpoints": 300, "overflow": "scheduled"}
+
+    assert len(lambda_client.invocations) == 1
+    invocation = lambda_client.invocations[0]
+    assert invocation["InvocationType"] == "Event"
+    payload = json.loads(invocation["Payload"])
+    assert payload["discovery_overflow"]["answered"] == [e["endpointId"] for e in endpoints]
+
+
+def test_small_fleet_needs_no_async_call(lambda_client):
+    response, stats = lambda_function.build_discovery_response(encoded_endpoints(12))
+
+    assert len(response["event"]["payload"]["endpoints"]) == 12
+    assert stats["overflow"] is None
+    assert lambda_client.invocations == []
+
+
+def test_overflow_check_reads_only_one_endpoint_ahead(lambda_client):
+    read = []
+
+    def source():
+        for encoded in encoded_endpoints(650):
+            read.append(encoded)
+            yield encoded
+
+    response, stats = lambda_function.build_discovery_response(source())
+
+    assert stats == {"endpoints": 300, "overflow": "scheduled"}
+    # Der zweite Batch wird nicht gebaut, nur ein Endpunkt vorausgelesen
+    assert len(read) == 301
+
+
+def test_full_first_batch_without_rest_needs_no_async_call(lambda_client):
+    response, stats = lambda_function.build_discovery_response(encoded_endpoints(300))
+
+    assert stats == {"endpoints": 300, "overflow": None}
+    assert lambda_client.invocations == []
+
+
+def test_overflow_invocation_reports_only_unanswered_endpoints(monkeypatch):
+    monkeypatch.setattr(lambda_function, "load_discovery_document", lambda: (encoded_endpoints(650), 4))
+    reported = []
+
+    def report(batches):
+        batches = list(batches)
+        reported.extend(json.loads(encoded)["endpointId"] for batch in batches for encoded in batch)
+        return len(batches), 0
+
+    monkeypatch.setattr(lambda_function, "report_discovery_overflow", report)
+
+    result = lambda_function.lambda_handler(
+        {"discovery_overflow": {"answered": [str(n) for n in range(300)]}}, None)
+
+    assert reported == [str(n) for n in range(300, 650)]
+    assert result == {"overflow_batches": 2}
+
+
+def test_failed_overflow_batches_let_lambda_retry(monkeypatch):
+    monkeypatch.setattr(lambda_function, "load_discovery_document", lambda: (encoded_endpoints(650), 4))
+    monkeypatch.setattr(lambda_function, "report_discovery_overflow", lambda batches: (2, 1))
+
+    with pytest.raises(RuntimeError):
+        lambda_function.handle_discovery_overflow({"answered": []})
+
+
+def test_answered_overflow_sends_no_empty_report(monkeypatch):
+    monkeypatch.setattr(lambda_function, "load_discovery_document", lambda: (encoded_endpoints(300), 4))
+    monkeypatch.setattr(alexa_discovery, "send_event", lambda build: pytest.fail("Leerer AddOrUpdateReport"))
+
+    result = lambda_function.handle_discovery_overflow({"answered": [str(n) for n in range(300)]})
+
+    assert result == {"overflow_batches": 0}
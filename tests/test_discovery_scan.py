@@ -0,0 +1,97 @@
+# test_discovery_scan.py
+
+import threading
+
+import alexa_discovery
+from alexa_discovery import iter_discovery_records, split_discovery_batches, discovery_scan_kwargs
+
+
+class PagedTable:
+    """Minimale Tabelle, die Scan-Seiten und Segmente wie DynamoDB liefert."""
+
+    def __init__(self, items, page_size):
+        self.items = items
+        self.page_size = page_size
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def scan(self, **kwargs):
+        with self.lock:
+            self.calls.append(kwargs)
+        segment = kwargs.get("Segment", 0)
+        total = kwargs.get("TotalSegments", 1)
+        segment_items = [i for n, i in enumerate(self.items) if n % total == segment]
+
+        start = kwargs.get("ExclusiveStartKey", {}).get("offset", 0)
+        page = segment_items[start:start + self.page_size]
+        response = {"Items": page}
+        if start + self.page_size < len(segment_items):
+            response["LastEvaluatedKey"] = {"offset": start + self.page_size}
+        return response
+
+
+def test_discovery_scan_follows_all_pages():
+    items = [{"device_id": str(n), "item_name": f"Item_{n}"} for n in range(25)]
+    table = PagedTable(items, page_size=4)
+
+    stats = {}
+    records = list(iter_discovery_records(table, total_segments=3, stats=stats))
+
+    # Kein Gerät darf verloren gehen, auch nicht über Seitengrenzen hinweg
+    assert sorted(r["device_id"] for r in records) == sorted(i["device_id"] for i in items)
+    assert stats["segments"] == 3
+    assert stats["items"] == 25
+    assert stats["pages"] == len(table.calls)
+    assert {c["TotalSegments"] for c in table.calls} == {3}
+
+
+def test_discovery_scan_single_segment():
+    items = [{"device_id": str(n), "item_name": f"Item_{n}"} for n in range(5)]
+    table = PagedTable(items, page_size=2)
+
+    stats = {}
+    records = list(iter_discovery_records(table, total_segments=1, stats=stats))
+
+    assert len(records) == 5
+    assert stats == {"segments": 1, "pages": 3, "items": 5}
+    # Ein einzelnes Segment wird als normaler Scan ausgeführt
+    assert all("TotalSegments" not in c for c in table.calls)
+
+
+def test_discovery_batches_respect_endpoint_limit():
+    encoded = [f'{{"endpointId":"{n}"}}' for n in range(650)]
+
+    batches = list(split_discovery_batches(encoded, max_endpoints=300, max_bytes=10 ** 6))
+
+    assert [len(b) for b in batches] == [300, 300, 50]
+    assert sum(batches, []) == encoded
+
+
+def test_discovery_batches_respect_size_limit():
+    encoded = ["x" * 99] * 10
+
+    # 100 Bytes pro Endpunkt (inkl. Komma) -> max. 3 pro Batch
+    batches = list(split_discovery_batches(encoded, max_endpoints=300, max_bytes=350))
+
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+
+
+def test_discovery_batches_skip_empty_input():
+    assert list(split_discovery_batches(iter([]))) == []
+
+
+def test_discovery_scan_projection_skips_state():
+    kwargs = discovery_scan_kwargs()
+    projected = set(kwargs["ExpressionAttributeNames"].values())
+
+    # Der sparse Index ist opt-in, ohne Konfiguration wird die Tabelle gescannt
+    assert "IndexName" not in kwargs
+    assert "state" not in projected
+    assert {"device_id", "item_name", "capabilities"} <= projected
+    assert kwargs["ProjectionExpression"].count("#a") == len(projected)
+
+
+def test_discovery_scan_uses_configured_index(monkeypatch):
+    monkeypatch.setattr(alexa_discovery, "DISCOVERY_INDEX_NAME", "discovery-index")
+
+    assert discovery_scan_kwargs()["IndexName"] == "discovery-index"
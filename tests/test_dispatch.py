@@ -0,0 +1,68 @@
+# test_dispatch.py
+
+from alexa_device import AlexaDevice
+from controllers import CONTROLLER_MAPPING, get_directive_registry, get_dispatch_table, load_controller
+
+
+def make_device(capabilities):
+    return AlexaDevice({"device_id": "57f0e723-e6b0-460b-a087-997957d2aac7", "item_name": "Labor",
+                        "capabilities": capabilities, "state": {}})
+
+
+def test_registry_covers_all_directives():
+    registry = get_directive_registry()
+    assert len(CONTROLLER_MAPPING) == 14
+    for controller in map(load_controller, CONTROLLER_MAPPING):
+        for name in controller.directives:
+            assert (controller.namespace, controller.instance, name) in registry
+
+
+def test_dispatch_by_instance():
+    device = make_device(["PowerController", "ToggleController"])
+
+    power = device.execute_directive({"header": {"namespace": "Alexa.PowerController", "name": "TurnOn"}})
+    toggle = device.execute_directive({"header": {"namespace": "Alexa.ToggleController", "name": "TurnOff",
+                                                  "instance": "Light.Backlight"}})
+
+    assert (power, toggle) == ("ON", "OFF")
+    assert device.raw_state == {"powerState": "ON", "toggleState": "OFF"}
+    # Unbekannte Instanz -> keine Aktion
+    assert device.execute_directive({"header": {"namespace": "Alexa.ToggleController", "name": "TurnOn",
+                                                "instance": "Fan.Oscillate"}}) is None
+
+
+def test_dispatch_table_shared_between_devices():
+    first = make_device(["PowerController", "BrightnessController"])
+    second = make_device(["PowerController", "BrightnessController"])
+
+    assert first.dispatch_table is second.dispatch_table
+    assert first.dispatch_table is get_dispatch_table(tuple(first.controllers))
+    assert ("Alexa.ToggleController", "Light.Backlight", "TurnOn") not in first.dispatch_table
+
+
+def test_two_toggles_on_one_device():
+    device = make_device(["PowerController",
+                          {"name": "ToggleController", "instance": "Light.Backlight"},
+                          {"name": "ToggleController", "instance": "Fan.Oscillate", "friendly_name": "Schwenken"}])
+
+    oscillate = device.execute_directive({"header": {"namespace": "Alexa.ToggleController", "name": "TurnOn",
+                                                     "instance": "Fan.Oscillate"}})
+    backlight = device.execute_directive({"header": {"namespace": "Alexa.ToggleController", "name": "TurnOff",
+                                                     "instance": "Light.Backlight"}})
+
+    assert (oscillate, backlight) == ("ON", "OFF")
+    assert device.raw_state == {"toggleState#Fan.Oscillate": "ON", "toggleState": "OFF"}
+
+    # Discovery und ReportState kennen beide Instanzen
+    toggles = [c for c in device.get_discovery_capabilities() if c["interface"] == "Alexa.ToggleController"]
+    assert [(c["instance"], c["capabilityResources"]["friendlyNames"][0]["value"]["text"]) for c in toggles] == \
+        [("Light.Backlight", "Hintergrundlicht"), ("Fan.Oscillate", "Schwenken")]
+    properties = [p for p in device.get_all_properties() if p["namespace"] == "Alexa.ToggleController"]
+    assert [(p["instance"], p["value"]) for p in properties] == [("Light.Backlight", "OFF"), ("Fan.Oscillate", "ON")]
+    assert [device.state_key(p) for p in properties] == ["toggleState", "toggleState#Fan.Oscillate"]
+
+    # Ohne Instanz im Header ist die Direktive nicht eindeutig
+    assert device.execute_directive({"header": {"namespace": "Alexa.ToggleController", "name": "TurnOn"}}) is None
+    # Gleiche Konfiguration -> dieselbe Controller-Klasse (Caches bleiben geteilt)
+    assert device.controllers[2] is make_device(
+        [{"name": "ToggleController", "instance": "Fan.Oscillate", "friendly_name": "Schwenken"}]).controllers[0]
@@ -0,0 +1,80 @@
+# test_dynamodb_codec.py
+
+import json
+import time
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import TypeDeserializer
+
+from alexa_dynamodb import Table, serialize_item, deserialize_item, batch_get_item
+
+ITEM = {
+    "device_id": "57f0e723-e6b0-460b-a087-997957d2aac7",
+    "item_name": "Licht_Labor",
+    "capabilities": ["PowerController", "BrightnessController", "ColorController"],
+    "enabled": True,
+    "description": None,
+    "state": {"powerState": "ON", "brightness": 42, "targetSetpoint": 21.5,
+              "color": {"hue": 350.5, "saturation": 0.7, "brightness": 1}}
+}
+
+
+class FakeClient:
+    """Antwortet wie der Low-Level-Client (AttributeValues)."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_item(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"Item": serialize_item(ITEM)}
+
+    def batch_get_item(self, RequestItems):
+        self.calls.append(RequestItems)
+        (name, spec), = RequestItems.items()
+        return {"Responses": {name: [serialize_item(ITEM)]}, "UnprocessedKeys": {name: {"Keys": spec["Keys"][1:]}}}
+
+
+def test_codec_roundtrip_without_decimal():
+    encoded = serialize_item(ITEM)
+
+    assert encoded["state"]["M"]["targetSetpoint"] == {"N": "21.5"}
+    assert deserialize_item(encoded) == ITEM
+    # Gelesene Items lassen sich direkt serialisieren (kein Decimal)
+    assert json.loads(json.dumps(deserialize_item(encoded))) == ITEM
+    assert serialize_item({"v": Decimal("1.10")}) == {"v": {"N": "1.10"}}
+
+
+def test_table_translates_requests_and_responses():
+    client = FakeClient()
+    table = Table("smarthome_devices", client=client)
+
+    item = table.get_item(Key={"device_id": ITEM["device_id"]})["Item"]
+
+    assert client.calls[0] == {"TableName": "smarthome_devices", "Key": {"device_id": {"S": ITEM["device_id"]}}}
+    assert item["state"]["brightness"] == 42 and isinstance(item["state"]["brightness"], int)
+
+    res = batch_get_item({"catalog": {"Keys": [{"id": "a"}, {"id": "b"}]}}, client=client)
+    assert res["Responses"]["catalog"] == [ITEM]
+    assert res["UnprocessedKeys"] == {"catalog": {"Keys": [{"id": "b"}]}}
+
+
+@pytest.mark.benchmark
+def test_codec_is_faster_than_type_deserializer():
+    items = [serialize_item(dict(ITEM, device_id=str(n))) for n in range(2000)]
+    deserializer = TypeDeserializer()
+
+    start = time.perf_counter()
+    for item in items:
+        {k: deserializer.deserialize(v) for k, v in item.items()}
+    resource_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for item in items:
+        deserialize_item(item)
+    codec_time = time.perf_counter() - start
+
+    print(f"\n[DynamoDB Codec] {len(items)} Items: TypeDeserializer {resource_time * 1000:.1f} ms, "
+          f"alexa_dynamodb {codec_time * 1000:.1f} ms")
+    assert codec_time < resource_time
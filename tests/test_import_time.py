@@ -0,0 +1,52 @@
+# test_import_time.py
+#
+# Cold-Start: importiert die Handler aller drei Lambdas in einem frischen
+# Interpreter. Schwere Module (boto3, urllib.request, Controller) dürfen erst
+# bei Bedarf geladen werden. Das Zeitbudget ("python -X importtime") läuft nur
+# mit RUN_BENCHMARKS=1.
+
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SKILL_DIR = os.path.join(BASE_DIR, "alexa-skill-smarthome", "src")
+
+# Die gemeinsamen Module liegen beim Deployment in jedem Paket (deploy.sh)
+HANDLERS = {
+    "skill": [SKILL_DIR],
+    "mqtt": [os.path.join(BASE_DIR, "alexa-device-update-state-mqtt", "src"), SKILL_DIR],
+    "devices": [os.path.join(BASE_DIR, "alexa-devices", "src"), SKILL_DIR],
+}
+
+# Großzügig, damit langsame CI-Maschinen nicht flattern (lokal ca. 50-80 ms)
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "250"))
+LAZY_MODULES = ("boto3", "botocore", "urllib.request", "controllers.power_controller")
+
+
+def import_lambda(paths):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(paths), DEVICE_TABLE="smarthome_devices")
+    check = f"import lambda_function, sys; print([m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", check],
+                            capture_output=True, text=True, env=env, cwd=BASE_DIR, check=True)
+    match = re.search(r"import time:\s+\d+ \|\s+(\d+) \| lambda_function$", result.stderr, re.MULTILINE)
+    return int(match.group(1)) / 1000, result.stdout.strip()
+
+
+@pytest.mark.parametrize("handler", sorted(HANDLERS))
+def test_heavy_modules_are_loaded_lazily(handler):
+    _, loaded = import_lambda(HANDLERS[handler])
+
+    assert loaded == "[]", f"Beim Import geladen: {loaded}"
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("handler", sorted(HANDLERS))
+def test_cold_start_import_budget(handler):
+    cumulative_ms, _ = import_lambda(HANDLERS[handler])
+    print(f"\n[Import Time] {handler}: {cumulative_ms:.1f} ms")
+
+    assert cumulative_ms < IMPORT_BUDGET_MS
@@ -0,0 +1,35 @@
+# test_item_cache.py
+
+
+def test_unknown_items_skip_dynamodb(mqtt_lambda):
+    version = [1]
+    mqtt_lambda.current_catalog_version = lambda: version[0]
+    table = mqtt_lambda.table
+
+    for _ in range(50):
+        mqtt_lambda.lambda_handler({"item_name": "Temperatur_Keller", "state": "18.5"}, None)
+
+    assert len(table.queries) == 1
+    assert mqtt_lambda.item_cache.stats()["hits"] == 49
+
+    # Ein neues Gerät erhöht die Katalog-Version -> Negativ-Eintrag verfällt
+    table.records["c3"] = {"device_id": "c3", "item_name": "Temperatur_Keller", "capabilities": ["PowerController"]}
+    version[0] = 2
+    mqtt_lambda.lambda_handler({"item_name": "Temperatur_Keller", "state": "ON"}, None)
+    assert len(table.queries) == 2
+    assert mqtt_lambda.state_store.saved == [("c3", {"powerState": "ON"})]
+
+
+def test_known_items_read_live_record(mqtt_lambda):
+    table = mqtt_lambda.table
+    table.records["a1"] = {"device_id": "a1", "item_name": "Licht_Flur", "capabilities": ["PowerController"]}
+
+    mqtt_lambda.lambda_handler({"item_name": "Licht_Flur", "state": "ON"}, None)
+    mqtt_lambda.lambda_handler({"item_name": "Licht_Flur", "state": "OFF"}, None)
+    assert (len(table.queries), table.gets) == (1, 2)
+
+    # Umbenannt, ohne dass die Version schon nachgelesen wurde -> neu auflösen
+    table.records["a1"]["item_name"] = "Licht_Diele"
+    mqtt_lambda.lambda_handler({"item_name": "Licht_Flur", "state": "ON"}, None)
+    assert (len(table.queries), table.gets) == (2, 3)
+    assert len(mqtt_lambda.state_store.saved) == 2
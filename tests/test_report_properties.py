@@ -0,0 +1,31 @@
+# test_report_properties.py
+
+from decimal import Decimal
+
+from alexa_device import AlexaDevice
+
+
+def test_prerendered_properties_match_controllers():
+    record = {
+        "device_id": "57f0e723-e6b0-460b-a087-997957d2aac7",
+        "item_name": "Sensorik_Labor",
+        "capabilities": ["TemperatureSensor", "HumiditySensor", "SpeakerController"],
+        "state": {"temperature": Decimal("21.5"), "relativeHumidity": Decimal("48"), "volume": Decimal("30")}
+    }
+    device = AlexaDevice(record)
+
+    # So landet der Snapshot beim Schreiben des States in der DB ...
+    record["reported_properties"] = device.render_properties()
+
+    # ... und ReportState liest ihn ohne Controller-Logik wieder aus
+    snapshot = AlexaDevice(record).get_report_properties()
+    assert snapshot == AlexaDevice({**record, "reported_properties": None}).get_all_properties()
+    assert snapshot[2]["value"] == 30
+
+
+def test_report_properties_fallback_without_snapshot():
+    record = {"device_id": "d78a4851-8615-44f2-a944-21977d272952", "item_name": "Schalter_Labor",
+              "capabilities": ["PowerController"], "state": {"powerState": "ON"}}
+
+    props = AlexaDevice(record).get_report_properties()
+    assert props == [{"namespace": "Alexa.PowerController", "name": "powerState", "value": "ON"}]
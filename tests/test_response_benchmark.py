@@ -0,0 +1,80 @@
+# test_response_benchmark.py
+
+import json
+import time
+
+import pytest
+
+import alexa_response
+from alexa_response import AlexaResponse
+from alexa_utils import get_utc_timestamp
+
+PROPERTIES = [
+    {"namespace": "Alexa.PowerController", "name": "powerState", "value": "ON"},
+    {"namespace": "Alexa.BrightnessController", "name": "brightness", "value": 42},
+    {"namespace": "Alexa.ColorController", "name": "color", "value": {"hue": 350.5, "saturation": 0.7, "brightness": 1}},
+    {"namespace": "Alexa.ToggleController", "instance": "Light.Backlight", "name": "toggleState", "value": "OFF"},
+]
+
+
+def legacy_context_property(**kwargs):
+    """Der bisherige Weg: kwargs.get und ein strftime pro Property."""
+    prop = {
+        'namespace': kwargs.get('namespace', 'Alexa.EndpointHealth'),
+        'name': kwargs.get('name', 'connectivity'),
+        'value': kwargs.get('value', {'value': 'OK'}),
+        'timeOfSample': get_utc_timestamp(),
+        'uncertaintyInMilliseconds': kwargs.get('uncertainty_in_milliseconds', 0)
+    }
+    instance = kwargs.get('instance')
+    if instance:
+        prop['instance'] = instance
+    return prop
+
+
+def test_bulk_properties_match_single_properties():
+    single = AlexaResponse(name="Response", correlation_token="c", endpoint_id="e", token="t")
+    for prop in PROPERTIES:
+        single.add_context_property(**prop)
+    bulk = AlexaResponse(name="Response", correlation_token="c", endpoint_id="e", token="t")
+    bulk.add_context_properties(PROPERTIES)
+
+    assert bulk.context_properties == single.context_properties
+    assert {p["timeOfSample"] for p in bulk.context_properties} == {bulk.timestamp}
+
+    response = bulk.get()
+    assert response.to_json() is response.to_json()
+    assert json.loads(response.to_json()) == response
+
+
+def test_bulk_properties_take_one_timestamp(monkeypatch):
+    calls = []
+    monkeypatch.setattr(alexa_response, "get_utc_timestamp", lambda: calls.append(1) or "2026-01-01T00:00:00.00Z")
+
+    adr = AlexaResponse()
+    adr.add_context_properties(PROPERTIES * 4)
+
+    # Ein Zeitstempel pro Response, nicht pro Property
+    assert len(calls) == 1
+    assert len(adr.context_properties) == len(PROPERTIES) * 4
+
+
+@pytest.mark.benchmark
+def test_bulk_properties_are_cheaper_per_property():
+    rounds = 5000
+    props = PROPERTIES * 4
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        [legacy_context_property(**p) for p in props]
+    legacy = (time.perf_counter() - start) / (rounds * len(props))
+
+    adr = AlexaResponse()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        adr.context_properties = []
+        adr.add_context_properties(props)
+    bulk = (time.perf_counter() - start) / (rounds * len(props))
+
+    print(f"\n[AlexaResponse] pro Property: bisher {legacy * 1e9:.0f} ns, jetzt {bulk * 1e9:.0f} ns")
+    assert bulk < legacy
@@ -0,0 +1,173 @@
+# test_state_store.py
+
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+from alexa_device import AlexaDevice
+from alexa_state_store import DeviceStateStore
+
+
+class RecordingTable:
+    def __init__(self, missing_state=False):
+        self.calls = []
+        self.missing_state = missing_state
+
+    def update_item(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.missing_state and "#state.#k0" in kwargs["UpdateExpression"]:
+            raise ClientError({"Error": {"Code": "ValidationException",
+                                         "Message": "The document path provided in the update expression is invalid"}},
+                              "UpdateItem")
+
+
+def make_device():
+    return AlexaDevice({"device_id": "d78a4851-8615-44f2-a944-21977d272952", "item_name": "Licht_Labor",
+                        "capabilities": ["PowerController", "BrightnessController"],
+                        "state": {"powerState": "ON", "brightness": Decimal("10")}})
+
+
+def test_directive_writes_only_changed_attributes():
+    table = RecordingTable()
+    device = make_device()
+    device.execute_directive({"header": {"namespace": "Alexa.BrightnessController", "name": "SetBrightness"},
+                              "payload": {"brightness": 42}})
+
+    assert device.update_db(DeviceStateStore(table))
+
+    assert len(table.calls) == 1
+    call = table.calls[0]
+    assert call["UpdateExpression"] == "SET #state.#k0 = :v0 REMOVE reported_properties"
+    assert call["ExpressionAttributeNames"]["#k0"] == "brightness"
+    assert call["ExpressionAttributeValues"][":v0"] == 42
+    assert ":p" not in call["ExpressionAttributeValues"]
+    assert device.pending_state == {}
+    assert device.reported_properties is None
+
+
+def test_partial_write_does_not_keep_a_stale_snapshot():
+    # Gerät stammt aus dem Cache (powerState veraltet), der Snapshot darf
+    # daher weder geschrieben noch als Antwort auf ReportState genutzt werden
+    table = RecordingTable(missing_state=True)
+    device = make_device()
+    device.reported_properties = "[]"
+    device.execute_directive({"header": {"namespace": "Alexa.BrightnessController", "name": "SetBrightness"},
+                              "payload": {"brightness": 42}})
+
+    assert device.update_db(DeviceStateStore(table))
+
+    assert table.calls[1]["UpdateExpression"] == "SET #state = :s REMOVE reported_properties"
+    assert device.reported_properties is None
+    assert {"name": "brightness", "value": 42} in [{k: p[k] for k in ("name", "value")}
+                                                   for p in device.get_report_properties()]
+
+
+def test_missing_state_map_falls_back_to_full_write():
+    table = RecordingTable(missing_state=True)
+
+    DeviceStateStore(table).save("id", {"powerState": "OFF"}, {"powerState": "OFF", "level": 1.5})
+
+    assert len(table.calls) == 2
+    assert table.calls[1]["UpdateExpression"] == "SET #state = :s"
+    assert table.calls[1]["ExpressionAttributeValues"][":s"] == {"powerState": "OFF", "level": 1.5}
+
+
+class AdjustingTable:
+    """Rechnet das atomare Adjust-Update inkl. Bedingung wie DynamoDB nach."""
+
+    def __init__(self, state):
+        self.state = state
+        self.calls = []
+
+    def update_item(self, **kwargs):
+        self.calls.append(kwargs)
+        attribute = kwargs["ExpressionAttributeNames"]["#a"]
+        values = kwargs["ExpressionAttributeValues"]
+        if ":bound" in values:
+            self.state[attribute] = values[":bound"]
+            return {}
+
+        current = self.state.get(attribute)
+        condition = kwargs["ConditionExpression"]
+        if current is None:
+            ok = condition.startswith("attribute_not_exists")
+        elif "<=" in condition:
+            ok = current <= values[":limit"]
+        else:
+            ok = current >= values[":limit"]
+        if not ok:
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}}, "UpdateItem")
+
+        self.state[attribute] = (values[":default"] if current is None else current) + values[":d"]
+        return {"Attributes": {"state": {attribute: self.state[attribute]}}}
+
+
+def test_adjust_uses_value_from_database():
+    # Ein anderer Aufruf hat die Lautstärke inzwischen auf 40 gestellt
+    table = AdjustingTable({"volume": Decimal("40")})
+    device = AlexaDevice({"device_id": "57f0e723-e6b0-460b-a087-997957d2aac7", "item_name": "Radio",
+                          "capabilities": ["SpeakerController"], "state": {"volume": Decimal("10")},
+                          "reported_properties": "[]"})
+
+    openhab = device.execute_directive({"header": {"namespace": "Alexa.Speaker", "name": "AdjustVolume"},
+                                        "payload": {"volume": 5}}, DeviceStateStore(table))
+
+    assert openhab == 45
+    assert device.raw_state["volume"] == 45
+    assert device.pending_state == {}
+    assert device.reported_properties is None
+    assert "REMOVE reported_properties" in table.calls[0]["UpdateExpression"]
+
+
+def test_adjust_clamps_at_limit():
+    table = AdjustingTable({"brightness": Decimal("95")})
+    store = DeviceStateStore(table)
+
+    assert store.adjust("id", "brightness", 10, 50, 0, 100) == 100
+    assert store.adjust("id", "brightness", -30, 50, 0, 100) == 70
+    assert table.state["brightness"] == 70
+    assert len(table.calls) == 3
+
+
+class ConditionalTable:
+    """Wertet die Bedingung von save_if_changed gegen einen State aus."""
+
+    def __init__(self, state):
+        self.state = state
+        self.calls = []
+
+    def update_item(self, **kwargs):
+        self.calls.append(kwargs)
+        names, values = kwargs["ExpressionAttributeNames"], kwargs["ExpressionAttributeValues"]
+        keys = {k: names[f"#k{k[2:]}"] for k in values if k.startswith(":v")}
+        if all(self.state.get(key) == values[k] for k, key in keys.items()):
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}}, "UpdateItem")
+        old = {key: self.state[key] for key in keys.values() if key in self.state}
+        self.state.update({key: values[k] for k, key in keys.items()})
+        return {"Attributes": {"state": old}} if old else {}
+
+
+def test_save_if_changed_reports_only_real_changes():
+    table = ConditionalTable({"powerState": "ON", "brightness": 10})
+    store = DeviceStateStore(table)
+
+    changed = store.save_if_changed("id", {"powerState": "ON", "brightness": 40}, reported_properties="[]")
+
+    assert changed == {"brightness": 40}
+    call = table.calls[0]
+    assert call["ReturnValues"] == "UPDATED_OLD"
+    assert "#state.#k0 <> :v0" in call["ConditionExpression"]
+
+    # Nichts mehr abweichend -> Bedingung schlägt fehl, kein Write
+    assert store.save_if_changed("id", {"brightness": 40}) == {}
+    assert store.save_if_changed("id", {}) == {}
+    assert len(table.calls) == 2
+
+
+def test_mark_reported_writes_the_reported_values():
+    table = RecordingTable()
+
+    DeviceStateStore(table).mark_reported("id", {"powerState": "ON", "brightness": 40})
+
+    assert table.calls[0]["UpdateExpression"] == "SET reported_state = :m"
+    assert table.calls[0]["ExpressionAttributeValues"][":m"] == {"powerState": "ON", "brightness": 40}
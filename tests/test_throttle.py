@@ -0,0 +1,99 @@
+# test_throttle.py
+
+from alexa_device import AlexaDevice
+from alexa_throttle import ChangeReportThrottle
+
+
+def make_device(**extra):
+    return AlexaDevice({"device_id": "e1", "item_name": "Temperatur_Bad",
+                        "capabilities": ["TemperatureSensor", "BrightnessController"], **extra})
+
+
+def deadband_for(device):
+    controllers = {"temperature": device.controllers[0], "brightness": device.controllers[1]}
+    return lambda name: device.get_report_deadband(controllers[name], name)
+
+
+def send(throttle, reported_state, values, deadband):
+    """select + erfolgreicher Versand, wie in process_device."""
+    report = throttle.select(values, reported_state, deadband)
+    reported_state.update({name: values[name] for name in report})
+    throttle.mark_reported(report)
+    return report
+
+
+def test_deadband_per_capability():
+    throttle = ChangeReportThrottle()
+    deadband = deadband_for(make_device())
+    reported_state = {}
+
+    assert send(throttle, reported_state, {"temperature": 21.0, "brightness": 40}, deadband) == ["temperature",
+                                                                                                  "brightness"]
+    # ±0.2 °C bzw. ±2 % -> nicht gemeldet
+    assert send(throttle, reported_state, {"temperature": 21.1, "brightness": 41}, deadband) == []
+    assert send(throttle, reported_state, {"temperature": 22.0, "brightness": 60}, deadband) == ["temperature",
+                                                                                                  "brightness"]
+    assert throttle.drain() == {"reported": 4, "suppressed": 2}
+    assert throttle.drain() == {"reported": 0, "suppressed": 0}
+
+
+def test_failed_send_is_not_marked_reported():
+    throttle = ChangeReportThrottle()
+    deadband = deadband_for(make_device())
+
+    # select allein merkt nichts, verglichen wird mit dem gemeldeten State
+    assert throttle.select({"brightness": 40}, {}, deadband) == ["brightness"]
+    assert throttle.select({"brightness": 40}, {}, deadband) == ["brightness"]
+    assert throttle.stats() == {"reported": 0, "suppressed": 0}
+
+
+def test_device_settings_override_controller():
+    device = make_device(report_throttle={"deadband": {"temperature": 1}})
+    temperature, brightness = device.controllers
+
+    assert device.get_report_deadband(temperature, "temperature") == 1.0
+    assert device.get_report_deadband(brightness, "brightness") == 2
+
+
+def test_sensor_burst_sends_one_change_report(mqtt_lambda, capsys):
+    table = mqtt_lambda.table
+    table.records["e1"] = {"device_id": "e1", "item_name": "Temperatur_Bad", "capabilities": ["TemperatureSensor"],
+                           "state": {"temperature": 20.0}}
+
+    for value in ("20.5", "20.6", "20.4", "21.5"):
+        mqtt_lambda.lambda_handler({"item_name": "Temperatur_Bad", "state": value}, None)
+
+    # Der State ist exakt, gemeldet werden nur Sprünge außerhalb des Totbands
+    assert table.records["e1"]["state"] == {"temperature": 21.5}
+    assert table.records["e1"]["reported_state"] == {"temperature": 21.5}
+    assert len(mqtt_lambda.send_event.sent) == 2
+    assert mqtt_lambda.throttle.stats() == {"reported": 2, "suppressed": 2}
+    assert '"ChangeReportsSuppressed": 1' in capsys.readouterr().out
+
+
+def test_last_value_of_a_burst_is_reported(mqtt_lambda):
+    # Ein altes Fenster in der Geräte-Konfiguration hält nichts mehr zurück
+    mqtt_lambda.table.records["e1"] = {"device_id": "e1", "item_name": "Licht_Bad",
+                                       "capabilities": ["BrightnessController"], "state": {},
+                                       "report_throttle": {"window": 60}}
+
+    # Slider-Salve, der Regler bleibt bei 73 stehen
+    for value in ("10", "35", "60", "73"):
+        mqtt_lambda.lambda_handler({"item_name": "Licht_Bad", "state": value}, None)
+
+    last = mqtt_lambda.send_event.sent[-1]["event"]["payload"]["change"]["properties"]
+    assert [(p["name"], p["value"]) for p in last] == [("brightness", 73)]
+    assert mqtt_lambda.table.records["e1"]["reported_state"] == {"brightness": 73}
+
+
+def test_failed_change_report_is_retried_in_the_same_container(mqtt_lambda):
+    mqtt_lambda.table.records["e1"] = {"device_id": "e1", "item_name": "Licht_Bad",
+                                       "capabilities": ["BrightnessController"], "state": {}}
+    mqtt_lambda.send_event.failing = True
+    mqtt_lambda.lambda_handler({"item_name": "Licht_Bad", "state": "40"}, None)
+
+    mqtt_lambda.send_event.failing = False
+    mqtt_lambda.lambda_handler({"item_name": "Licht_Bad", "state": "40"}, None)
+
+    assert len(mqtt_lambda.send_event.sent) == 1
+    assert mqtt_lambda.table.records["e1"]["reported_state"] == {"brightness": 40}
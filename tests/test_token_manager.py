@@ -0,0 +1,116 @@
+# test_token_manager.py
+
+import json
+import threading
+import time
+
+import alexa_auth
+import alexa_events
+from alexa_auth import TokenManager
+
+
+class FakeSsm:
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self.gets = 0
+        self.puts = []
+
+    def get_parameter(self, Name, WithDecryption=False):
+        self.gets += 1
+        if Name not in self.parameters:
+            raise KeyError(Name)
+        return {"Parameter": {"Value": self.parameters[Name]}}
+
+    def put_parameter(self, Name, Value, Type, Overwrite):
+        self.puts.append(Name)
+        self.parameters[Name] = Value
+
+
+def setup(monkeypatch, parameters, delay=0):
+    ssm = FakeSsm(parameters)
+    calls = []
+
+    def request_lwa_token(params):
+        calls.append(params)
+        time.sleep(delay)
+        return {"access_token": f"at-{len(calls)}", "refresh_token": "rt", "expires_in": 3600}
+
+    monkeypatch.setattr(alexa_auth, "get_ssm", lambda: ssm)
+    monkeypatch.setattr(alexa_auth, "request_lwa_token", request_lwa_token)
+    return ssm, calls
+
+
+def test_token_is_cached_until_shortly_before_expiry(monkeypatch, clock):
+    stored = json.dumps({"access_token": "at-ssm", "expires_at": clock.now + 1000})
+    ssm, calls = setup(monkeypatch, {"/alexa/access_token": stored, "/alexa/refresh_token": "rt"})
+    manager = TokenManager(refresh_margin=300, clock=clock)
+
+    assert [manager.get() for _ in range(10)] == ["at-ssm"] * 10
+    assert ssm.gets == 1 and calls == []
+
+    # 300 s vor Ablauf wird erneuert und die Ablaufzeit mitgespeichert
+    clock.now += 750
+    assert manager.get() == "at-1"
+    assert json.loads(ssm.parameters["/alexa/access_token"]) == {"access_token": "at-1",
+                                                                  "expires_at": int(clock.now + 3600)}
+    assert calls[0]["grant_type"] == "refresh_token"
+
+
+def test_legacy_parameter_without_expiry_is_refreshed(monkeypatch):
+    ssm, calls = setup(monkeypatch, {"/alexa/access_token": "Atza|alt", "/alexa/refresh_token": "rt"})
+
+    assert TokenManager().get() == "at-1"
+    assert len(calls) == 1
+
+
+def test_concurrent_callers_share_one_refresh(monkeypatch):
+    ssm, calls = setup(monkeypatch, {"/alexa/refresh_token": "rt"}, delay=0.05)
+    manager = TokenManager()
+    tokens = []
+
+    threads = [threading.Thread(target=lambda: tokens.append(manager.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert tokens == ["at-1"] * 8
+    assert len(calls) == 1
+
+    # Ein 401 auf ein bereits ersetztes Token löst keinen weiteren Refresh aus
+    assert manager.refresh(rejected_token="at-0") == "at-1"
+    assert manager.refresh(rejected_token="at-1") == "at-2"
+
+
+def test_accept_grant_seeds_the_token(monkeypatch):
+    ssm, calls = setup(monkeypatch, {})
+    monkeypatch.setattr(alexa_auth, "token_manager", TokenManager())
+
+    request = {"directive": {"payload": {"grant": {"type": "OAuth2.AuthorizationCode", "code": "c"}}}}
+    response = alexa_auth.handle_accept_grant(request)
+
+    assert response["event"]["header"]["name"] == "AcceptGrant.Response"
+    assert calls[0]["grant_type"] == "authorization_code"
+    assert ssm.parameters["/alexa/refresh_token"] == "rt"
+    assert alexa_auth.get_valid_access_token() == "at-1"
+    assert len(calls) == 1
+
+
+def test_send_event_retries_401_with_new_token(monkeypatch):
+    setup(monkeypatch, {"/alexa/refresh_token": "rt"})
+    monkeypatch.setattr(alexa_auth, "token_manager", TokenManager())
+    posted = []
+
+    class Unauthorized(Exception):
+        code = 401
+
+    def post_event(token, payload):
+        posted.append(token)
+        if len(posted) == 1:
+            raise Unauthorized()
+        return 202
+
+    monkeypatch.setattr(alexa_events, "post_event", post_event)
+
+    assert alexa_events.send_event(lambda token: {"token": token}) == 202
+    assert posted == ["at-1", "at-2"]